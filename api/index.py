@@ -3,5 +3,22 @@ from django.core.wsgi import get_wsgi_application
 
 # Aponta para o seu settings (ajuste se o nome da pasta for diferente de 'core')
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+# Cada instância nova paga a partida a frio: o Admin só carrega quando alguém abre /admin/
+os.environ.setdefault("ADMIN_SOB_DEMANDA", "True")
+# A instância atende várias requisições enquanto está quente: reaproveita a conexão com o banco
+# (e o handshake TLS) e confere se ela ainda está viva depois de um tempo congelada
+os.environ.setdefault("DB_CONN_MAX_AGE", "60")
+os.environ.setdefault("DB_CONN_HEALTH_CHECKS", "True")
+# Exportação em segundo plano não funciona em serverless (disco só leitura, /tmp por instância,
+# threads congeladas depois da resposta): fica só a exportação em streaming
+os.environ.setdefault("ESTOQUE_EXPORTACAO_EXECUTOR", "desligado")
 
 app = get_wsgi_application()
+
+# Com DB_POOL=True, abre as conexões do pool em segundo plano enquanto a primeira requisição
+# é montada. Aqui não há fork depois do import; nos core/wsgi.py e asgi.py o pool abre na
+# primeira requisição de cada worker (abrir antes do fork do gunicorn --preload dividiria as conexões)
+from django.db import connection
+
+if connection.vendor == "postgresql" and connection.pool:
+    connection.pool.open(wait=False)
@@ -2,4 +2,6 @@
 echo "🚀 Build..."
 python3 -m pip install -r requirements.txt
 python3 manage.py collectstatic --noinput --clear
+# Bytecode pronto: sem os .pyc, cada partida a frio compila o projeto de novo
+python3 -m compileall -q api core estoque
 echo "🚀 Finished Build 🚀"
\ No newline at end of file
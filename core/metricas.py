@@ -0,0 +1,95 @@
+"""
+Métricas por view coletadas pelo core.middleware.MetricasRequisicaoMiddleware.
+
+Cada processo guarda, por view, as últimas METRICAS_AMOSTRAS requisições (janela móvel)
+e as resume em percentis e num histograma de latência. Os números são do processo que
+respondeu: com vários workers, cada um tem a sua janela.
+"""
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+# Limites (ms) das faixas do histograma de latência total
+FAIXAS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+CAMPOS = ('total_ms', 'db_ms', 'render_ms', 'consultas', 'bytes')
+
+
+def percentil(ordenados, fracao):
+    """Percentil pelo método do posto mais próximo (lista já ordenada, não vazia)."""
+    posicao = max(0, min(len(ordenados) - 1, round(fracao * len(ordenados)) - 1))
+    return ordenados[posicao]
+
+
+def faixa(valor_ms):
+    for limite in FAIXAS_MS:
+        if valor_ms <= limite:
+            return f"<={limite}"
+    return f">{FAIXAS_MS[-1]}"
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self.amostras = {}     # view -> deque de tuplas na ordem de CAMPOS
+        self.requisicoes = {}  # view -> total desde que o processo subiu
+        self.trava = threading.Lock()
+
+    def registrar(self, view, total_ms, db_ms, render_ms, consultas, tamanho):
+        with self.trava:
+            janela = self.amostras.get(view)
+            if janela is None:
+                janela = self.amostras[view] = deque(maxlen=settings.METRICAS_AMOSTRAS)
+            janela.append((total_ms, db_ms, render_ms, consultas, tamanho))
+            self.requisicoes[view] = self.requisicoes.get(view, 0) + 1
+
+    def limpar(self):
+        with self.trava:
+            self.amostras.clear()
+            self.requisicoes.clear()
+
+    def resumo(self):
+        with self.trava:
+            copia = {view: list(janela) for view, janela in self.amostras.items()}
+            requisicoes = dict(self.requisicoes)
+
+        views = {}
+        for view, amostras in sorted(copia.items()):
+            resumo_view = {'requisicoes': requisicoes[view], 'janela': len(amostras)}
+            for indice, campo in enumerate(CAMPOS):
+                valores = sorted(amostra[indice] for amostra in amostras if amostra[indice] is not None)
+                if not valores:
+                    continue
+                resumo_view[campo] = {
+                    'media': round(sum(valores) / len(valores), 2),
+                    'p50': round(percentil(valores, 0.50), 2),
+                    'p95': round(percentil(valores, 0.95), 2),
+                    'p99': round(percentil(valores, 0.99), 2),
+                    'max': round(valores[-1], 2),
+                }
+
+            histograma = dict.fromkeys([f"<={limite}" for limite in FAIXAS_MS] + [f">{FAIXAS_MS[-1]}"], 0)
+            for amostra in amostras:
+                histograma[faixa(amostra[0])] += 1
+            resumo_view['histograma_total_ms'] = histograma
+            views[view] = resumo_view
+        return views
+
+
+registro = RegistroMetricas()
+
+
+@login_required
+def metricas_requisicoes(request):
+    """Resumo das métricas deste processo (JSON). POST zera a janela."""
+    if not request.user.is_superuser:
+        return JsonResponse({'erro': "Apenas administradores podem ver as métricas."}, status=403)
+
+    if not settings.METRICAS_REQUISICOES:
+        return JsonResponse({'erro': "Instrumentação desligada (METRICAS_REQUISICOES=True para ligar)."}, status=404)
+
+    if request.method == 'POST':
+        registro.limpar()
+
+    return JsonResponse({'amostras_por_view': settings.METRICAS_AMOSTRAS, 'views': registro.resumo()})
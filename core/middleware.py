@@ -0,0 +1,232 @@
+"""
+Instrumentação por requisição (opt-in: METRICAS_REQUISICOES=True).
+
+Para cada requisição mede o tempo total, o número de consultas e o tempo gasto no banco
+(execute_wrapper do Django, funciona sem DEBUG), o tempo de renderização dos templates
+(sem contar as consultas feitas de dentro do template) e o tamanho da resposta. Os números:
+
+- vão no cabeçalho Server-Timing (aparecem na aba Network do navegador);
+- entram na janela de métricas da view (core/metricas.py, /metricas/requisicoes/);
+- acima de METRICAS_REQUISICAO_LENTA_MS, geram um aviso no log com as consultas mais lentas.
+
+Desligada, o Django descarta o middleware na inicialização (MiddlewareNotUsed): custo zero.
+O custo ligado é medido por `python manage.py benchmark instrumentacao`. Ela é só síncrona:
+ligada num servidor ASGI, as views assíncronas (estoque/views_async.py) rodam adaptadas numa thread.
+
+Aqui também ficam o WhiteNoise híbrido (síncrono e assíncrono) usado no MIDDLEWARE e a
+troca de urlconf do Admin sob demanda.
+"""
+import contextvars
+import functools
+import heapq
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metricas import registro
+
+logger = logging.getLogger('core.metricas')
+
+TOTAL_CONSULTAS_LOG = 5     # Consultas mais lentas listadas no log de requisição lenta
+LIMITE_SQL_LOG = 500        # Caracteres de cada SQL no log
+
+_medicao_atual = contextvars.ContextVar('medicao_requisicao', default=None)
+
+
+class Medicao:
+    __slots__ = ('consultas', 'db', 'render', 'renderizando', 'bytes', 'mais_lentas')
+
+    def __init__(self):
+        self.consultas = 0
+        self.db = 0.0            # segundos
+        self.render = 0.0        # segundos (sem as consultas disparadas pelo template)
+        self.renderizando = False
+        self.bytes = 0
+        self.mais_lentas = []    # heap (duração, sql) com as TOTAL_CONSULTAS_LOG mais lentas
+
+    def registrar_consulta(self, sql, duracao):
+        self.consultas += 1
+        self.db += duracao
+        if len(self.mais_lentas) < TOTAL_CONSULTAS_LOG:
+            heapq.heappush(self.mais_lentas, (duracao, sql))
+        elif duracao > self.mais_lentas[0][0]:
+            heapq.heapreplace(self.mais_lentas, (duracao, sql))
+
+
+def medir_consulta(execute, sql, params, many, context):
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.registrar_consulta(sql, time.perf_counter() - inicio)
+
+
+def instalar_medicao_templates():
+    """Envolve Template.render (uma vez por processo) para somar o tempo do template mais externo."""
+    if getattr(Template.render, 'medido', False):
+        return
+    original = Template.render
+
+    @functools.wraps(original)
+    def render(self, context):
+        medicao = _medicao_atual.get()
+        if medicao is None or medicao.renderizando:
+            # Fora de uma requisição medida ou template incluído ({% include %}, {% extends %})
+            return original(self, context)
+        medicao.renderizando = True
+        inicio, db_antes = time.perf_counter(), medicao.db
+        try:
+            return original(self, context)
+        finally:
+            medicao.renderizando = False
+            medicao.render += (time.perf_counter() - inicio) - (medicao.db - db_antes)
+
+    render.medido = True
+    Template.render = render
+
+
+@contextmanager
+def medindo(medicao):
+    """Ativa a medição (consultas em todas as conexões + templates) no contexto atual."""
+    token = _medicao_atual.set(medicao)
+    try:
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(medir_consulta))
+            yield
+    finally:
+        _medicao_atual.reset(token)
+
+
+class MetricasRequisicaoMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICAS_REQUISICOES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.limite_lento_ms = settings.METRICAS_REQUISICAO_LENTA_MS
+        instalar_medicao_templates()
+
+    def __call__(self, request):
+        medicao = Medicao()
+        inicio = time.perf_counter()
+        with medindo(medicao):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async and not hasattr(response, 'file_to_stream'):
+            # Relatórios em streaming: o corpo (e as consultas dele) é gerado depois daqui,
+            # então a medição termina quando o último pedaço for enviado
+            response.streaming_content = self.acompanhar_streaming(request, response.streaming_content, medicao, inicio)
+        else:
+            if response.streaming:
+                medicao.bytes = int(response.get('Content-Length') or 0) # Arquivo: tamanho do cabeçalho
+            else:
+                medicao.bytes = len(response.content)
+            total = time.perf_counter() - inicio
+            response['Server-Timing'] = self.server_timing(medicao, total)
+            self.finalizar(request, response, medicao, total)
+        return response
+
+    def acompanhar_streaming(self, request, conteudo, medicao, inicio):
+        iterador = iter(conteudo)
+        try:
+            while True:
+                # Medição ativa só enquanto o próximo bloco é gerado (nunca entre um yield e outro)
+                with medindo(medicao):
+                    parte = next(iterador, None)
+                if parte is None:
+                    break
+                medicao.bytes += len(parte)
+                yield parte
+        finally:
+            self.finalizar(request, None, medicao, time.perf_counter() - inicio)
+
+    def server_timing(self, medicao, total):
+        return (
+            f'db;dur={medicao.db * 1000:.1f};desc="{medicao.consultas} consultas", '
+            f'render;dur={medicao.render * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+
+    def finalizar(self, request, response, medicao, total):
+        rota = request.resolver_match
+        view = rota.view_name if rota else 'sem_rota'
+        total_ms = total * 1000
+        registro.registrar(view, total_ms, medicao.db * 1000, medicao.render * 1000, medicao.consultas, medicao.bytes)
+
+        if self.limite_lento_ms and total_ms >= self.limite_lento_ms:
+            mais_lentas = '\n'.join(
+                f"  {duracao * 1000:8.1f} ms  {sql[:LIMITE_SQL_LOG]}"
+                for duracao, sql in sorted(medicao.mais_lentas, reverse=True)
+            )
+            logger.warning(
+                "Requisição lenta: %s %s (%s) status %s, %.0f ms, %d consultas (%.0f ms no banco), "
+                "%.0f ms de template, %d bytes\nConsultas mais lentas:\n%s",
+                request.method, request.get_full_path(), view,
+                response.status_code if response is not None else 'streaming',
+                total_ms, medicao.consultas, medicao.db * 1000, medicao.render * 1000, medicao.bytes,
+                mais_lentas or '  (nenhuma)',
+            )
+
+
+class WhiteNoiseHibridoMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise que também atende em modo assíncrono. O original é só síncrono: num servidor
+    ASGI o Django rodaria todo o resto da cadeia (e as views async) dentro de uma thread.
+    """
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # Desenvolvimento: procura o arquivo no disco a cada requisição
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class AdminSobDemandaMiddleware:
+    """
+    ADMIN_SOB_DEMANDA=True: as requisições de /admin/ usam o urlconf core/urls_admin.py
+    (request.urlconf), que carrega os admin.py na primeira vez. As demais páginas usam o
+    core/urls.py sem o Admin, então resolver ou reverter as URLs do site não o carrega.
+    Desligado, o Django descarta o middleware na inicialização.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.ADMIN_SOB_DEMANDA:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # /admin sem a barra também (o APPEND_SLASH procura /admin/ no urlconf da requisição),
+        # mas não outras rotas que só começam com as mesmas letras (/administracao/)
+        if request.path_info == '/admin' or request.path_info.startswith('/admin/'):
+            request.urlconf = 'core.urls_admin'
+        return self.get_response(request) # No modo assíncrono devolve a corrotina da cadeia
@@ -11,15 +11,19 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from dotenv import load_dotenv
 import os
-import dj_database_url
 
-load_dotenv()
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Partida a frio (Vercel): o .env só existe no desenvolvimento; em produção as variáveis já
+# vêm do ambiente e nem o python-dotenv é importado (nem procurado pelas pastas acima)
+if (BASE_DIR / ".env").exists():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / ".env")
+
 SECRET_KEY = os.environ.get("SECRET_KEY")
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -28,11 +32,18 @@ DEBUG = os.environ.get("DEBUG") == "True"
 
 ALLOWED_HOSTS = os.environ.get("ALLOWED_HOSTS", "").split(",")
 
+# Admin sob demanda (api/index.py liga por padrão): os admin.py só são importados na primeira
+# requisição de /admin/ (core/urls_admin.py, via AdminSobDemandaMiddleware), não na partida
+# de cada instância. Medido por
+# `python manage.py benchmark partida_a_frio`
+ADMIN_SOB_DEMANDA = os.environ.get("ADMIN_SOB_DEMANDA") == "True"
+
 # Application definition
 
 INSTALLED_APPS = [
     "jazzmin",
-    "django.contrib.admin",
+    # SimpleAdminConfig é o mesmo Admin sem o autodiscover() no setup
+    "django.contrib.admin.apps.SimpleAdminConfig" if ADMIN_SOB_DEMANDA else "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -43,7 +54,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.middleware.WhiteNoiseHibridoMiddleware",
+    "core.middleware.AdminSobDemandaMiddleware",
+    "core.middleware.MetricasRequisicaoMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -79,13 +92,62 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Transações IMMEDIATE pegam o lock de escrita já no BEGIN: escritas simultâneas
+            # esperam na fila (até o timeout) em vez de falharem com "database is locked".
+            # Vale para todo atomic(), inclusive os só de leitura (ex: o Admin abre um na tela
+            # de edição mesmo no GET), que também entram na fila: no código do app, atomic()
+            # fica só em volta de gravações; leituras rodam em autocommit e não esperam
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
     }
 }
 
 database_url = os.environ.get("DATABASE_URL")
 if database_url:
+    import dj_database_url
     DATABASES["default"] = dj_database_url.parse(database_url)
 
+# Conexões persistentes: segundos que uma conexão é reaproveitada entre requisições do mesmo
+# processo (0 = abre e fecha uma por requisição, com o handshake TLS toda vez)
+DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", 0))
+# Testa a conexão reaproveitada antes do uso (o servidor/pooler pode tê-la derrubado enquanto ociosa)
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = os.environ.get("DB_CONN_HEALTH_CHECKS") == "True"
+
+# Pool de conexões no próprio processo (só PostgreSQL, requer psycopg 3:
+# pip install "psycopg[binary,pool]"). Substitui as conexões persistentes
+if os.environ.get("DB_POOL") == "True" and DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0 # O Django não aceita pool junto com CONN_MAX_AGE
+    DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+        "min_size": int(os.environ.get("DB_POOL_MIN", 1)),
+        "max_size": int(os.environ.get("DB_POOL_MAX", 4)),
+        "timeout": int(os.environ.get("DB_POOL_TIMEOUT", 10)), # Espera por uma conexão livre (s)
+    }
+
+# Atrás de um pooler externo em modo transação/statement (PgBouncer, endpoint "-pooler" do Neon)
+# a conexão muda entre transações: cursores nomeados do .iterator() não sobrevivem. Sem eles,
+# exportações e reconstruções leem cada consulta inteira para a memória antes de iterar
+if os.environ.get("DB_POOLER") == "True":
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+
+
+# Cache (catálogo, categorias e tabela do Dashboard; ver estoque/caches.py)
+# LocMem é por processo: cada worker monta o próprio conteúdo, mas as versões (invalidação)
+# ficam no banco e valem para todos. Para compartilhar também o conteúdo, ex:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+# Limite de entradas (LocMem, arquivo e banco; padrão 300). No Redis/Memcached o limite é do servidor
+cache_max_entries = os.environ.get("CACHE_MAX_ENTRIES")
+if cache_max_entries:
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": int(cache_max_entries)}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -170,6 +232,7 @@ JAZZMIN_SETTINGS = {
         "estoque.Categoria": "fas fa-tags",
         "estoque.Produto": "fas fa-box-open",
         "estoque.Movimentacao": "fas fa-exchange-alt",
+        "estoque.SaldoDiario": "fas fa-calendar-day",
     },
     # Ordem do Menu Lateral
     "order_with_respect_to": ["estoque", "auth"],
@@ -211,3 +274,69 @@ JAZZMIN_UI_TWEAKS = {
 LOGIN_URL = "login"  # Se tentar acessar algo restrito, vai pra cá
 LOGIN_REDIRECT_URL = "dashboard"  # Se acertar a senha, vai pra cá
 LOGOUT_REDIRECT_URL = "login"  # Se sair, volta pra tela de login
+
+# O índice de movimentações por produto usa colunas extras (INCLUDE) no PostgreSQL;
+# no SQLite elas são simplesmente ignoradas, então o aviso não se aplica.
+SILENCED_SYSTEM_CHECKS = ["models.W040"]
+
+# Configurações do ESTOQUE
+# Modo auditoria: cada movimentação recalcula o saldo somando todo o histórico do produto
+# (mais lento, útil para conferência). Desligado, o saldo é atualizado só pela diferença.
+ESTOQUE_MODO_AUDITORIA = os.environ.get("ESTOQUE_MODO_AUDITORIA") == "True"
+
+# Exportações em segundo plano (relatórios grandes do Histórico)
+# Pasta onde ficam os arquivos gerados (na Vercel, só /tmp é gravável)
+ESTOQUE_EXPORTACOES_DIR = os.environ.get("ESTOQUE_EXPORTACOES_DIR", os.path.join(BASE_DIR, "exportacoes"))
+# Tempo (segundos) que um arquivo pronto é reaproveitado por pedidos com os mesmos filtros
+ESTOQUE_EXPORTACAO_TTL = int(os.environ.get("ESTOQUE_EXPORTACAO_TTL", 3600))
+# Tempo (segundos) até um job "Em processamento" ser dado como abandonado (worker que morreu) e removido.
+# Precisa ficar bem acima da exportação mais demorada: o job removido descarta o arquivo ao terminar
+ESTOQUE_EXPORTACAO_LIMITE_EXECUCAO = int(os.environ.get("ESTOQUE_EXPORTACAO_LIMITE_EXECUCAO", 6 * 3600))
+# "comando" (padrão): os jobs esperam o `python manage.py processar_exportacoes --continuo`, rodando
+#   numa máquina que grava na mesma ESTOQUE_EXPORTACOES_DIR de onde os servidores web servem o download
+# "thread": o próprio processo web gera o arquivo num pool de threads (só em servidor de processo
+#   longo com uma instância, ex: gunicorn numa VM; em serverless a thread congela depois da resposta)
+# "desligado": sem exportação em segundo plano, só a em streaming. Padrão na Vercel (api/index.py):
+#   o disco é só leitura e o /tmp de uma instância não é visto pelas outras
+ESTOQUE_EXPORTACAO_EXECUTOR = os.environ.get("ESTOQUE_EXPORTACAO_EXECUTOR", "comando")
+if ESTOQUE_EXPORTACAO_EXECUTOR not in ("comando", "thread", "desligado"):
+    raise ImproperlyConfigured("ESTOQUE_EXPORTACAO_EXECUTOR deve ser 'comando', 'thread' ou 'desligado'.")
+if os.environ.get("VERCEL") and ESTOQUE_EXPORTACAO_EXECUTOR == "thread":
+    raise ImproperlyConfigured("ESTOQUE_EXPORTACAO_EXECUTOR='thread' não funciona na Vercel (a thread congela depois da resposta).")
+ESTOQUE_EXPORTACAO_WORKERS = int(os.environ.get("ESTOQUE_EXPORTACAO_WORKERS", 2))
+
+# Busca de produtos do Dashboard: "auto" usa trigramas no PostgreSQL e FTS5 no SQLite
+# ("postgres", "fts5" ou "simples" forçam um backend; "simples" = icontains sem índice)
+ESTOQUE_BUSCA_BACKEND = os.environ.get("ESTOQUE_BUSCA_BACKEND", "auto")
+# Segundos até o índice do autocompletar (em memória, por processo) ser remontado em segundo plano
+ESTOQUE_AUTOCOMPLETAR_TTL = int(os.environ.get("ESTOQUE_AUTOCOMPLETAR_TTL", 300))
+# SKUs reservados por vez em cada processo (1 = uma ida ao banco por produto, sem buracos na sequência)
+ESTOQUE_SKU_BLOCO = int(os.environ.get("ESTOQUE_SKU_BLOCO", 1))
+# Admin de Movimentações para tabelas grandes: total estimado (PostgreSQL), filtros em cache
+# e navegação por data a partir do SaldoDiario (sem COUNT(*) e DISTINCT na tabela toda)
+ESTOQUE_ADMIN_TABELA_GRANDE = os.environ.get("ESTOQUE_ADMIN_TABELA_GRANDE") == "True"
+# Segundos que cada página da tabela do Dashboard fica no cache (0 desliga); mudanças em
+# produtos, saldos e categorias invalidam antes disso. Acertos/falhas em /metricas/caches/
+ESTOQUE_CACHE_DASHBOARD = int(os.environ.get("ESTOQUE_CACHE_DASHBOARD", 300))
+
+# Chave de idempotência nos formulários de movimentação (estoque/idempotencia.py): segundos que
+# a resposta fica guardada para repetições do mesmo pedido, e intervalo mínimo entre as limpezas
+# das respostas vencidas (cada processo limpa por conta própria, no próprio POST)
+ESTOQUE_IDEMPOTENCIA_TTL = int(os.environ.get("ESTOQUE_IDEMPOTENCIA_TTL", 60 * 60 * 24))
+ESTOQUE_IDEMPOTENCIA_LIMPEZA = int(os.environ.get("ESTOQUE_IDEMPOTENCIA_LIMPEZA", 300))
+# Segundos que a chave fica reservada enquanto o primeiro pedido roda (reenvios recebem 409). Depois
+# disso a reserva é dada como abandonada (processo que morreu) e um reenvio a assume e grava de novo:
+# precisa ficar bem acima do tempo limite de uma requisição (gunicorn, proxy, Vercel)
+ESTOQUE_IDEMPOTENCIA_RESERVA = int(os.environ.get("ESTOQUE_IDEMPOTENCIA_RESERVA", 600))
+
+# Views assíncronas (estoque/views_async.py) no Dashboard, Histórico, catálogo, autocompletar e
+# exportação. Para servidores ASGI (core/asgi.py); no WSGI cada uma rodaria num event loop próprio
+ESTOQUE_VIEWS_ASYNC = os.environ.get("ESTOQUE_VIEWS_ASYNC") == "True"
+
+# Instrumentação por requisição (core/middleware.py): consultas, tempo de banco e de template
+# por view, cabeçalho Server-Timing e histograma em /metricas/requisicoes/ (só superusuário)
+METRICAS_REQUISICOES = os.environ.get("METRICAS_REQUISICOES") == "True"
+# Requisições guardadas por view (janela móvel dos percentis e do histograma)
+METRICAS_AMOSTRAS = int(os.environ.get("METRICAS_AMOSTRAS", 1000))
+# Requisições mais lentas que isso (ms) vão para o log com as consultas mais lentas (0 desliga)
+METRICAS_REQUISICAO_LENTA_MS = int(os.environ.get("METRICAS_REQUISICAO_LENTA_MS", 1000))
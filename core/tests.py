@@ -0,0 +1,58 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from estoque.tests.base import criar_admin, criar_operador
+
+from .metricas import FAIXAS_MS, registro
+
+
+@override_settings(METRICAS_REQUISICOES=True, METRICAS_REQUISICAO_LENTA_MS=0)
+class MetricasRequisicaoTests(TestCase):
+    """Instrumentação por requisição: Server-Timing, janela por view (só superusuário) e log das lentas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_admin()
+        cls.operador = criar_operador()
+
+    def setUp(self):
+        registro.limpar()
+        self.addCleanup(registro.limpar)
+        self.client.force_login(self.admin)
+
+    def test_cabecalho_server_timing(self):
+        resposta = self.client.get(reverse('dashboard'))
+        self.assertRegex(resposta['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ consultas", render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_metricas_so_para_superusuario(self):
+        url = reverse('metricas_requisicoes')
+        for _ in range(3):
+            self.client.get(reverse('dashboard'))
+
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        dashboard = resposta.json()['views']['dashboard']
+        self.assertEqual((dashboard['requisicoes'], dashboard['janela']), (3, 3))
+        self.assertEqual(list(dashboard['histograma_total_ms'])[-1], f'>{FAIXAS_MS[-1]}')
+        self.assertEqual(sum(dashboard['histograma_total_ms'].values()), 3)
+        self.assertGreater(dashboard['consultas']['p50'], 0)
+
+        self.client.post(url) # POST zera a janela
+        self.assertNotIn('dashboard', self.client.get(url).json()['views'])
+
+        self.client.force_login(self.operador)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.logout()
+        self.assertRedirects(self.client.get(url), f"{reverse('login')}?next={url}", fetch_redirect_response=False)
+
+    @override_settings(METRICAS_REQUISICAO_LENTA_MS=1)
+    def test_requisicao_lenta_vai_para_o_log(self):
+        with self.assertLogs('core.metricas', 'WARNING') as log:
+            self.client.get(reverse('dashboard'))
+        self.assertIn('Requisição lenta: GET / (dashboard)', log.output[0])
+        self.assertIn('Consultas mais lentas:', log.output[0])
+
+    @override_settings(METRICAS_REQUISICAO_LENTA_MS=60_000)
+    def test_abaixo_do_limite_nao_loga(self):
+        with self.assertNoLogs('core.metricas', 'WARNING'):
+            self.client.get(reverse('dashboard'))
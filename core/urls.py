@@ -14,10 +14,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from .metricas import metricas_requisicoes
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    path('metricas/requisicoes/', metricas_requisicoes, name='metricas_requisicoes'),
     path('', include('estoque.urls'))
 ]
+
+# Com ADMIN_SOB_DEMANDA=True as URLs do Admin ficam em core/urls_admin.py, usado só nas
+# requisições de /admin/ (AdminSobDemandaMiddleware em core/middleware.py)
+if not settings.ADMIN_SOB_DEMANDA:
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
@@ -0,0 +1,18 @@
+"""
+URLs das requisições de /admin/ com ADMIN_SOB_DEMANDA=True (ver AdminSobDemandaMiddleware).
+
+Importado só na primeira requisição do Admin: é aqui que os admin.py dos apps são
+registrados (autodiscover), e não na inicialização do processo. As URLs do site vêm junto,
+para os links do Admin (ex: "Ver site") continuarem funcionando.
+"""
+from django.contrib import admin
+from django.urls import path
+
+from .urls import urlpatterns as urls_site
+
+admin.autodiscover()
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    *urls_site,
+]
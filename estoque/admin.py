@@ -1,20 +1,45 @@
+from django.conf import settings
 from django.contrib import admin
+from django.db.models import Count
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
 from django.utils.html import format_html
-from .models import Produto, Movimentacao, Categoria
+from .models import Produto, Movimentacao, Categoria, SaldoDiario
+from .concorrencia import com_retentativas
+from .busca import buscar_produtos
+from .paginacao import PaginadorEstimado
+from .filtros_admin import ResponsavelFilter, CategoriaProdutoFilter, MesFilter, DiaFilter
 
 # 1. Configuração da Categoria
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
     list_display = ('nome', 'total_produtos')
     search_fields = ('nome',)
-    
+
+    def get_queryset(self, request):
+        # Conta os produtos na mesma consulta da listagem (evita um COUNT por linha)
+        return super().get_queryset(request).annotate(qtd_produtos=Count('produtos'))
+
     def total_produtos(self, obj):
-        return obj.produtos.count()
+        return obj.qtd_produtos
     total_produtos.short_description = 'Qtd Produtos'
+    total_produtos.admin_order_field = 'qtd_produtos'
 
 # 2. Configuração Inline (Histórico dentro do Produto)
+LIMITE_HISTORICO_INLINE = 20
+
+class HistoricoRecenteFormSet(BaseInlineFormSet):
+    # Só as últimas movimentações: produtos com 100 mil registros não podem montar 100 mil linhas
+    def get_queryset(self):
+        # Guardado como lista: cada linha do formset chama get_queryset() de novo
+        if not hasattr(self, '_historico_recente'):
+            self._historico_recente = list(super().get_queryset()[:LIMITE_HISTORICO_INLINE])
+        return self._historico_recente
+
 class MovimentacaoInline(admin.TabularInline):
     model = Movimentacao
+    formset = HistoricoRecenteFormSet
+    verbose_name_plural = f"Últimas {LIMITE_HISTORICO_INLINE} movimentações"
     extra = 0
     readonly_fields = ('tipo_badge', 'quantidade', 'solicitante_nome', 'created_at')
     fields = ('created_at', 'tipo_badge', 'quantidade', 'solicitante_nome')
@@ -36,18 +61,25 @@ class ProdutoAdmin(admin.ModelAdmin):
     list_display = ('nome', 'categoria', 'quantidade', 'sku', 'status_estoque')
     list_filter = ('categoria',)
     search_fields = ('nome', 'sku')
+    list_select_related = ('categoria',)
     
     # O SKU agora é somente leitura, assim como a Quantidade
-    readonly_fields = ('quantidade', 'sku') 
+    readonly_fields = ('quantidade', 'sku', 'historico_completo') 
     
     inlines = [MovimentacaoInline]
     
     list_per_page = 20
 
+    def get_search_results(self, request, queryset, search_term):
+        # Busca global do Jazzmin e autocomplete do Admin usam o índice de busca (sem acento)
+        if not search_term:
+            return queryset, False
+        return buscar_produtos(queryset, search_term), False
+
     # Organização visual do formulário de edição
     fieldsets = (
         ('Dados Principais', {
-            'fields': ('nome', 'categoria', 'sku')
+            'fields': ('nome', 'categoria', 'sku', 'historico_completo')
         }),
         ('Estoque e Valores', {
             'fields': ('quantidade', 'preco'),
@@ -73,13 +105,22 @@ class ProdutoAdmin(admin.ModelAdmin):
         )
     status_estoque.short_description = 'Estoque Atual'
 
+    def historico_completo(self, obj):
+        # O inline mostra só as últimas; o histórico inteiro fica na listagem paginada de Movimentações
+        if not obj.pk:
+            return "-"
+        url = reverse('admin:estoque_movimentacao_changelist') + f'?produto__id__exact={obj.pk}'
+        return format_html('<a href="{}">Ver todas as movimentações</a>', url)
+    historico_completo.short_description = 'Histórico'
+
 # 4. Configuração da Movimentação (Log Geral)
 @admin.register(Movimentacao)
 class MovimentacaoAdmin(admin.ModelAdmin):
     list_display = ('data_formatada', 'badge_tipo', 'produto', 'quantidade', 'usuario', 'solicitante_info', 'observacao_curta')
     list_filter = ('tipo', 'usuario', 'created_at', 'produto__categoria')
     search_fields = ('produto__nome', 'solicitante_nome', 'solicitante_cpf')
-    date_hierarchy = 'created_at'
+    # Produto e usuário vêm na mesma consulta da listagem (sem uma consulta extra por linha)
+    list_select_related = ('produto', 'usuario')
     
     # Define quais campos aparecem no formulário de criação
     fields = ('tipo', 'produto', 'quantidade', 'solicitante_nome', 'solicitante_cpf', 'observacao')
@@ -100,6 +141,14 @@ class MovimentacaoAdmin(admin.ModelAdmin):
             
         super().save_model(request, obj, form, change)
 
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        # Retentativa em conflito de lock, como nas telas. O Admin abre a transação dentro do
+        # changeform_view: no save_model ela rodaria uma vez só; aqui cada tentativa refaz tudo
+        if request.method != 'POST':
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        enviar = super().changeform_view
+        return com_retentativas(lambda: enviar(request, object_id, form_url, extra_context))
+
     # --- 2. PERMISSÕES: Histórico Imutável ---
     
     def has_add_permission(self, request):
@@ -141,7 +190,6 @@ class MovimentacaoAdmin(admin.ModelAdmin):
     list_display = ('data_formatada', 'badge_tipo', 'produto', 'quantidade', 'usuario', 'solicitante_info', 'observacao_curta')
     list_filter = ('tipo', 'usuario', 'created_at', 'produto__categoria')
     search_fields = ('produto__nome', 'solicitante_nome', 'solicitante_cpf')
-    date_hierarchy = 'created_at'
     
     def observacao_curta(self, obj):
         if obj.observacao:
@@ -190,4 +238,51 @@ class MovimentacaoAdmin(admin.ModelAdmin):
             cpf = obj.solicitante_cpf or 'S/ CPF'
             return f"{obj.solicitante_nome} ({cpf})"
         return "-"
-    solicitante_info.short_description = 'Destino'
\ No newline at end of file
+    solicitante_info.short_description = 'Destino'
+
+    # 4. TABELAS GRANDES (ESTOQUE_ADMIN_TABELA_GRANDE)
+    # Sem COUNT(*) exato nem SELECT DISTINCT de datas a cada carregamento: total estimado,
+    # opções dos filtros em cache e navegação por data (Mês/Dia) a partir do SaldoDiario
+
+    @property
+    def date_hierarchy(self):
+        return None if settings.ESTOQUE_ADMIN_TABELA_GRANDE else 'created_at'
+
+    @property
+    def show_full_result_count(self):
+        # O "X de Y" do topo faria um segundo COUNT(*) da tabela inteira
+        return not settings.ESTOQUE_ADMIN_TABELA_GRANDE
+
+    @property
+    def show_facets(self):
+        # Contagens por opção de filtro = um COUNT por opção
+        if settings.ESTOQUE_ADMIN_TABELA_GRANDE:
+            return admin.ShowFacets.NEVER
+        return admin.ShowFacets.ALLOW
+
+    def get_list_filter(self, request):
+        if settings.ESTOQUE_ADMIN_TABELA_GRANDE:
+            return ('tipo', ResponsavelFilter, CategoriaProdutoFilter, MesFilter, DiaFilter)
+        return self.list_filter
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        if settings.ESTOQUE_ADMIN_TABELA_GRANDE:
+            return PaginadorEstimado(queryset, per_page, orphans, allow_empty_first_page)
+        return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+
+# 5. Fotografias Diárias de Saldo (somente leitura, mantidas automaticamente)
+@admin.register(SaldoDiario)
+class SaldoDiarioAdmin(admin.ModelAdmin):
+    list_display = ('data', 'produto', 'saldo_inicial', 'entradas', 'saidas', 'saldo_final')
+    list_filter = ('produto__categoria',)
+    search_fields = ('produto__nome', 'produto__sku')
+    list_select_related = ('produto',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
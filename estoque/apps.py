@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class EstoqueConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'estoque'
+
+    def ready(self):
+        # Registra os sinais de invalidação de cache
+        from . import signals # noqa: F401
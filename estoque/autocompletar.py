@@ -0,0 +1,276 @@
+"""
+Autocompletar de produtos (busca enquanto digita) sem ir ao banco a cada tecla.
+
+Cada processo mantém na memória uma lista ordenada de chaves normalizadas (sem acento,
+minúsculas): o nome a partir de cada palavra ("coca-cola zero", "cola zero", "zero") e o
+SKU. Uma busca por prefixo é um bisect nessa lista, e os resultados saem ordenados pelo
+volume movimentado recentemente (SaldoDiario dos últimos DIAS_VOLUME dias).
+
+O índice é montado na primeira busca, atualizado pelos sinais do Produto/Movimentacao
+do próprio processo e remontado em segundo plano a cada ESTOQUE_AUTOCOMPLETAR_TTL
+segundos (pega as mudanças feitas por outros processos e cargas em massa). As mudanças
+que chegam durante a remontagem são aplicadas também ao índice novo.
+
+Usado pela busca de produto da Saída Rápida.
+"""
+import heapq
+import logging
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .busca import normalizar
+
+logger = logging.getLogger(__name__)
+
+LIMITE_CHAVE = 40          # Ninguém digita mais que isso num autocompletar: chaves mais curtas, menos memória
+LIMITE_VARREDURA = 2000    # Acima disso o prefixo é "amplo" (ex: "a") e não vale ordenar o intervalo todo
+TOTAL_POPULARES = 2000     # Produtos mais movimentados consultados primeiro nos prefixos amplos
+DIAS_VOLUME = 30
+
+
+def chaves_produto(nome, sku):
+    texto = normalizar(nome)
+    # Uma chave a partir de cada palavra (inclusive depois de hífen: "coca-cola" -> "cola")
+    chaves = {texto[palavra.start():][:LIMITE_CHAVE] for palavra in re.finditer(r'\w+', texto)}
+    if sku:
+        chaves.add(normalizar(sku)[:LIMITE_CHAVE])
+    chaves.discard('')
+    return chaves
+
+
+def entrada(chave, pk):
+    return f"{chave}\0{pk}"
+
+
+def limite_superior(prefixo):
+    """Menor texto maior que todos os que começam com `prefixo` (fim do intervalo no bisect)."""
+    return prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
+
+
+class IndicePrefixos:
+    def __init__(self):
+        self.chaves = []           # "chave\0id", ordenada (o id no fim deixa cada entrada única)
+        self.ids = array('q')      # ids[i] é o produto de chaves[i]
+        self.produtos = {}         # id -> (nome, sku, categoria_id)
+        self.volume = {}           # id -> quantidade movimentada nos últimos DIAS_VOLUME dias
+        self.populares = []        # (id, chaves) em ordem decrescente de volume
+        self.pendentes = None      # Mudanças recebidas durante uma remontagem (ver _remontar)
+        self.substituto = None     # Índice remontado que tomou o lugar deste
+        self.trava = threading.Lock()
+
+    @classmethod
+    def construir(cls):
+        from .models import Produto
+
+        indice = cls()
+        for pk, nome, sku, categoria_id in (
+            Produto.objects.values_list('pk', 'nome', 'sku', 'categoria_id').iterator(chunk_size=10_000)
+        ):
+            indice.produtos[pk] = (nome, sku, categoria_id)
+            indice.chaves.extend(entrada(chave, pk) for chave in chaves_produto(nome, sku))
+
+        # Strings simples (e não tuplas) ordenadas no lugar: bem menos memória com milhões de chaves
+        indice.chaves.sort()
+        indice.ids = array('q', (int(chave.rpartition('\0')[2]) for chave in indice.chaves))
+        indice.carregar_volume()
+        return indice
+
+    def carregar_volume(self):
+        """
+        Volume recente por produto, somado das fotografias diárias (sem varrer movimentações),
+        ou das movimentações do período enquanto as fotografias não o cobrem.
+        """
+        from .models import Movimentacao, SaldoDiario
+        from .saldos import fotografias_cobrem, inicio_do_dia
+
+        desde = timezone.localdate() - timedelta(days=DIAS_VOLUME)
+        if fotografias_cobrem(desde):
+            volume = SaldoDiario.objects.filter(data__gte=desde).values('produto_id').annotate(total=Sum(F('entradas') + F('saidas')))
+        else:
+            volume = Movimentacao.objects.filter(created_at__gte=inicio_do_dia(desde)).order_by().values('produto_id').annotate(total=Sum('quantidade'))
+        self.volume = dict(volume.values_list('produto_id', 'total'))
+        mais_movimentados = heapq.nlargest(TOTAL_POPULARES, self.volume, key=self.volume.get)
+        self.populares = [
+            (pk, chaves_produto(*self.produtos[pk][:2])) for pk in mais_movimentados if pk in self.produtos
+        ]
+
+    # --- Atualização incremental (sinais) ---
+
+    def _adicionar(self, pk, nome, sku, categoria_id):
+        for chave in chaves_produto(nome, sku):
+            chave = entrada(chave, pk)
+            posicao = bisect_left(self.chaves, chave)
+            self.chaves.insert(posicao, chave)
+            self.ids.insert(posicao, pk)
+        self.produtos[pk] = (nome, sku, categoria_id)
+
+    def _remover(self, pk):
+        dados = self.produtos.pop(pk, None)
+        if dados is None:
+            return
+        for chave in chaves_produto(dados[0], dados[1]):
+            chave = entrada(chave, pk)
+            posicao = bisect_left(self.chaves, chave)
+            if posicao < len(self.chaves) and self.chaves[posicao] == chave:
+                del self.chaves[posicao]
+                del self.ids[posicao]
+
+    def _atualizar(self, pk, nome, sku, categoria_id):
+        if self.produtos.get(pk) == (nome, sku, categoria_id):
+            return # Ex: save() que só mexeu no saldo
+        self._remover(pk)
+        self._adicionar(pk, nome, sku, categoria_id)
+
+    def _registrar_movimentos(self, volumes):
+        for pk, quantidade in volumes.items():
+            self.volume[pk] = self.volume.get(pk, 0) + quantidade
+
+    def _mudar(self, metodo, *args):
+        """
+        Aplica uma mudança dos sinais. Durante uma remontagem ela também fica guardada para
+        o índice novo; depois da troca, quem ainda tiver este índice em mãos repassa ao novo.
+        """
+        with self.trava:
+            substituto = self.substituto
+            if substituto is None:
+                getattr(self, metodo)(*args)
+                if self.pendentes is not None:
+                    self.pendentes.append((metodo, args))
+                return
+        substituto._mudar(metodo, *args)
+
+    def atualizar(self, pk, nome, sku, categoria_id):
+        self._mudar('_atualizar', pk, nome, sku, categoria_id)
+
+    def remover(self, pk):
+        self._mudar('_remover', pk)
+
+    def registrar_movimento(self, pk, quantidade):
+        self._mudar('_registrar_movimentos', {pk: quantidade})
+
+    def registrar_movimentos(self, volumes):
+        """registrar_movimento() de vários produtos ({id: quantidade}) de uma vez."""
+        self._mudar('_registrar_movimentos', volumes)
+
+    # --- Consulta ---
+
+    def buscar(self, termo, limite=10, categoria_id=None):
+        """Devolve até `limite` tuplas (id, nome, sku, categoria_id), mais movimentados primeiro."""
+        prefixo = normalizar(termo)[:LIMITE_CHAVE]
+        if not prefixo:
+            return []
+
+        def aceita(pk):
+            return categoria_id is None or self.produtos[pk][2] == categoria_id
+
+        with self.trava:
+            inicio = bisect_left(self.chaves, prefixo)
+            fim = bisect_left(self.chaves, limite_superior(prefixo), inicio)
+
+            if fim - inicio <= LIMITE_VARREDURA:
+                candidatos = {pk for pk in self.ids[inicio:fim] if aceita(pk)}
+                melhores = heapq.nsmallest(
+                    limite, candidatos, key=lambda pk: (-self.volume.get(pk, 0), self.produtos[pk][0])
+                )
+            else:
+                # Prefixo amplo: primeiro os mais movimentados que casam, depois completa
+                # com os primeiros do intervalo (ordem alfabética)
+                melhores = []
+                for pk, chaves in self.populares:
+                    if len(melhores) == limite:
+                        break
+                    if aceita(pk) and any(chave.startswith(prefixo) for chave in chaves):
+                        melhores.append(pk)
+
+                if len(melhores) < limite:
+                    vistos = set(melhores)
+                    for pk in self.ids[inicio:inicio + LIMITE_VARREDURA]:
+                        if pk not in vistos and aceita(pk):
+                            vistos.add(pk)
+                            melhores.append(pk)
+                            if len(melhores) == limite:
+                                break
+
+            return [(pk, *self.produtos[pk]) for pk in melhores]
+
+
+# --- Índice do processo ---
+
+_indice = None
+_montado_em = 0.0
+_remontando = False
+_trava_indice = threading.Lock()
+
+
+def indice_produtos():
+    """Índice do processo: montado na primeira chamada e remontado em segundo plano quando vence."""
+    global _indice, _montado_em, _remontando
+
+    if _indice is None:
+        with _trava_indice:
+            if _indice is None:
+                _indice = IndicePrefixos.construir()
+                _montado_em = time.monotonic()
+    elif time.monotonic() - _montado_em > settings.ESTOQUE_AUTOCOMPLETAR_TTL and not _remontando:
+        with _trava_indice:
+            if not _remontando:
+                _remontando = True
+                # Enquanto remonta, as buscas continuam usando o índice atual
+                threading.Thread(target=_remontar, name='autocompletar', daemon=True).start()
+
+    return _indice
+
+
+def _remontar():
+    global _indice, _montado_em, _remontando
+    atual = _indice
+    with atual.trava:
+        atual.pendentes = []
+    try:
+        novo = IndicePrefixos.construir()
+        with atual.trava:
+            # O que chegou pelos sinais enquanto o banco era lido vai também para o índice novo
+            # (atualizar e remover são idempotentes; um movimento pode contar duas vezes no
+            # volume, que só serve para ordenar as sugestões)
+            for metodo, args in atual.pendentes:
+                getattr(novo, metodo)(*args)
+            atual.pendentes = None
+            atual.substituto = novo
+            _indice, _montado_em = novo, time.monotonic()
+    except Exception:
+        logger.exception("Falha ao remontar o índice do autocompletar")
+        with atual.trava:
+            atual.pendentes = None
+        _montado_em = time.monotonic() # Tenta de novo só no próximo vencimento
+    finally:
+        _remontando = False
+        close_old_connections()
+
+
+def indice_carregado():
+    """Índice atual, sem montar (os sinais só mantêm o índice de quem já buscou algo)."""
+    return _indice
+
+
+def registrar_volume_em_massa(volumes):
+    """
+    Soma ao índice do processo o volume ({id: quantidade}) gravado com bulk_create, que não
+    dispara o sinal da Movimentacao. Só depois do commit, como o sinal.
+    """
+    indice = indice_carregado()
+    if indice is not None and volumes:
+        transaction.on_commit(lambda: indice.registrar_movimentos(volumes))
+
+
+def descartar_indice():
+    global _indice
+    _indice = None
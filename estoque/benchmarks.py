@@ -0,0 +1,1254 @@
+"""
+Cenários de benchmark do estoque.
+
+Cada cenário é uma função registrada com @cenario('nome') que recebe os parâmetros
+passados na linha de comando (-p chave=valor) e devolve uma lista de resultados (dicts).
+Cada cenário roda num banco descartável próprio, criado pelo comando `benchmark`
+(nunca no banco real): as linhas semeadas por um não aparecem nas medições do outro. Com --json os resultados são gravados junto com o ambiente
+(commit, banco, versões) e --comparar mostra a variação contra um JSON anterior.
+"""
+import asyncio
+import os
+import platform
+import random
+import csv
+import gzip
+import io
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.urls import urlpatterns as urls_core
+from . import sku, views_async
+from .models import Categoria, Produto, Movimentacao, SaldoDiario
+from .concorrencia import com_retentativas
+from .saldos import recalcular_saldos
+from .exportacao import ContadorLinhas, gerar_csv, linhas_relatorio, gerar_relatorio, parquet_disponivel
+from .importacao import importar_registros
+from .busca import BACKENDS, backend_busca, normalizar
+from .autocompletar import IndicePrefixos, descartar_indice
+from .caches import estatisticas
+from .paginacao import codificar_cursor
+from .urls import rotas_leitura
+from .gerador import PALAVRAS_PRODUTO, gerar_categorias, gerar_produtos, gerar_movimentacoes, gravar_saldos, gerar_dados
+
+CENARIOS = {}
+
+
+def cenario(nome):
+    def registrar(func):
+        CENARIOS[nome] = func
+        return func
+    return registrar
+
+
+# --- Parâmetros ---
+
+def param_int(params, chave, padrao):
+    return int(params.get(chave, padrao))
+
+
+def param_lista(params, chave, padrao):
+    if chave not in params:
+        return padrao
+    return [int(valor) for valor in params[chave].split(',') if valor]
+
+
+# --- Banco descartável ---
+
+@contextmanager
+def banco_descartavel():
+    nome_original = connection.settings_dict['NAME']
+
+    if connection.vendor == 'sqlite':
+        # Usa um arquivo em disco (e não memória) para medir o custo real de escrita
+        arquivo = tempfile.NamedTemporaryFile(prefix='bench_estoque_', suffix='.sqlite3', delete=False)
+        arquivo.close()
+        connection.settings_dict['TEST']['NAME'] = arquivo.name
+
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    # Nada do processo pode sobreviver do banco anterior: as versões do cache recomeçam do zero
+    # no banco novo (casariam com entradas antigas), e o índice de prefixos e os blocos de SKU
+    # apontariam para linhas que não existem mais
+    cache.clear()
+    estatisticas.limpar()
+    descartar_indice()
+    sku._blocos.clear()
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+        if connection.vendor == 'sqlite' and os.path.exists(arquivo.name):
+            os.remove(arquivo.name)
+
+
+# --- Medição ---
+
+def medir(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return resumir(tempos)
+
+
+def resumir(tempos):
+    tempos = sorted(tempos)
+    return {
+        'media_ms': round(statistics.mean(tempos), 3),
+        'p50_ms': round(tempos[len(tempos) // 2], 3),
+        'p95_ms': round(tempos[int(len(tempos) * 0.95) - 1], 3),
+    }
+
+
+# --- Resultados em JSON e comparação entre execuções ---
+
+def tipo_metrica(chave):
+    """
+    Pelo sufixo do nome: 'menor' (tempo, memória: quanto menor melhor), 'maior' (vazão),
+    'informativo' (percentuais já relativos) ou None para os campos que identificam a linha.
+    """
+    if chave.endswith('_por_s'):
+        return 'maior'
+    if chave.endswith(('_ms', '_us', '_s', '_mb')):
+        return 'menor'
+    if chave.endswith('_%'):
+        return 'informativo'
+    return None
+
+
+def identidade(resultado):
+    """Campos que não são métricas (cenário, parâmetros, contagens): a "chave" da linha."""
+    return tuple((chave, valor) for chave, valor in resultado.items() if tipo_metrica(chave) is None)
+
+
+def comparar_resultados(anteriores, atuais, tolerancia=10.0):
+    """
+    Compara cada linha de um cenário com a linha de mesma identidade de uma execução anterior.
+    Gera (linha atual, {métrica: variação %} ou None se não há correspondente, piorou).
+    """
+    por_identidade = {identidade(resultado): resultado for resultado in anteriores}
+    for atual in atuais:
+        anterior = por_identidade.get(identidade(atual))
+        if anterior is None:
+            yield atual, None, False
+            continue
+
+        variacoes, piorou = {}, False
+        for chave, valor in atual.items():
+            sentido = tipo_metrica(chave)
+            antes = anterior.get(chave)
+            numericos = isinstance(valor, (int, float)) and isinstance(antes, (int, float))
+            if sentido not in ('menor', 'maior') or not numericos or not antes:
+                continue
+            variacao = (valor / antes - 1) * 100
+            variacoes[chave] = round(variacao, 1)
+            piorou |= variacao > tolerancia if sentido == 'menor' else variacao < -tolerancia
+        yield atual, variacoes, piorou
+
+
+def ambiente():
+    """Onde os números foram medidos (vai junto no JSON para comparar execuções equivalentes)."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'data': timezone.now().isoformat(timespec='seconds'),
+        'banco': f"{connection.display_name} {'.'.join(map(str, connection.get_database_version()))}",
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'maquina': platform.platform(),
+    }
+
+
+# --- Dados de apoio ---
+
+def criar_produto_base(nome='Produto Benchmark'):
+    categoria, _ = Categoria.objects.get_or_create(nome='Benchmark')
+    return Produto.objects.create(nome=nome, categoria=categoria)
+
+
+def inflar_historico(produto, ate, lote=10_000):
+    """
+    Completa o histórico do produto até `ate` movimentações via bulk_create
+    (sem passar pelo save), e deixa o saldo coerente com o que foi inserido.
+    """
+    faltam = ate - produto.movimentacoes.count()
+    delta = 0
+
+    while faltam > 0:
+        tamanho = min(lote, faltam)
+        # Alterna entrada de 2 e saída de 1 para o saldo nunca ficar negativo
+        novas = [
+            Movimentacao(produto=produto, tipo='E' if i % 2 == 0 else 'S', quantidade=2 if i % 2 == 0 else 1)
+            for i in range(tamanho)
+        ]
+        Movimentacao.objects.bulk_create(novas, batch_size=2_000)
+        delta += sum(m.quantidade if m.tipo == 'E' else -m.quantidade for m in novas)
+        faltam -= tamanho
+
+    if delta:
+        produto.quantidade += delta
+        Produto.objects.filter(pk=produto.pk).update(quantidade=produto.quantidade)
+
+
+def criar_admin():
+    # Um cenário pode pedir o usuário mais de uma vez: reaproveita se já existir
+    usuario, _ = User.objects.get_or_create(username='benchmark', defaults={'is_staff': True, 'is_superuser': True})
+    return usuario
+
+
+def cliente_logado(usuario):
+    cliente = Client()
+    cliente.force_login(usuario)
+    return cliente
+
+
+def medir_paginas(cliente, paginas, amostras):
+    """Mede GETs completos (middlewares, view, template) de cada página {descrição: url}."""
+    resultados = []
+    for descricao, url in paginas.items():
+        resposta = cliente.get(url) # Aquece caches (sessão, templates) e confere a página
+        if resposta.status_code != 200:
+            raise RuntimeError(f"{url} respondeu {resposta.status_code}")
+        resultados.append({'pagina': descricao, 'url': url, **medir(lambda: cliente.get(url), amostras)})
+    return resultados
+
+
+def semear_catalogo(total_produtos, total_movimentacoes, total_categorias=10, semente=42, lote=10_000, dias=0):
+    """
+    Catálogo e histórico em massa (ver gerador.py), com saldos coerentes com o histórico.
+    Sem fotografias diárias nem índice de busca: cada cenário prepara o que for medir.
+    Retorna a lista de ids dos produtos.
+    """
+    categorias = gerar_categorias(total_categorias)
+    ids = gerar_produtos(categorias, total_produtos, 'BEN', semente, lote)
+    gravar_saldos(gerar_movimentacoes(ids, total_movimentacoes, dias, semente, lote))
+    return ids
+
+
+# --- Cenários ---
+
+@cenario('insercao')
+def bench_insercao(params):
+    """Latência de Movimentacao.save() conforme o histórico do produto cresce."""
+    historicos = param_lista(params, 'historicos', [100, 1_000, 10_000, 100_000, 1_000_000])
+    amostras = param_int(params, 'amostras', 200)
+    modos = params.get('modos', 'delta,auditoria').split(',')
+
+    produto = criar_produto_base()
+    resultados = []
+
+    for tamanho in sorted(historicos):
+        inflar_historico(produto, tamanho)
+
+        for modo in modos:
+            contador = iter(range(amostras))
+
+            def inserir():
+                # Alterna E/S de 1 unidade: o saldo fica estável durante a medição
+                tipo = 'E' if next(contador) % 2 == 0 else 'S'
+                Movimentacao(produto=produto, tipo=tipo, quantidade=1).save()
+
+            with override_settings(ESTOQUE_MODO_AUDITORIA=(modo == 'auditoria')):
+                resultado = medir(inserir, amostras)
+
+            resultados.append({'historico': tamanho, 'modo': modo, 'amostras': amostras, **resultado})
+
+    return resultados
+
+
+@cenario('concorrencia')
+def bench_concorrencia(params):
+    """N threads disputando saídas dos mesmos produtos: prova que o saldo nunca fica negativo."""
+    threads = param_int(params, 'threads', 8)
+    saidas = param_int(params, 'saidas', 100)  # por thread
+    total_produtos = param_int(params, 'produtos', 1)
+
+    # Estoque propositalmente menor que a demanda total, para forçar a disputa pelo último item
+    estoque_inicial = threads * saidas // (2 * total_produtos)
+    produtos = []
+    for i in range(total_produtos):
+        produto = criar_produto_base(nome=f'Produto Concorrência {i}')
+        Movimentacao(produto=produto, tipo='E', quantidade=estoque_inicial).save()
+        produtos.append(produto.pk)
+
+    contagem = {'confirmadas': 0, 'rejeitadas': 0, 'erros': 0}
+    trava_contagem = threading.Lock()
+    largada = threading.Barrier(threads)
+
+    def trabalhador(indice):
+        resultado = {'confirmadas': 0, 'rejeitadas': 0, 'erros': 0}
+        largada.wait()
+        try:
+            for n in range(saidas):
+                mov = Movimentacao(produto_id=produtos[(indice + n) % total_produtos], tipo='S', quantidade=1)
+
+                def gravar():
+                    with transaction.atomic():
+                        mov.save()
+
+                try:
+                    com_retentativas(gravar)
+                    resultado['confirmadas'] += 1
+                except ValidationError:
+                    resultado['rejeitadas'] += 1
+                except Exception:
+                    resultado['erros'] += 1
+        finally:
+            connections.close_all()
+            with trava_contagem:
+                for chave, valor in resultado.items():
+                    contagem[chave] += valor
+
+    inicio = time.perf_counter()
+    workers = [threading.Thread(target=trabalhador, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    duracao = time.perf_counter() - inicio
+
+    # Conferência: saldo gravado == soma do histórico, e nunca negativo
+    divergentes = 0
+    negativos = 0
+    for produto in Produto.objects.filter(pk__in=produtos):
+        entradas = sum(produto.movimentacoes.filter(tipo='E').values_list('quantidade', flat=True))
+        saidas_reais = sum(produto.movimentacoes.filter(tipo='S').values_list('quantidade', flat=True))
+        if produto.quantidade != entradas - saidas_reais:
+            divergentes += 1
+        if produto.quantidade < 0 or entradas - saidas_reais < 0:
+            negativos += 1
+
+    return [{
+        'banco': connection.vendor,
+        'threads': threads,
+        'produtos': total_produtos,
+        'estoque_inicial': estoque_inicial,
+        **contagem,
+        'commits_por_s': round(contagem['confirmadas'] / duracao, 1),
+        'saldos_negativos': negativos,
+        'saldos_divergentes': divergentes,
+    }]
+
+
+def recalcular_saldos_legado():
+    """Versão antiga do botão Sincronizar (2 agregações + 1 save por produto), só para comparação."""
+    from django.db.models import Sum
+
+    atualizados = 0
+    for produto in Produto.objects.all():
+        entradas = produto.movimentacoes.filter(tipo='E').aggregate(Sum('quantidade'))['quantidade__sum'] or 0
+        saidas = produto.movimentacoes.filter(tipo='S').aggregate(Sum('quantidade'))['quantidade__sum'] or 0
+        saldo_real = max(entradas - saidas, 0)
+        if produto.quantidade != saldo_real:
+            produto.quantidade = saldo_real
+            produto.save()
+            atualizados += 1
+    return atualizados
+
+
+@cenario('recalcular')
+def bench_recalcular(params):
+    """Tempo do recálculo de saldos (Sincronizar) em massa, com parte dos saldos corrompida."""
+    total_produtos = param_int(params, 'produtos', 10_000)
+    total_movimentacoes = param_int(params, 'movimentacoes', 1_000_000)
+    percentual_divergente = param_int(params, 'divergentes_pct', 10)
+    # A versão antiga é O(N) consultas: por padrão só roda em bases pequenas
+    comparar_legado = param_int(params, 'legado', 1 if total_produtos <= 5_000 else 0)
+
+    ids = semear_catalogo(total_produtos, total_movimentacoes)
+    corromper = ids[:: max(1, 100 // max(1, percentual_divergente))]
+
+    implementacoes = [('agrupado', recalcular_saldos)]
+    if comparar_legado:
+        implementacoes.append(('legado', recalcular_saldos_legado))
+
+    resultados = []
+    for nome, func in implementacoes:
+        Produto.objects.filter(pk__in=corromper).update(quantidade=F('quantidade') + 7)
+
+        inicio = time.perf_counter()
+        corrigidos = func()
+        duracao = time.perf_counter() - inicio
+
+        resultados.append({
+            'implementacao': nome,
+            'produtos': total_produtos,
+            'movimentacoes': total_movimentacoes,
+            'corrigidos': corrigidos,
+            'tempo_s': round(duracao, 3),
+        })
+
+    return resultados
+
+
+def exportar_csv_legado(movimentacoes):
+    """
+    Versão antiga do exportar_relatorio (objetos completos + arquivo inteiro em memória), só para comparação.
+    Retorna (bytes gerados, linhas exportadas), como exportar_csv_streaming().
+    """
+    import csv
+    from django.http import HttpResponse
+
+    response = HttpResponse(content_type='text/csv')
+    response.write(u'\ufeff'.encode('utf8'))
+    writer = csv.writer(response, delimiter=';')
+    linhas = 0
+    for mov in movimentacoes.select_related('produto', 'produto__categoria', 'usuario'):
+        linhas += 1
+        writer.writerow([
+            mov.created_at.strftime('%d/%m/%Y %H:%M'), mov.get_tipo_display(), mov.produto.nome,
+            mov.produto.categoria.nome, mov.quantidade, mov.usuario.username if mov.usuario else 'Sistema/Admin',
+            mov.solicitante_nome or '-', mov.solicitante_cpf or '-', mov.observacao or '-',
+        ])
+    return len(response.content), linhas
+
+
+def exportar_csv_streaming(movimentacoes):
+    linhas = ContadorLinhas(linhas_relatorio(movimentacoes))
+    tamanho = sum(len(bloco) for bloco in gerar_csv(linhas))
+    return tamanho, linhas.total
+
+
+@cenario('exportacao')
+def bench_exportacao(params):
+    """Pico de memória (tracemalloc) e tempo do CSV do Histórico conforme o volume cresce."""
+    volumes = param_lista(params, 'volumes', [10_000, 100_000, 1_000_000])
+    # O modo antigo guarda tudo em memória: por padrão só compara até 100 mil linhas
+    limite_legado = param_int(params, 'limite_legado', 100_000)
+
+    ids = semear_catalogo(1_000, 0)
+    aleatorio = random.Random(7)
+    resultados = []
+    semeadas = 0
+
+    for volume in sorted(volumes):
+        # Cada volume completa o histórico do anterior (o banco do cenário começa vazio)
+        faltam = volume - semeadas
+        semeadas += max(faltam, 0)
+        while faltam > 0:
+            lote = min(10_000, faltam)
+            Movimentacao.objects.bulk_create(
+                [Movimentacao(produto_id=aleatorio.choice(ids), tipo='E', quantidade=1, solicitante_nome='Benchmark')
+                 for _ in range(lote)],
+                batch_size=2_000,
+            )
+            faltam -= lote
+
+        movimentacoes = Movimentacao.objects.order_by('-created_at', '-id')
+        implementacoes = [('streaming', exportar_csv_streaming)]
+        if volume <= limite_legado:
+            implementacoes.append(('legado', exportar_csv_legado))
+
+        for nome, func in implementacoes:
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            tamanho, exportadas = func(movimentacoes)
+            duracao = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            resultados.append({
+                'implementacao': nome,
+                'linhas': exportadas, # Contadas na exportação, não o volume pedido
+                'arquivo_mb': round(tamanho / 1024 ** 2, 2),
+                'pico_memoria_mb': round(pico / 1024 ** 2, 2),
+                'tempo_s': round(duracao, 3),
+            })
+
+    return resultados
+
+
+def ler_csv(caminho, abrir=open):
+    with abrir(caminho, 'rt', encoding='utf-8-sig', newline='') as arquivo:
+        return sum(1 for _ in csv.reader(arquivo, delimiter=';')) - 1
+
+
+def ler_parquet(caminho):
+    import pyarrow.parquet as pq
+    return pq.read_table(caminho).num_rows
+
+
+@cenario('formatos')
+def bench_formatos(params):
+    """Tamanho do arquivo e tempo de escrita/leitura: CSV x CSV gzip x Parquet."""
+    volume = param_int(params, 'linhas', 500_000)
+
+    ids = semear_catalogo(2_000, 0)
+    aleatorio = random.Random(11)
+    faltam = volume
+    while faltam > 0:
+        lote = min(10_000, faltam)
+        Movimentacao.objects.bulk_create(
+            [Movimentacao(produto_id=aleatorio.choice(ids), tipo=aleatorio.choice('ES'), quantidade=aleatorio.randint(1, 9),
+                          solicitante_nome='Benchmark') for _ in range(lote)],
+            batch_size=2_000,
+        )
+        faltam -= lote
+
+    leitores = {
+        'csv': ler_csv,
+        'csv.gz': lambda caminho: ler_csv(caminho, abrir=gzip.open),
+        'parquet': ler_parquet,
+    }
+    if not parquet_disponivel():
+        leitores.pop('parquet')
+
+    movimentacoes = Movimentacao.objects.order_by('-created_at', '-id')
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix='bench_formatos_') as pasta:
+        for formato, ler in leitores.items():
+            caminho = os.path.join(pasta, f'relatorio.{formato}')
+
+            inicio = time.perf_counter()
+            with open(caminho, 'wb') as arquivo:
+                for bloco in gerar_relatorio(movimentacoes, formato):
+                    arquivo.write(bloco)
+            escrita = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            lidas = ler(caminho)
+            leitura = time.perf_counter() - inicio
+
+            resultados.append({
+                'formato': formato,
+                'linhas': lidas,
+                'arquivo_mb': round(os.path.getsize(caminho) / 1024 ** 2, 2),
+                'escrita_s': round(escrita, 3),
+                'leitura_s': round(leitura, 3),
+            })
+
+    return resultados
+
+
+@cenario('importacao')
+def bench_importacao(params):
+    """Vazão (linhas/s) da importação em lote x um save() por linha."""
+    volume = param_int(params, 'linhas', 100_000)
+    lote = param_int(params, 'lote', 1_000)
+    # O caminho linha a linha é lento: por padrão mede só uma amostra e projeta a vazão
+    amostra_save = param_int(params, 'amostra_save', 2_000)
+
+    ids = semear_catalogo(1_000, 0)
+    aleatorio = random.Random(13)
+
+    def gerar_registros(total):
+        # Entradas para todos os produtos primeiro, depois saídas menores: o saldo nunca falta
+        for numero in range(1, total + 1):
+            saida = numero > total // 2
+            yield numero, {
+                'produto': str(ids[numero % len(ids)]),
+                'tipo': 'S' if saida else 'E',
+                'quantidade': str(1 if saida else aleatorio.randint(2, 5)),
+                'solicitante_nome': 'Fornecedor Benchmark',
+                'solicitante_cpf': '529.982.247-25',
+            }
+
+    resultados = []
+    for modo in ('tudo', 'lote'):
+        inicio = time.perf_counter()
+        resultado = importar_registros(gerar_registros(volume), modo=modo, lote=lote)
+        duracao = time.perf_counter() - inicio
+        resultados.append({
+            'implementacao': f'importacao ({modo})',
+            'linhas': resultado['importadas'],
+            'erros': resultado['total_erros'],
+            'tempo_s': round(duracao, 3),
+            'linhas_por_s': round(resultado['importadas'] / duracao),
+        })
+
+    inicio = time.perf_counter()
+    for _, registro in gerar_registros(amostra_save):
+        Movimentacao(produto_id=int(registro['produto']), tipo=registro['tipo'], quantidade=int(registro['quantidade'])).save()
+    duracao = time.perf_counter() - inicio
+    resultados.append({
+        'implementacao': 'save por linha',
+        'linhas': amostra_save,
+        'erros': 0,
+        'tempo_s': round(duracao, 3),
+        'linhas_por_s': round(amostra_save / duracao),
+    })
+
+    return resultados
+
+
+def semear_produtos_com_nomes(total_produtos, semente=17, prefixo_sku='BUS'):
+    """Produtos com nomes em português (com acento) para os cenários de busca."""
+    aleatorio = random.Random(semente)
+    categorias = Categoria.objects.bulk_create([Categoria(nome=f'Benchmark {i}') for i in range(10)])
+    for inicio in range(0, total_produtos, 10_000):
+        Produto.objects.bulk_create([
+            Produto(
+                nome=f"{aleatorio.choice(PALAVRAS_PRODUTO)} {aleatorio.choice(PALAVRAS_PRODUTO)} {i}",
+                sku=f'{prefixo_sku}-{i:07d}',
+                categoria=categorias[i % len(categorias)],
+            )
+            for i in range(inicio, min(inicio + 10_000, total_produtos))
+        ], batch_size=2_000)
+
+
+@cenario('busca')
+def bench_busca(params):
+    """Latência da busca do Dashboard (contagem + 1ª página) com índice x icontains."""
+    total_produtos = param_int(params, 'produtos', 500_000)
+    amostras = param_int(params, 'amostras', 20)
+
+    semear_produtos_com_nomes(total_produtos)
+
+    # bulk_create não dispara sinais: indexa tudo de uma vez
+    inicio = time.perf_counter()
+    backend_busca().reconstruir()
+    indexacao = time.perf_counter() - inicio
+
+    alvo = Produto.objects.get(sku=f'BUS-{total_produtos // 2:07d}')
+    termos = {
+        'seletivo': normalizar(alvo.nome),   # 1 resultado, digitado sem acento
+        'sku': 'BUS-0004',                   # prefixo de SKU (~1000 resultados)
+        'comum': 'pessego',                  # ~10% do catálogo
+    }
+    backends = [nome for nome, backend in BACKENDS.items() if nome == 'simples' or backend().disponivel()]
+
+    resultados = []
+    for nome in backends:
+        backend = BACKENDS[nome]()
+        for descricao, termo in termos.items():
+            produtos = backend.filtrar(Produto.objects.order_by('nome'), termo)
+
+            def buscar():
+                # O mesmo que o Dashboard faz: COUNT para o paginador + primeira página
+                produtos.count()
+                list(produtos[:10])
+
+            resultados.append({
+                'backend': nome,
+                'busca': descricao,
+                'termo': termo,
+                'resultados': produtos.count(),
+                'indexacao_s': round(indexacao, 2) if nome != 'simples' else '-',
+                **medir(buscar, amostras),
+            })
+
+    return resultados
+
+
+@cenario('autocompletar')
+def bench_autocompletar(params):
+    """Tempo de montagem, memória e latência do índice de prefixos do autocompletar."""
+    total_produtos = param_int(params, 'produtos', 1_000_000)
+    amostras = param_int(params, 'amostras', 2_000)
+
+    semear_produtos_com_nomes(total_produtos)
+    # Volume recente para uma parte do catálogo (ranking dos resultados)
+    aleatorio = random.Random(5)
+    hoje = timezone.localdate()
+    SaldoDiario.objects.bulk_create(
+        [SaldoDiario(produto_id=pk, data=hoje, entradas=aleatorio.randint(1, 500), saldo_final=1)
+         for pk in Produto.objects.order_by('?').values_list('pk', flat=True)[:total_produtos // 10]],
+        batch_size=2_000,
+    )
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    indice = IndicePrefixos.construir()
+    montagem = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    alvo = Produto.objects.get(sku=f'BUS-{total_produtos // 2:07d}')
+    termos = {
+        'amplo': 'g',                                # ~10% do catálogo
+        'palavra': 'guara',                          # prefixo de uma palavra comum
+        'nome': normalizar(alvo.nome)[:12],          # prefixo de um nome completo
+        'sku': f'bus-{total_produtos // 2:07d}',     # SKU exato
+        'categoria': 'pesse',                        # palavra + filtro de categoria
+    }
+
+    resultados = []
+    for descricao, termo in termos.items():
+        categoria_id = alvo.categoria_id if descricao == 'categoria' else None
+        encontrados = indice.buscar(termo, 10, categoria_id)
+        medicao = medir(lambda: indice.buscar(termo, 10, categoria_id), amostras)
+        resultados.append({
+            'busca': descricao,
+            'termo': termo,
+            'resultados': len(encontrados),
+            'chaves': len(indice.chaves),
+            'montagem_s': round(montagem, 2),
+            'memoria_mb': round(pico / 1024 ** 2, 1),
+            # medir() devolve milissegundos; aqui a escala certa é microssegundos
+            **{chave.replace('_ms', '_us'): round(valor * 1000, 1) for chave, valor in medicao.items()},
+        })
+
+    return resultados
+
+
+@cenario('instrumentacao')
+def bench_instrumentacao(params):
+    """Custo do middleware de métricas (core/middleware.py): as mesmas páginas com ele desligado e ligado."""
+    amostras = param_int(params, 'amostras', 200)
+    semear_catalogo(param_int(params, 'produtos', 2_000), param_int(params, 'movimentacoes', 5_000))
+    admin = criar_admin()
+
+    # Um Client por modo: a cadeia de middlewares é montada na primeira requisição, com a setting da vez
+    clientes = {}
+    for ligada in (False, True):
+        with override_settings(METRICAS_REQUISICOES=ligada, METRICAS_REQUISICAO_LENTA_MS=0):
+            clientes[ligada] = cliente_logado(admin)
+            clientes[ligada].get(reverse('dashboard'))
+
+    def requisitar(cliente, url):
+        inicio = time.perf_counter()
+        resposta = cliente.get(url)
+        if resposta.streaming:
+            b''.join(resposta.streaming_content) # O relatório só é gerado quando consumido
+        return (time.perf_counter() - inicio) * 1000
+
+    paginas = {
+        'dashboard': reverse('dashboard'),
+        'historico': reverse('historico'),
+        'saida_rapida': reverse('registrar_saida_rapida'),
+        'exportar': reverse('exportar_relatorio'),
+    }
+
+    resultados = []
+    for nome, url in paginas.items():
+        for cliente in clientes.values():
+            requisitar(cliente, url) # Aquece caches (sessão, catálogo, templates)
+
+        # Alternadas, para que ruído da máquina (GC, disco) pese igual nos dois modos
+        tempos = {False: [], True: []}
+        for _ in range(amostras):
+            for ligada, cliente in clientes.items():
+                tempos[ligada].append(requisitar(cliente, url))
+
+        desligada, ligada = resumir(tempos[False]), resumir(tempos[True])
+        for modo, medicao in (('desligada', desligada), ('ligada', ligada)):
+            resultados.append({'pagina': nome, 'instrumentacao': modo, **medicao})
+        resultados[-1]['custo_p50_ms'] = round(ligada['p50_ms'] - desligada['p50_ms'], 3)
+        resultados[-1]['custo_p50_%'] = round((ligada['p50_ms'] / desligada['p50_ms'] - 1) * 100, 1)
+
+    return resultados
+
+
+# --- Páginas (requisição completa pelo Client de testes) ---
+
+@cenario('dashboard')
+def bench_dashboard(params):
+    """Dashboard: primeira, do meio e última página, filtro de categoria e busca por nome/SKU."""
+    total_produtos = param_int(params, 'produtos', 100_000)
+    amostras = param_int(params, 'amostras', 50)
+
+    ids = semear_catalogo(total_produtos, 0)
+    backend_busca().reconstruir() # bulk_create não indexa
+    alvo = Produto.objects.get(pk=ids[len(ids) // 2])
+    ultima = -(-total_produtos // 10)
+
+    paginas = {
+        'pagina_1': reverse('dashboard'),
+        'pagina_meio': f"{reverse('dashboard')}?page={ultima // 2}",
+        'ultima_pagina': f"{reverse('dashboard')}?page={ultima}",
+        'categoria': f"{reverse('dashboard')}?categoria={alvo.categoria_id}",
+        'busca': f"{reverse('dashboard')}?search=guarana",
+        'busca_pagina_5': f"{reverse('dashboard')}?search=guarana&page=5",
+        'busca_sku': f"{reverse('dashboard')}?search={alvo.sku}",
+    }
+    cliente = cliente_logado(criar_admin())
+
+    resultados = []
+    for modo, tempo in (('sem_cache', 0), ('com_cache', settings.ESTOQUE_CACHE_DASHBOARD or 300)):
+        cache.clear()
+        estatisticas.limpar()
+        with override_settings(ESTOQUE_CACHE_DASHBOARD=tempo):
+            medicoes = medir_paginas(cliente, paginas, amostras)
+        # Cada página é aquecida uma vez (falha) e depois sai do cache: a taxa mostra quantas
+        # visitas uma página precisa ter para o cache compensar
+        taxa = estatisticas.resumo().get('dashboard', {}).get('taxa_acerto_%', '-')
+        resultados.extend(
+            {'produtos': total_produtos, 'cache': modo, **resultado, 'acertos_%': taxa}
+            for resultado in medicoes
+        )
+    return resultados
+
+
+@cenario('historico')
+def bench_historico(params):
+    """Histórico: sem filtro, por tipo, produto, categoria, período (com resumo e contagem) e página profunda."""
+    total_movimentacoes = param_int(params, 'movimentacoes', 200_000)
+    amostras = param_int(params, 'amostras', 50)
+
+    admin = criar_admin()
+    gerar_dados(produtos=2_000, movimentacoes=total_movimentacoes, dias=90, usuarios=0, responsaveis=[admin])
+    categoria = Categoria.objects.order_by('-pk').first() # Uma das recém-geradas
+    hoje = timezone.localdate()
+    semana = f"data_inicio={hoje - timedelta(days=7):%Y-%m-%d}&data_fim={hoje:%Y-%m-%d}"
+    # Cursor da página 500 (o custo de chegar nela pelos links seria o mesmo de qualquer página)
+    profunda = Movimentacao.objects.order_by('-created_at', '-id')[5_000 - 1]
+
+    url = reverse('historico')
+    paginas = {
+        'sem_filtro': url,
+        'tipo': f"{url}?tipo=S",
+        'produto': f"{url}?produto=guaran",
+        'categoria': f"{url}?categoria={categoria.pk}",
+        'periodo': f"{url}?{semana}",
+        'periodo_contagem': f"{url}?{semana}&contar=1",
+        'pagina_500': f"{url}?cursor={codificar_cursor(profunda)}",
+    }
+    return [
+        {'movimentacoes': total_movimentacoes, **resultado}
+        for resultado in medir_paginas(cliente_logado(admin), paginas, amostras)
+    ]
+
+
+@cenario('saida_rapida')
+def bench_saida_rapida(params):
+    """
+    Saída Rápida num produto com histórico grande: abrir a tela (GET), registrar uma saída
+    por POST do formulário (sem e com chave de idempotência, e repetindo a chave) e sincronizar
+    a fila offline em lotes (por_saida_ms compara os caminhos).
+    """
+    historico = param_int(params, 'historico', 100_000)
+    amostras = param_int(params, 'amostras', 100)
+    lote = param_int(params, 'lote', 20)
+
+    semear_catalogo(1_000, 0)
+    produto = criar_produto_base()
+    inflar_historico(produto, historico)
+    # Saldo para todas as saídas medidas, qualquer que seja o histórico pedido
+    Produto.objects.filter(pk=produto.pk).update(quantidade=F('quantidade') + amostras * (lote + 2))
+    cliente = cliente_logado(criar_admin())
+    url = reverse('registrar_saida_rapida')
+    url_lote = reverse('sincronizar_saidas')
+
+    resultados = [
+        {'pagina': resultado['pagina'], 'url': url, 'saidas_por_requisicao': 0, **resultado}
+        for resultado in medir_paginas(cliente, {'abrir': url}, amostras)
+    ]
+
+    saldo_antes = Produto.objects.get(pk=produto.pk).quantidade
+    dados = {'categoria': produto.categoria_id, 'produto': produto.pk, 'quantidade': 1}
+    medicao = medir(lambda: cliente.post(url, dados), amostras)
+    resultados.append({'pagina': 'registrar', 'url': url, 'saidas_por_requisicao': 1, **medicao, 'por_saida_ms': medicao['media_ms']})
+
+    # Com chave de idempotência (custo da reserva e da resposta guardada) e repetindo a mesma
+    # chave, como o celular que perdeu a resposta (não grava: fica fora da conta do saldo)
+    chaves_form = iter(range(amostras))
+    medicao = medir(lambda: cliente.post(url, {**dados, 'chave_idempotencia': f'form-{next(chaves_form)}'}), amostras)
+    resultados.append({'pagina': 'registrar (com chave)', 'url': url, 'saidas_por_requisicao': 1, **medicao, 'por_saida_ms': medicao['media_ms']})
+    repetida = {**dados, 'chave_idempotencia': 'form-0'}
+    if cliente.post(url, repetida).get('Idempotent-Replayed') != 'true':
+        raise RuntimeError("O reenvio da mesma chave não devolveu a resposta guardada")
+    resultados.append({'pagina': 'repetir (mesma chave)', 'url': url, 'saidas_por_requisicao': 0, **medir(lambda: cliente.post(url, repetida), amostras)})
+
+    chaves = iter(range(amostras * lote))
+
+    def sincronizar():
+        saidas = [{'chave': f'bench-{next(chaves)}', 'produto': produto.pk, 'quantidade': 1} for _ in range(lote)]
+        cliente.post(url_lote, {'saidas': saidas}, content_type='application/json')
+
+    medicao = medir(sincronizar, amostras)
+    resultados.append({
+        'pagina': 'sincronizar', 'url': url_lote, 'saidas_por_requisicao': lote,
+        **medicao, 'por_saida_ms': round(medicao['media_ms'] / lote, 3),
+    })
+    if Produto.objects.get(pk=produto.pk).quantidade != saldo_antes - amostras * (lote + 2):
+        raise RuntimeError("As saídas medidas não foram todas gravadas")
+
+    return [{'historico': historico, **resultado} for resultado in resultados]
+
+
+# Roda num interpretador novo, como uma instância nova da Vercel (api/index.py): importa o
+# Django, monta o app WSGI e responde duas vezes à Saída Rápida. O banco (descartável) e a
+# sessão vêm do processo do benchmark; os tempos voltam em JSON na última linha.
+CODIGO_PARTIDA = """
+import io, json, os, sys, time
+inicio = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+from django.core.wsgi import get_wsgi_application
+importado = time.perf_counter()
+from django.conf import settings
+settings.DATABASES['default'].update(json.loads(os.environ['ESTOQUE_PARTIDA_BANCO']))
+app = get_wsgi_application()
+pronto = time.perf_counter()
+ambiente = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': os.environ['ESTOQUE_PARTIDA_URL'], 'SERVER_NAME': 'testserver',
+    'SERVER_PORT': '80', 'HTTP_HOST': 'testserver', 'HTTP_COOKIE': os.environ['ESTOQUE_PARTIDA_COOKIE'],
+    'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+}
+def responder():
+    status = []
+    b''.join(app({**ambiente, 'wsgi.input': io.BytesIO()}, lambda s, h, *a: status.append(s)))
+    return status[0]
+status = responder()
+primeira = time.perf_counter()
+relogio_primeira = time.time()
+responder()
+segunda = time.perf_counter()
+print(json.dumps({
+    'status': status,
+    'relogio_primeira': relogio_primeira,
+    'importar_ms': (importado - inicio) * 1000,
+    'setup_ms': (pronto - importado) * 1000,
+    'primeira_resposta_ms': (primeira - pronto) * 1000,
+    'segunda_resposta_ms': (segunda - primeira) * 1000,
+    'admin_carregado': 'estoque.admin' in sys.modules,
+}))
+"""
+
+MODOS_PARTIDA = {
+    'padrao': {'ADMIN_SOB_DEMANDA': 'False'},
+    'admin_sob_demanda': {'ADMIN_SOB_DEMANDA': 'True'},
+}
+
+
+def partida_a_frio(modo, url, cookie, opcoes=()):
+    """Executa CODIGO_PARTIDA num interpretador novo. Devolve (medidas, stderr)."""
+    banco = {chave: str(connection.settings_dict[chave]) for chave in ('ENGINE', 'NAME', 'USER', 'PASSWORD', 'HOST', 'PORT')}
+    variaveis = {
+        **os.environ,
+        **MODOS_PARTIDA[modo],
+        'ALLOWED_HOSTS': 'testserver',
+        'ESTOQUE_PARTIDA_BANCO': json.dumps(banco),
+        'ESTOQUE_PARTIDA_URL': url,
+        'ESTOQUE_PARTIDA_COOKIE': cookie,
+    }
+    inicio = time.time()
+    processo = subprocess.run(
+        [sys.executable, *opcoes, '-c', CODIGO_PARTIDA],
+        cwd=settings.BASE_DIR, env=variaveis, capture_output=True, text=True,
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(f"A partida a frio ({modo}) falhou:\n{processo.stderr[-2000:]}")
+    medidas = json.loads(processo.stdout.strip().splitlines()[-1])
+    if not medidas['status'].startswith('200'):
+        raise RuntimeError(f"{url} respondeu {medidas['status']} na partida a frio ({modo})")
+    # Inclui a subida do próprio interpretador, que os tempos medidos lá dentro não veem
+    medidas['ate_primeira_resposta_ms'] = (medidas.pop('relogio_primeira') - inicio) * 1000
+    return medidas, processo.stderr
+
+
+def importacoes_por_pacote(saida_importtime):
+    """
+    Soma o tempo próprio (µs) de cada import da saída de `-X importtime` por pacote, em dois
+    níveis (django.db, django.contrib, estoque.admin...): só o nível de cima seria quase tudo "django".
+    """
+    pacotes = {}
+    for linha in saida_importtime.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, _, nome = linha[len('import time:'):].split('|')
+        pacote = '.'.join(nome.strip().split('.')[:2])
+        pacotes[pacote] = pacotes.get(pacote, 0) + int(proprio)
+    return sorted(pacotes.items(), key=lambda item: item[1], reverse=True)
+
+
+@cenario('partida_a_frio')
+def bench_partida_a_frio(params):
+    """Partida a frio: do interpretador novo até a 1ª resposta da Saída Rápida, com e sem Admin sob demanda."""
+    partidas = param_int(params, 'partidas', 10)
+    total_pacotes = param_int(params, 'pacotes', 8)
+
+    semear_catalogo(1_000, 0)
+    # Operador comum: para superusuários o menu já aponta para o Admin (e o carrega)
+    operador, _ = User.objects.get_or_create(username='operador_partida')
+    cliente = cliente_logado(operador)
+    url = reverse('registrar_saida_rapida')
+    cookie = cookie_sessao(cliente)
+
+    # Modos intercalados: a variação da máquina ao longo da execução afeta todos igualmente
+    medidas = {modo: [] for modo in MODOS_PARTIDA}
+    for _ in range(partidas):
+        for modo in MODOS_PARTIDA:
+            medidas[modo].append(partida_a_frio(modo, url, cookie)[0])
+    if any(medida['admin_carregado'] for medida in medidas['admin_sob_demanda']):
+        raise RuntimeError("O Admin foi carregado numa requisição fora do /admin/")
+
+    resultados = []
+    for modo, medidas_modo in medidas.items():
+        resultado = {'modo': modo, 'partidas': partidas}
+        for fase in ('importar_ms', 'setup_ms', 'primeira_resposta_ms', 'segunda_resposta_ms'):
+            resultado[fase] = round(statistics.median(medida[fase] for medida in medidas_modo), 1)
+        resultado.update({
+            f'ate_primeira_resposta_{chave}': valor
+            for chave, valor in resumir([medida['ate_primeira_resposta_ms'] for medida in medidas_modo]).items()
+        })
+        resultados.append(resultado)
+
+        # Uma partida extra com -X importtime: onde vai o tempo de import (inflado pela própria medição)
+        _, saida = partida_a_frio(modo, url, cookie, opcoes=('-X', 'importtime'))
+        resultados.extend(
+            {'modo': modo, 'pacote': pacote, 'importacao_ms': round(proprio / 1000, 1)}
+            for pacote, proprio in importacoes_por_pacote(saida)[:total_pacotes]
+        )
+    return resultados
+
+
+# --- Requisições pelos handlers de servidor (WSGI/ASGI), sem o Client de testes ---
+
+def cookie_sessao(cliente):
+    return f"{settings.SESSION_COOKIE_NAME}={cliente.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+
+def ambiente_wsgi(url, cookie):
+    caminho, _, consulta = url.partition('?')
+    return {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': caminho, 'QUERY_STRING': consulta, 'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80', 'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie,
+        'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+    }
+
+
+def requisicao_wsgi(app, ambiente):
+    """
+    Uma requisição ao WSGIHandler como um servidor faria: o close() no fim dispara
+    request_finished, que fecha as conexões vencidas (o Client de testes não fecha). Devolve o status.
+    """
+    status = []
+    resposta = app({**ambiente, 'wsgi.input': io.BytesIO()}, lambda s, h, *a: status.append(s))
+    b''.join(resposta)
+    resposta.close()
+    return int(status[0].split()[0])
+
+
+def escopo_asgi(url, cookie):
+    caminho, _, consulta = url.partition('?')
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': caminho, 'raw_path': caminho.encode(), 'query_string': consulta.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+    }
+
+
+async def requisicao_asgi(app, escopo):
+    """Uma requisição ao ASGIHandler como um servidor faria (corpo inteiro consumido). Devolve o status."""
+    pedidos = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    terminou = asyncio.Event()
+    status = []
+
+    async def receive():
+        if pedidos:
+            return pedidos.pop()
+        await terminou.wait() # Enquanto responde, o Django fica atento a uma desconexão do cliente
+        return {'type': 'http.disconnect'}
+
+    async def send(mensagem):
+        if mensagem['type'] == 'http.response.start':
+            status.append(mensagem['status'])
+        elif not mensagem.get('more_body'):
+            terminou.set()
+
+    await app(escopo, receive, send)
+    return status[0]
+
+
+def modos_conexao():
+    """Configurações de conexão comparadas no cenário 'conexoes' (ver DB_* em core/settings.py)."""
+    modos = {
+        'por_requisicao': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+        'persistente': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+    }
+    if connection.vendor == 'postgresql':
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+        try:
+            import psycopg_pool # noqa: F401
+        except ImportError:
+            is_psycopg3 = False
+        if is_psycopg3:
+            opcoes = {**connection.settings_dict['OPTIONS'], 'pool': {'min_size': 1, 'max_size': 2}}
+            modos['pool'] = {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': opcoes}
+    return modos
+
+
+def fechar_conexoes():
+    connection.close()
+    if connection.vendor == 'postgresql' and connection.pool:
+        connection.close_pool()
+
+
+@cenario('conexoes')
+def bench_conexoes(params):
+    """Saída Rápida pelo handler WSGI: conexão nova por requisição x persistente x pool (PostgreSQL + psycopg 3)."""
+    amostras = param_int(params, 'amostras', 200)
+
+    semear_catalogo(1_000, 0)
+    operador, _ = User.objects.get_or_create(username='operador_conexoes')
+    cliente = cliente_logado(operador)
+    app = WSGIHandler()
+    url = reverse('registrar_saida_rapida')
+    ambiente = ambiente_wsgi(url, cookie_sessao(cliente))
+
+    def requisitar():
+        status = requisicao_wsgi(app, ambiente)
+        if status != 200:
+            raise RuntimeError(f"{url} respondeu {status}")
+
+    abertas = []
+
+    def contar(sender, connection, **kwargs):
+        abertas.append(connection.alias)
+
+    original = dict(connection.settings_dict)
+    resultados = []
+    connection_created.connect(contar)
+    try:
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for modo, ajustes in modos_conexao().items():
+                fechar_conexoes()
+                connection.settings_dict.update(ajustes)
+                requisitar() # Aquece (templates, caches, pool aberto)
+                abertas.clear()
+                resultados.append({'modo': modo, **medir(requisitar, amostras), 'conexoes_abertas': len(abertas)})
+    finally:
+        connection_created.disconnect(contar)
+        fechar_conexoes()
+        connection.settings_dict.clear()
+        connection.settings_dict.update(original)
+    return resultados
+
+
+class UrlsAsync:
+    # O mesmo que ESTOQUE_VIEWS_ASYNC=True: as rotas assíncronas casam antes das síncronas
+    urlpatterns = [*rotas_leitura(views_async), *urls_core]
+
+
+def gerar_carga(requisitar, clientes, por_cliente):
+    """
+    `clientes` simultâneos, cada um fazendo `por_cliente` requisições seguidas (a próxima só
+    depois da resposta). O tempo de cada uma inclui a espera na fila do servidor.
+    Devolve (tempos em ms, duração total em s).
+    """
+    async def cliente(tempos):
+        for _ in range(por_cliente):
+            inicio = time.perf_counter()
+            status = await requisitar()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            if status != 200:
+                raise RuntimeError(f"Resposta {status} no teste de carga")
+
+    async def todos():
+        tempos = []
+        await asyncio.gather(*(cliente(tempos) for _ in range(clientes)))
+        return tempos
+
+    inicio = time.perf_counter()
+    tempos = asyncio.run(todos())
+    return tempos, time.perf_counter() - inicio
+
+
+def carga_wsgi(url, cookie, clientes, por_cliente, threads):
+    """Servidor WSGI com `threads` threads (como o gunicorn --threads): o excedente espera na fila."""
+    app = WSGIHandler()
+    ambiente = ambiente_wsgi(url, cookie)
+    with ThreadPoolExecutor(max_workers=threads) as servidor:
+        async def requisitar():
+            return await asyncio.get_running_loop().run_in_executor(servidor, requisicao_wsgi, app, ambiente)
+        return gerar_carga(requisitar, clientes, por_cliente)
+
+
+def carga_asgi(url, cookie, clientes, por_cliente, threads):
+    """Servidor ASGI: todas as requisições no mesmo event loop (as consultas vão para threads do asgiref)."""
+    app = ASGIHandler()
+    escopo = escopo_asgi(url, cookie)
+    return gerar_carga(lambda: requisicao_asgi(app, escopo), clientes, por_cliente)
+
+
+@contextmanager
+def latencia_de_rede(atraso_ms):
+    """Soma `atraso_ms` a cada consulta das conexões abertas daqui em diante (ida e volta até um banco remoto)."""
+    def atrasar(execute, sql, params, many, context):
+        time.sleep(atraso_ms / 1000)
+        return execute(sql, params, many, context)
+
+    # O mesmo objeto de conexão (um por thread) reconecta a cada requisição: instala uma vez só
+    instaladas = []
+
+    def instalar(sender, connection, **kwargs):
+        if atrasar not in connection.execute_wrappers:
+            connection.execute_wrappers.append(atrasar)
+            instaladas.append(connection)
+
+    if atraso_ms:
+        connection_created.connect(instalar)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(instalar)
+        for conexao in instaladas:
+            conexao.execute_wrappers.remove(atrasar)
+
+
+@cenario('carga_asgi')
+def bench_carga_asgi(params):
+    """Muitos clientes simultâneos: WSGI + views síncronas x ASGI + views assíncronas (req/s e p99)."""
+    niveis = param_lista(params, 'clientes', [1, 10, 50])
+    por_cliente = param_int(params, 'requisicoes', 20)
+    threads = param_int(params, 'threads', 4)
+    # Ida e volta simulada por consulta (ex: 5 para um PostgreSQL gerenciado); o SQLite local é ~0
+    atraso_ms = param_int(params, 'latencia_ms', 0)
+
+    semear_catalogo(param_int(params, 'produtos', 5_000), param_int(params, 'movimentacoes', 50_000), dias=30)
+    cookie = cookie_sessao(cliente_logado(criar_admin()))
+    paginas = {
+        'dashboard': reverse('dashboard') + '?page=2',
+        'historico': reverse('historico') + '?contar=1',
+        'catalogo': reverse('catalogo_produtos'),
+    }
+    servidores = {
+        'wsgi': (carga_wsgi, settings.ROOT_URLCONF),
+        'asgi': (carga_asgi, UrlsAsync),
+    }
+
+    resultados = []
+    connections.close_all() # As conexões novas já abrem com a latência
+    # Sem cache da tabela: o Dashboard consulta o banco em toda requisição, como numa busca nova
+    with latencia_de_rede(atraso_ms), override_settings(ALLOWED_HOSTS=['testserver'], ESTOQUE_CACHE_DASHBOARD=0):
+        for pagina, url in paginas.items():
+            for clientes in niveis:
+                for servidor, (carga, urlconf) in servidores.items():
+                    with override_settings(ROOT_URLCONF=urlconf):
+                        carga(url, cookie, 1, 2, threads) # Aquece (templates, catálogo, Admin no menu)
+                        tempos, duracao = carga(url, cookie, clientes, por_cliente, threads)
+                    tempos.sort()
+                    resultados.append({
+                        'pagina': pagina,
+                        'clientes': clientes,
+                        'servidor': servidor,
+                        'threads': threads if servidor == 'wsgi' else '-',
+                        'latencia_ms_simulada': atraso_ms,
+                        'req_por_s': round(len(tempos) / duracao, 1),
+                        'p50_ms': round(tempos[len(tempos) // 2], 2),
+                        'p99_ms': round(tempos[max(0, int(len(tempos) * 0.99) - 1)], 2),
+                    })
+    connections.close_all()
+    return resultados
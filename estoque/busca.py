@@ -0,0 +1,182 @@
+"""
+Busca de produtos por nome/SKU (campo "Nome ou SKU" do Dashboard).
+
+O `icontains` (LIKE '%termo%') varre a tabela inteira a cada busca. Aqui a busca passa
+por um índice de trigramas, sem diferenciar acentos ("guarana" encontra "Guaraná"):
+
+- PostgreSQL: índice GIN (pg_trgm) sobre nome + SKU sem acento (extensão unaccent).
+- SQLite: tabela FTS5 "sombra" (tokenizer trigram) com o texto já normalizado,
+  mantida em dia pelos sinais do Produto.
+- Demais casos: o icontains de sempre.
+
+O backend é escolhido pela setting ESTOQUE_BUSCA_BACKEND ('auto', 'postgres', 'fts5' ou 'simples').
+Índices criados pela migração 0010_indice_busca_produto.
+"""
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q, TextField
+from django.db.models.expressions import RawSQL
+
+TABELA_FTS = 'estoque_produto_busca'
+FUNCAO_SEM_ACENTO = 'estoque_sem_acento'
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e com espaços simples: 'Guaraná  Antárctica' -> 'guarana antarctica'."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acento = ''.join(letra for letra in decomposto if not unicodedata.combining(letra))
+    return ' '.join(sem_acento.lower().split())
+
+
+def texto_busca(nome, sku):
+    return normalizar(f"{nome} {sku or ''}")
+
+
+class BuscaSimples:
+    """Sem índice: LIKE '%termo%' em nome e SKU (sensível a acento)."""
+
+    nome = 'simples'
+
+    def disponivel(self):
+        return True
+
+    def filtrar(self, produtos, termo):
+        return produtos.filter(Q(nome__icontains=termo) | Q(sku__icontains=termo))
+
+    def indexar(self, produto):
+        pass
+
+    def remover(self, produto_id):
+        pass
+
+    def reconstruir(self):
+        return 0
+
+
+class BuscaPostgres(BuscaSimples):
+    """Trigramas (GIN) sobre o texto sem acento; o próprio banco mantém o índice."""
+
+    nome = 'postgres'
+    # Precisa ser idêntica à expressão do índice para o planejador usá-lo
+    EXPRESSAO = f"""{FUNCAO_SEM_ACENTO}(lower("estoque_produto"."nome" || ' ' || coalesce("estoque_produto"."sku", '')))"""
+
+    def disponivel(self):
+        return connection.vendor == 'postgresql' and funcao_sem_acento_existe()
+
+    def filtrar(self, produtos, termo):
+        termo = normalizar(termo)
+        if not termo:
+            return produtos
+        # contains = LIKE '%termo%' com os curingas escapados; o GIN de trigramas atende o LIKE
+        return produtos.alias(texto_busca=RawSQL(self.EXPRESSAO, (), output_field=TextField())).filter(
+            texto_busca__contains=termo
+        )
+
+
+class BuscaFTS5(BuscaSimples):
+    """Tabela FTS5 (trigram) com rowid = id do produto e o texto já normalizado."""
+
+    nome = 'fts5'
+
+    def disponivel(self):
+        return connection.vendor == 'sqlite' and tabela_fts_existe()
+
+    def filtrar(self, produtos, termo):
+        termo = normalizar(termo)
+        if not termo:
+            return produtos
+
+        if len(termo) < 3:
+            # O trigram só indexa sequências de 3 letras; termos curtos caem no LIKE da própria tabela
+            escapado = termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            sql = f"SELECT rowid FROM {TABELA_FTS} WHERE texto LIKE %s ESCAPE '\\'"
+            parametro = f"%{escapado}%"
+        else:
+            # Frase entre aspas = substring exata (os trigramas cuidam do "contém")
+            sql = f"SELECT rowid FROM {TABELA_FTS} WHERE texto MATCH %s"
+            parametro = '"' + termo.replace('"', '""') + '"'
+
+        return produtos.filter(pk__in=RawSQL(sql, [parametro]))
+
+    def indexar(self, produto):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABELA_FTS} WHERE rowid = %s", [produto.pk])
+            cursor.execute(
+                f"INSERT INTO {TABELA_FTS}(rowid, texto) VALUES (%s, %s)",
+                [produto.pk, texto_busca(produto.nome, produto.sku)],
+            )
+
+    def remover(self, produto_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABELA_FTS} WHERE rowid = %s", [produto_id])
+
+    def reconstruir(self, lote=5000):
+        """Refaz a tabela inteira (depois de bulk_create/update, que não disparam sinais)."""
+        from .models import Produto
+
+        total = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABELA_FTS}")
+            linhas = []
+            for pk, nome, sku in Produto.objects.values_list('pk', 'nome', 'sku').iterator(chunk_size=lote):
+                linhas.append((pk, texto_busca(nome, sku)))
+                if len(linhas) >= lote:
+                    cursor.executemany(f"INSERT INTO {TABELA_FTS}(rowid, texto) VALUES (%s, %s)", linhas)
+                    total += len(linhas)
+                    linhas = []
+            if linhas:
+                cursor.executemany(f"INSERT INTO {TABELA_FTS}(rowid, texto) VALUES (%s, %s)", linhas)
+                total += len(linhas)
+        return total
+
+
+BACKENDS = {backend.nome: backend for backend in (BuscaPostgres, BuscaFTS5, BuscaSimples)}
+
+
+# Índices já encontrados, por banco (alias + nome). Só o "existe" fica guardado: enquanto a
+# migração não criou o índice cada chamada consulta de novo, e a busca passa a usá-lo assim que
+# ele aparece, sem reiniciar o processo
+_encontrados = set()
+
+
+def indice_existe(objeto, consultar):
+    chave = (connection.alias, connection.settings_dict['NAME'], objeto)
+    if chave in _encontrados:
+        return True
+    if consultar():
+        _encontrados.add(chave)
+        return True
+    return False
+
+
+def tabela_fts_existe():
+    return indice_existe(TABELA_FTS, lambda: TABELA_FTS in connection.introspection.table_names())
+
+
+def funcao_sem_acento_existe():
+    def consultar():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_proc WHERE proname = %s", [FUNCAO_SEM_ACENTO])
+            return cursor.fetchone() is not None
+    return indice_existe(FUNCAO_SEM_ACENTO, consultar)
+
+
+def backend_busca():
+    """
+    Backend configurado em ESTOQUE_BUSCA_BACKEND. No modo 'auto' usa o índice do banco
+    atual se a migração conseguiu criá-lo (ex: SQLite sem FTS5 cai no icontains).
+    """
+    escolhido = getattr(settings, 'ESTOQUE_BUSCA_BACKEND', 'auto')
+    if escolhido != 'auto':
+        return BACKENDS[escolhido]()
+
+    for backend in (BuscaPostgres(), BuscaFTS5()):
+        if backend.disponivel():
+            return backend
+    return BuscaSimples()
+
+
+def buscar_produtos(produtos, termo):
+    return backend_busca().filtrar(produtos, termo)
@@ -0,0 +1,211 @@
+"""
+Caches do app, todos no cache padrão do Django (LocMem por padrão; CACHE_BACKEND troca).
+
+Cada grupo de dados tem uma "versão" guardada no próprio cache. As chaves do conteúdo
+levam a versão, então invalidar é só trocar a versão (os sinais em signals.py fazem
+isso quando produtos, categorias ou movimentações mudam); o conteúdo antigo expira sozinho.
+
+- catalogo: JSON de produtos (id, nome, saldo, categoria) das telas de Saída Rápida e
+  Movimentação, servido por uma URL própria. O navegador revalida pelo ETag e o servidor
+  remonta o JSON uma única vez por versão.
+- categorias: lista de categorias dos filtros e formulários.
+- dashboard: tabela de produtos já renderizada, por busca/categoria/página. Depende das
+  versões do catálogo (nome, SKU, saldo) e das categorias (nome exibido na linha).
+
+Acertos e falhas são contados por processo (EstatisticasCache), para dimensionar o cache.
+
+No LocMem cada processo tem o próprio cache. Para uma invalidação feita num worker valer
+nos outros, as versões ficam então no banco (VersaoCache, uma consulta pela chave primária
+por requisição); só o conteúdo fica na memória do processo, montado uma vez por versão.
+Num cache compartilhado (Redis, Memcached, banco) as versões ficam no próprio cache.
+"""
+import hashlib
+import json
+import threading
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+TEMPO_CATALOGO = 60 * 60 * 24 # O conteúdo só muda quando a versão muda
+TEMPO_CATEGORIAS = 60 * 60 * 24
+
+
+def chave_versao(grupo):
+    return f'estoque:{grupo}:versao'
+
+
+def nova_versao():
+    return uuid.uuid4().hex[:12]
+
+
+def versoes_no_banco():
+    """Cache por processo (LocMem): a versão guardada nele não veria as invalidações dos outros workers."""
+    return isinstance(caches['default'], LocMemCache)
+
+
+def versoes(*grupos):
+    """Versão atual de cada grupo (uma ida ao cache, ou ao banco, para todos), criando as que faltam."""
+    if versoes_no_banco():
+        from .models import VersaoCache
+
+        atuais = dict(VersaoCache.objects.filter(grupo__in=grupos).values_list('grupo', 'versao'))
+        for grupo in grupos:
+            if grupo not in atuais:
+                # get_or_create não sobrescreve: se dois processos chegarem juntos, vale a primeira versão
+                atuais[grupo] = VersaoCache.objects.get_or_create(grupo=grupo, defaults={'versao': nova_versao()})[0].versao
+        return tuple(atuais[grupo] for grupo in grupos)
+
+    chaves = [chave_versao(grupo) for grupo in grupos]
+    atuais = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in atuais:
+            # add() não sobrescreve: se dois processos chegarem juntos, vale a primeira versão
+            cache.add(chave, nova_versao(), None)
+            atuais[chave] = cache.get(chave)
+    return tuple(atuais[chave] for chave in chaves)
+
+
+def invalidar(*grupos):
+    """
+    Troca a versão dos grupos depois do commit (antes disso, outra requisição
+    poderia remontar o cache com os dados antigos).
+    """
+    if versoes_no_banco():
+        from .models import VersaoCache
+
+        def trocar():
+            for grupo in grupos:
+                # Um UPDATE pela chave primária; a linha só falta se o grupo nunca foi lido
+                if not VersaoCache.objects.filter(grupo=grupo).update(versao=nova_versao()):
+                    VersaoCache.objects.get_or_create(grupo=grupo, defaults={'versao': nova_versao()})
+
+        transaction.on_commit(trocar)
+    else:
+        transaction.on_commit(lambda: cache.set_many({chave_versao(grupo): nova_versao() for grupo in grupos}, None))
+
+
+class EstatisticasCache:
+    """Acertos e falhas por grupo desde que o processo subiu (ou desde o último limpar())."""
+
+    def __init__(self):
+        self.contadores = {} # grupo -> [acertos, falhas]
+        self.trava = threading.Lock()
+
+    def registrar(self, grupo, acertou):
+        with self.trava:
+            contador = self.contadores.setdefault(grupo, [0, 0])
+            contador[0 if acertou else 1] += 1
+
+    def limpar(self):
+        with self.trava:
+            self.contadores.clear()
+
+    def resumo(self):
+        with self.trava:
+            copia = {grupo: tuple(contador) for grupo, contador in self.contadores.items()}
+        return {
+            grupo: {
+                'acertos': acertos,
+                'falhas': falhas,
+                'taxa_acerto_%': round(acertos * 100 / (acertos + falhas), 1),
+            }
+            for grupo, (acertos, falhas) in sorted(copia.items())
+        }
+
+
+estatisticas = EstatisticasCache()
+
+
+def em_cache(grupo, chave, montar, tempo):
+    """Valor da chave no cache; na falta, monta com montar() e guarda por `tempo` segundos."""
+    valor = cache.get(chave)
+    acertou = valor is not None
+    if not acertou:
+        valor = montar()
+        cache.set(chave, valor, tempo)
+    estatisticas.registrar(grupo, acertou)
+    return valor
+
+
+# --- Catálogo ---
+
+def versao_catalogo():
+    return versoes('catalogo')[0]
+
+
+def invalidar_catalogo():
+    invalidar('catalogo')
+
+
+def catalogo_json():
+    """Devolve (versão, JSON em bytes) do catálogo, montando só quando a versão muda."""
+    from .models import Produto
+
+    versao = versao_catalogo()
+
+    def montar():
+        produtos = Produto.objects.order_by('nome').values('id', 'nome', 'quantidade', 'categoria_id')
+        return json.dumps(
+            {'versao': versao, 'produtos': list(produtos)},
+            ensure_ascii=False,
+            separators=(',', ':'),
+        ).encode('utf-8')
+
+    return versao, em_cache('catalogo', f'estoque:catalogo:{versao}', montar, TEMPO_CATALOGO)
+
+
+# --- Categorias ---
+
+def versao_categorias():
+    return versoes('categorias')[0]
+
+
+def invalidar_categorias():
+    invalidar('categorias')
+
+
+def categorias_em_cache():
+    """Todas as categorias (objetos Categoria, na ordem do Meta) para dropdowns e filtros."""
+    from .models import Categoria
+
+    chave = f'estoque:categorias:{versao_categorias()}'
+    return em_cache('categorias', chave, lambda: list(Categoria.objects.all()), TEMPO_CATEGORIAS)
+
+
+# --- Dashboard ---
+
+def chave_dashboard(filtros, versao_catalogo, versao_categorias):
+    # A busca é texto livre: o hash deixa a chave curta e válida em qualquer backend (ex: Memcached)
+    resumo_filtros = hashlib.md5(json.dumps(filtros).encode('utf-8')).hexdigest()
+    return f'estoque:dashboard:{versao_catalogo}:{versao_categorias}:{resumo_filtros}'
+
+
+def tabela_dashboard(filtros, montar):
+    """
+    HTML da tabela de produtos para os `filtros` (busca, categoria, página), montado por
+    montar() só na falta. ESTOQUE_CACHE_DASHBOARD=0 desliga (sempre monta).
+    """
+    tempo = settings.ESTOQUE_CACHE_DASHBOARD
+    if not tempo:
+        return montar()
+    chave = chave_dashboard(filtros, *versoes('catalogo', 'categorias'))
+    return em_cache('dashboard', chave, montar, tempo)
+
+
+async def atabela_dashboard(filtros, montar):
+    """tabela_dashboard() das views assíncronas: montar é uma corrotina e o cache é lido com aget()."""
+    tempo = settings.ESTOQUE_CACHE_DASHBOARD
+    if not tempo:
+        return await montar()
+    chave = chave_dashboard(filtros, *await sync_to_async(versoes)('catalogo', 'categorias'))
+    valor = await cache.aget(chave)
+    acertou = valor is not None
+    if not acertou:
+        valor = await montar()
+        await cache.aset(chave, valor, tempo)
+    estatisticas.registrar('dashboard', acertou)
+    return valor
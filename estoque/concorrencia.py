@@ -0,0 +1,43 @@
+"""
+Utilitários de concorrência para o registro de movimentações.
+
+A proteção contra saldo negativo fica no banco (lock da linha do produto + UPDATE
+condicional em Movimentacao.save). Aqui ficam apenas as retentativas para os erros
+transitórios de lock (SQLite ocupado, deadlock/serialização no PostgreSQL).
+"""
+import random
+import time
+
+from django.db import OperationalError, connection
+
+# Mensagens/códigos que indicam disputa de lock, e não um erro de verdade
+ERROS_TRANSITORIOS = (
+    'database is locked',   # SQLite
+    'deadlock detected',    # PostgreSQL (40P01)
+    'could not serialize',  # PostgreSQL (40001)
+)
+
+
+def erro_transitorio(erro):
+    mensagem = str(erro).lower()
+    return any(trecho in mensagem for trecho in ERROS_TRANSITORIOS)
+
+
+def com_retentativas(func, tentativas=5, espera=0.05):
+    """
+    Executa `func` (que deve abrir a própria transaction.atomic) e repete em caso de
+    conflito de lock, com backoff exponencial e jitter.
+
+    Dentro de uma transação já aberta (ex: Admin) não dá para repetir com segurança,
+    então a função roda uma única vez e o erro sobe normalmente.
+    """
+    if connection.in_atomic_block:
+        return func()
+
+    for tentativa in range(1, tentativas + 1):
+        try:
+            return func()
+        except OperationalError as erro:
+            if tentativa == tentativas or not erro_transitorio(erro):
+                raise
+            time.sleep(espera * (2 ** (tentativa - 1)) * random.uniform(0.5, 1.5))
@@ -0,0 +1,373 @@
+"""
+Geração do relatório de movimentações (CSV do Histórico).
+
+As linhas saem direto do banco em tuplas (values_list + iterator), sem montar objetos
+Movimentacao nem guardar o arquivo inteiro na memória: o consumo fica constante,
+seja o relatório de 10 linhas ou de um ano inteiro.
+
+Relatórios grandes demais para o tempo limite de uma requisição viram jobs
+(ExportacaoJob): um worker local (pool de threads do próprio processo ou o comando
+`processar_exportacoes`) grava o arquivo compactado e o usuário baixa quando ficar pronto.
+"""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Movimentacao, ExportacaoJob
+from .filtros import filtrar_movimentacoes, normalizar_filtros
+
+logger = logging.getLogger(__name__)
+
+CABECALHO_CSV = [
+    'Data/Hora',
+    'Tipo',
+    'Produto',
+    'Categoria',
+    'Quantidade',
+    'Responsável (Logado)', # Quem fez (User)
+    'Destinatário',         # Quem recebeu (Texto)
+    'CPF',
+    'Observação'            # Novo campo
+]
+
+COLUNAS = (
+    'created_at',
+    'tipo',
+    'produto__nome',
+    'produto__categoria__nome',
+    'quantidade',
+    'usuario__username',
+    'solicitante_nome',
+    'solicitante_cpf',
+    'observacao',
+)
+
+TIPOS = dict(Movimentacao.TIPO_CHOICES)
+
+
+def linhas_relatorio(movimentacoes, chunk_size=2000):
+    """
+    Percorre o queryset filtrado em blocos (cursor do lado do servidor no PostgreSQL)
+    e devolve cada movimentação já formatada como linha do relatório.
+    """
+    for created_at, tipo, produto, categoria, quantidade, responsavel, destinatario, cpf, observacao in (
+        movimentacoes.values_list(*COLUNAS).iterator(chunk_size=chunk_size)
+    ):
+        yield [
+            created_at.strftime('%d/%m/%Y %H:%M'),
+            TIPOS.get(tipo, tipo),
+            produto,
+            categoria or '-',
+            quantidade,
+            responsavel or 'Sistema/Admin',
+            destinatario or '-',
+            cpf or '-',
+            observacao or '-',
+        ]
+
+
+def gerar_csv(linhas, linhas_por_bloco=1000):
+    """
+    Gera o CSV (BOM + ';' para o Excel) em blocos de bytes, prontos para um
+    StreamingHttpResponse ou para gravar num arquivo.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+
+    buffer.write(u'\ufeff') # BOM para Excel ler acentos
+    writer.writerow(CABECALHO_CSV)
+
+    for numero, linha in enumerate(linhas, start=1):
+        writer.writerow(linha)
+        if numero % linhas_por_bloco == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode('utf-8')
+
+
+def gerar_csv_gzip(linhas, nivel=6):
+    """O mesmo CSV, comprimido em gzip enquanto é gerado (o download já sai compactado)."""
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31) # wbits=31: cabeçalho gzip
+    for bloco in gerar_csv(linhas):
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+
+# --- Formato colunar (Parquet) ---
+
+class BufferSaida:
+    """Arquivo "de mentira" para o ParquetWriter: acumula os bytes até o próximo yield."""
+
+    def __init__(self):
+        self.partes = []
+        self.posicao = 0
+        self.closed = False
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        self.posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self.posicao
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def esvaziar(self):
+        dados = b''.join(self.partes)
+        self.partes = []
+        return dados
+
+
+def gerar_parquet(movimentacoes, linhas_por_grupo=100_000):
+    """
+    Gera um arquivo Parquet em blocos de bytes, um row group por lote do cursor.
+    Tipo, produto e categoria saem com dicionário (poucos valores distintos repetidos
+    milhões de vezes), e a data sai como timestamp de verdade, não texto.
+    Requer o pacote opcional `pyarrow`.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    texto_dicionario = pa.dictionary(pa.int32(), pa.string())
+    schema = pa.schema([
+        ('data_hora', pa.timestamp('us', tz='UTC')),
+        ('tipo', texto_dicionario),
+        ('produto', texto_dicionario),
+        ('categoria', texto_dicionario),
+        ('quantidade', pa.int64()),
+        ('responsavel', pa.string()),
+        ('destinatario', pa.string()),
+        ('cpf', pa.string()),
+        ('observacao', pa.string()),
+    ])
+
+    def grupo_para_tabela(grupo):
+        colunas = list(zip(*grupo))
+        colunas[1] = [TIPOS.get(tipo, tipo) for tipo in colunas[1]]
+        arrays = [
+            pa.array(valores, type=campo.type.value_type).dictionary_encode()
+            if pa.types.is_dictionary(campo.type) else pa.array(valores, type=campo.type)
+            for campo, valores in zip(schema, colunas)
+        ]
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    saida = BufferSaida()
+    writer = pq.ParquetWriter(saida, schema, compression='zstd')
+
+    grupo = []
+    for linha in movimentacoes.values_list(*COLUNAS).iterator(chunk_size=2000):
+        grupo.append(linha)
+        if len(grupo) >= linhas_por_grupo:
+            writer.write_table(grupo_para_tabela(grupo))
+            grupo = []
+            yield saida.esvaziar()
+
+    if grupo:
+        writer.write_table(grupo_para_tabela(grupo))
+    writer.close()
+    yield saida.esvaziar()
+
+
+# Formatos aceitos no parâmetro ?format= do exportar_relatorio
+FORMATOS = {
+    'csv': ('text/csv', 'relatorio_estoque.csv'),
+    'csv.gz': ('application/gzip', 'relatorio_estoque.csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'relatorio_estoque.parquet'),
+}
+
+
+def gerar_relatorio(movimentacoes, formato='csv'):
+    """Escolhe o gerador de bytes conforme o formato pedido."""
+    if formato == 'csv.gz':
+        return gerar_csv_gzip(linhas_relatorio(movimentacoes))
+    if formato == 'parquet':
+        return gerar_parquet(movimentacoes)
+    return gerar_csv(linhas_relatorio(movimentacoes))
+
+
+async def gerar_relatorio_async(movimentacoes, formato='csv'):
+    """
+    gerar_relatorio() para views assíncronas (ASGI). Cada bloco sai do mesmo gerador, avançado
+    numa thread (sempre a mesma na resposta, dona do cursor do banco) sem travar o event loop.
+    Um gerador síncrono num StreamingHttpResponse servido por ASGI seria lido inteiro para a
+    memória antes de enviar o primeiro byte.
+    """
+    gerador = gerar_relatorio(movimentacoes, formato)
+    proximo = sync_to_async(next)
+    try:
+        while (bloco := await proximo(gerador, None)) is not None:
+            yield bloco
+    finally:
+        await sync_to_async(gerador.close)()
+
+
+def parquet_disponivel():
+    try:
+        import pyarrow.parquet # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# --- Exportação em segundo plano ---
+
+_executor = None
+_trava_executor = threading.Lock()
+
+
+def executor():
+    """Pool de threads do processo, criado na primeira exportação."""
+    global _executor
+    with _trava_executor:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ESTOQUE_EXPORTACAO_WORKERS,
+                thread_name_prefix='exportacao',
+            )
+    return _executor
+
+
+def pasta_exportacoes():
+    pasta = Path(settings.ESTOQUE_EXPORTACOES_DIR)
+    pasta.mkdir(parents=True, exist_ok=True)
+    return pasta
+
+
+def chave_filtros(filtros):
+    """Hash estável dos filtros: mesmos filtros (em qualquer ordem) = mesma chave."""
+    return hashlib.sha256(json.dumps(filtros, sort_keys=True).encode()).hexdigest()
+
+
+def limpar_exportacoes_expiradas():
+    """Remove jobs vencidos (e seus arquivos). Barato: roda a cada novo pedido."""
+    agora = timezone.now()
+    vencidos = ExportacaoJob.objects.filter(
+        Q(expira_em__lt=agora)
+        | Q(status__in=['P', 'F'], created_at__lt=agora - timedelta(seconds=settings.ESTOQUE_EXPORTACAO_TTL))
+        # Em processamento só sai depois do limite de execução: antes disso o worker pode estar gravando
+        | Q(status='E', created_at__lt=agora - timedelta(seconds=settings.ESTOQUE_EXPORTACAO_LIMITE_EXECUCAO))
+    )
+    for arquivo in vencidos.exclude(arquivo='').values_list('arquivo', flat=True):
+        (pasta_exportacoes() / arquivo).unlink(missing_ok=True)
+    vencidos.delete()
+
+
+def enfileirar_exportacao(params, usuario=None):
+    """
+    Cria (ou reaproveita) o job de exportação para os filtros informados.
+    Se o usuário já tem um job igual em andamento ou concluído dentro do TTL, devolve esse:
+    exportações repetidas não custam nada.
+    """
+    filtros = normalizar_filtros(params)
+    chave = chave_filtros(filtros)
+
+    limpar_exportacoes_expiradas()
+
+    existente = (
+        ExportacaoJob.objects.filter(chave=chave, usuario=usuario) # Cada um só acessa os próprios jobs
+        .filter(Q(status__in=['P', 'E']) | Q(status='C', expira_em__gt=timezone.now()))
+        .first()
+    )
+    if existente:
+        return existente
+
+    job = ExportacaoJob.objects.create(chave=chave, filtros=filtros, usuario=usuario)
+
+    # No modo "thread" o próprio processo web executa; no modo "comando" o job fica na fila
+    # até o `manage.py processar_exportacoes` pegá-lo
+    if settings.ESTOQUE_EXPORTACAO_EXECUTOR == 'thread':
+        transaction.on_commit(lambda: executor().submit(processar_exportacao, job.pk))
+
+    return job
+
+
+class ContadorLinhas:
+    """Conta as linhas enquanto elas passam para o gerador do CSV."""
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.total = 0
+
+    def __iter__(self):
+        for linha in self.linhas:
+            self.total += 1
+            yield linha
+
+
+def processar_exportacao(job_id):
+    """
+    Executa um job pendente: grava o CSV compactado (gzip) e marca como concluído.
+    Retorna False se outro worker reivindicou o job antes (ou ele não existe mais).
+    """
+    close_old_connections()
+    try:
+        # Reivindica o job: só um worker consegue passar de Pendente para Em processamento
+        if not ExportacaoJob.objects.filter(pk=job_id, status='P').update(status='E'):
+            return False
+
+        job = ExportacaoJob.objects.get(pk=job_id)
+        nome_arquivo = f'{job.pk}.csv.gz'
+
+        try:
+            movimentacoes = filtrar_movimentacoes(Movimentacao.objects.order_by('-created_at', '-id'), job.filtros)
+            linhas = ContadorLinhas(linhas_relatorio(movimentacoes))
+
+            with gzip.open(pasta_exportacoes() / nome_arquivo, 'wb') as arquivo:
+                for bloco in gerar_csv(linhas):
+                    arquivo.write(bloco)
+        except Exception as erro:
+            logger.exception("Falha na exportação %s", job.pk)
+            (pasta_exportacoes() / nome_arquivo).unlink(missing_ok=True) # Não deixa o arquivo pela metade
+            ExportacaoJob.objects.filter(pk=job.pk).update(status='F', erro=str(erro))
+            return True
+
+        agora = timezone.now()
+        concluido = ExportacaoJob.objects.filter(pk=job.pk, status='E').update(
+            status='C',
+            arquivo=nome_arquivo,
+            linhas=linhas.total,
+            concluido_em=agora,
+            expira_em=agora + timedelta(seconds=settings.ESTOQUE_EXPORTACAO_TTL),
+        )
+        if not concluido:
+            # O job foi removido enquanto o arquivo era gravado: ninguém mais vai baixá-lo nem apagá-lo
+            logger.warning("Exportação %s removida durante a execução; arquivo descartado", job.pk)
+            (pasta_exportacoes() / nome_arquivo).unlink(missing_ok=True)
+        return True
+    finally:
+        close_old_connections()
+
+
+def processar_pendentes():
+    """
+    Processa todos os jobs pendentes, do mais antigo ao mais novo. Retorna quantos este
+    worker executou (os reivindicados por outro worker no meio do caminho não contam).
+    """
+    executados = 0
+    for job_id in ExportacaoJob.objects.filter(status='P').order_by('created_at').values_list('pk', flat=True):
+        if processar_exportacao(job_id):
+            executados += 1
+    return executados
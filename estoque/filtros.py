@@ -0,0 +1,51 @@
+"""
+Filtros do Histórico de movimentações, compartilhados pela tela, pela exportação
+em CSV e pelas exportações em segundo plano (mesmos parâmetros = mesmo resultado).
+"""
+from datetime import timedelta
+
+from django.utils.dateparse import parse_date
+
+from .saldos import inicio_do_dia
+
+# Parâmetros da URL que definem o resultado do relatório
+PARAMETROS_FILTRO = ('produto', 'tipo', 'categoria', 'data_inicio', 'data_fim')
+
+
+def ler_data(valor):
+    """Converte 'AAAA-MM-DD' em date; vazio ou inválido vira None (o filtro é ignorado)."""
+    try:
+        return parse_date(valor or '')
+    except ValueError:
+        return None
+
+
+def filtrar_movimentacoes(movimentacoes, params):
+    """
+    Aplica os filtros da URL (ou de um dict salvo) ao queryset de movimentações.
+    As datas viram um intervalo [início do dia, início do dia seguinte) sobre created_at,
+    em vez de created_at__date, para o banco conseguir usar os índices da data.
+    """
+    busca_produto = params.get('produto')
+    busca_tipo = params.get('tipo')
+    busca_categoria = params.get('categoria')
+    data_inicio = ler_data(params.get('data_inicio'))
+    data_fim = ler_data(params.get('data_fim'))
+
+    if busca_produto:
+        movimentacoes = movimentacoes.filter(produto__nome__icontains=busca_produto)
+    if busca_tipo:
+        movimentacoes = movimentacoes.filter(tipo=busca_tipo)
+    if busca_categoria:
+        movimentacoes = movimentacoes.filter(produto__categoria_id=busca_categoria)
+    if data_inicio:
+        movimentacoes = movimentacoes.filter(created_at__gte=inicio_do_dia(data_inicio))
+    if data_fim:
+        movimentacoes = movimentacoes.filter(created_at__lt=inicio_do_dia(data_fim + timedelta(days=1)))
+
+    return movimentacoes
+
+
+def normalizar_filtros(params):
+    """Só os filtros preenchidos, como dict simples (serializável em JSON)."""
+    return {chave: params.get(chave) for chave in PARAMETROS_FILTRO if params.get(chave)}
@@ -0,0 +1,168 @@
+"""
+Filtros do Admin de Movimentações para tabelas grandes (ESTOQUE_ADMIN_TABELA_GRANDE).
+
+Os filtros padrão do Django montam a barra lateral consultando a tabela toda a cada
+carregamento (ex: date_hierarchy faz um SELECT DISTINCT de datas em Movimentacao).
+Aqui as opções vêm do cache do Django (renovadas a cada TEMPO_FILTROS segundos) e a
+navegação por data (Mês -> Dia) é montada a partir das fotografias diárias (SaldoDiario),
+que têm uma linha por produto/dia em vez de uma por movimentação. Enquanto elas não cobrem
+o histórico (banco anterior às fotografias, ver saldos.fotografias_cobrem), as datas saem das
+próprias movimentações.
+"""
+from datetime import date, datetime
+
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, Max, Min, OuterRef
+from django.utils import timezone
+from django.utils.formats import date_format
+
+from .caches import versao_categorias
+from .models import Categoria, Movimentacao, SaldoDiario
+from .saldos import fotografias_cobrem, inicio_do_dia
+
+TEMPO_FILTROS = 60 * 10
+
+
+def proximo_mes(primeiro_dia):
+    return date(primeiro_dia.year + primeiro_dia.month // 12, primeiro_dia.month % 12 + 1, 1)
+
+
+def ler_mes(valor):
+    """'2025-11' -> date(2025, 11, 1)"""
+    return datetime.strptime(valor, '%Y-%m').date()
+
+
+class FiltroEmCache(admin.SimpleListFilter):
+    """SimpleListFilter cujas opções ficam no cache; as subclasses implementam carregar_opcoes() e filtrar()."""
+
+    def chave_cache(self, request):
+        return f'estoque:admin:filtro:{self.parameter_name}'
+
+    def carregar_opcoes(self, request):
+        raise NotImplementedError
+
+    def filtrar(self, queryset, valor):
+        raise NotImplementedError
+
+    def lookups(self, request, model_admin):
+        chave = self.chave_cache(request)
+        opcoes = cache.get(chave)
+        if opcoes is None:
+            opcoes = list(self.carregar_opcoes(request))
+            cache.set(chave, opcoes, TEMPO_FILTROS)
+        return opcoes
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        try:
+            return self.filtrar(queryset, self.value())
+        except (ValueError, ValidationError) as e:
+            # Valor inválido na URL: o Admin volta para a listagem com ?e=1 (mesmo tratamento dos filtros padrão)
+            raise IncorrectLookupParameters(e)
+
+
+class ResponsavelFilter(FiltroEmCache):
+    title = 'usuário'
+    parameter_name = 'responsavel'
+
+    def carregar_opcoes(self, request):
+        # Só quem já registrou alguma movimentação: um EXISTS por usuário (índice), sem DISTINCT na tabela
+        com_movimentacao = Exists(Movimentacao.objects.filter(usuario=OuterRef('pk')))
+        for pk, username in User.objects.filter(com_movimentacao).order_by('username').values_list('pk', 'username'):
+            yield str(pk), username
+
+    def filtrar(self, queryset, valor):
+        return queryset.filter(usuario_id=int(valor))
+
+
+class CategoriaProdutoFilter(FiltroEmCache):
+    title = 'categoria'
+    parameter_name = 'categoria'
+
+    def chave_cache(self, request):
+        # Versão das categorias na chave: criar ou renomear uma categoria já aparece no filtro
+        return f'{super().chave_cache(request)}:{versao_categorias()}'
+
+    def carregar_opcoes(self, request):
+        for pk, nome in Categoria.objects.order_by('nome').values_list('pk', 'nome'):
+            yield str(pk), nome
+
+    def filtrar(self, queryset, valor):
+        return queryset.filter(produto__categoria_id=int(valor))
+
+
+class MesFilter(FiltroEmCache):
+    """Meses entre a primeira e a última fotografia diária (duas buscas no índice de SaldoDiario.data)."""
+
+    title = 'mês'
+    parameter_name = 'mes'
+
+    def carregar_opcoes(self, request):
+        if fotografias_cobrem():
+            periodo = SaldoDiario.objects.aggregate(inicio=Min('data'), fim=Max('data'))
+        else:
+            periodo = Movimentacao.objects.aggregate(inicio=Min('created_at'), fim=Max('created_at'))
+            periodo = {chave: valor and timezone.localdate(valor) for chave, valor in periodo.items()}
+        if periodo['inicio'] is None:
+            return
+        mes = periodo['fim'].replace(day=1)
+        primeiro = periodo['inicio'].replace(day=1)
+        while mes >= primeiro:
+            yield f'{mes:%Y-%m}', date_format(mes, 'F/Y')
+            mes = (mes - date.resolution).replace(day=1)
+
+    def choices(self, changelist):
+        # Trocar de mês descarta o dia escolhido (senão o filtro combinado fica sempre vazio)
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name, DiaFilter.parameter_name]),
+            'display': 'Todos',
+        }
+        for valor, rotulo in self.lookup_choices:
+            yield {
+                'selected': self.value() == valor,
+                'query_string': changelist.get_query_string({self.parameter_name: valor}, [DiaFilter.parameter_name]),
+                'display': rotulo,
+            }
+
+    def filtrar(self, queryset, valor):
+        inicio = ler_mes(valor)
+        return queryset.filter(created_at__gte=inicio_do_dia(inicio), created_at__lt=inicio_do_dia(proximo_mes(inicio)))
+
+
+class DiaFilter(FiltroEmCache):
+    """Dias do mês escolhido que tiveram movimentação (só aparece depois de escolher o mês)."""
+
+    title = 'dia'
+    parameter_name = 'dia'
+
+    def mes_escolhido(self, request):
+        try:
+            return ler_mes(request.GET.get(MesFilter.parameter_name, ''))
+        except ValueError:
+            return None
+
+    def chave_cache(self, request):
+        return f'{super().chave_cache(request)}:{self.mes_escolhido(request)}'
+
+    def carregar_opcoes(self, request):
+        inicio = self.mes_escolhido(request)
+        if inicio is None:
+            return
+        if fotografias_cobrem(inicio):
+            dias = SaldoDiario.objects.filter(data__gte=inicio, data__lt=proximo_mes(inicio)).dates('data', 'day', order='DESC')
+        else:
+            dias = Movimentacao.objects.filter(
+                created_at__gte=inicio_do_dia(inicio), created_at__lt=inicio_do_dia(proximo_mes(inicio))
+            ).dates('created_at', 'day', order='DESC')
+        for dia in dias:
+            yield f'{dia:%Y-%m-%d}', f'{dia:%d/%m}'
+
+    def filtrar(self, queryset, valor):
+        dia = datetime.strptime(valor, '%Y-%m-%d').date()
+        return queryset.filter(created_at__gte=inicio_do_dia(dia), created_at__lt=inicio_do_dia(dia + date.resolution))
@@ -1,6 +1,7 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import Movimentacao, Categoria, Produto
+from .caches import categorias_em_cache
 import re
 
 from django.contrib.auth.forms import AuthenticationForm
@@ -45,6 +46,23 @@ def is_cpf_valido(cpf):
 
     return True
 
+def configurar_campo_produto(form):
+    """
+    O queryset continua sendo usado para validar o produto enviado (um único .get()),
+    mas o <select> não é renderizado com todos os produtos: a lista vem do catálogo
+    em JSON (caches.py), carregado pela página via JavaScript.
+    """
+    campo = form.fields['produto']
+    campo.queryset = Produto.objects.all()
+    campo.widget.choices = []
+    # Produto já escolhido (ex: formulário voltou com erro), para o JS selecionar de novo
+    campo.widget.attrs['data-selecionado'] = form['produto'].value() or ''
+
+def configurar_campo_categoria(form):
+    """Opções do <select> de categoria vindas do cache (o queryset só valida o valor enviado)."""
+    campo = form.fields['categoria']
+    campo.choices = [('', campo.empty_label)] + [(categoria.pk, categoria.nome) for categoria in categorias_em_cache()]
+
 class MovimentacaoForm(forms.ModelForm):
     # Campo "virtual" de categoria para filtro
     categoria = forms.ModelChoiceField(
@@ -82,7 +100,8 @@ class MovimentacaoForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['solicitante_nome'].required = False
-        self.fields['produto'].queryset = Produto.objects.all().order_by('nome')
+        configurar_campo_produto(self)
+        configurar_campo_categoria(self)
 
     def clean_solicitante_cpf(self):
         cpf_original = self.cleaned_data.get('solicitante_cpf')
@@ -118,5 +137,5 @@ class SaidaRapidaForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Carrega os produtos ordenados por nome para ficar bonito
-        self.fields['produto'].queryset = Produto.objects.all().order_by('nome')
\ No newline at end of file
+        configurar_campo_produto(self)
+        configurar_campo_categoria(self)
\ No newline at end of file
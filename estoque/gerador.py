@@ -0,0 +1,305 @@
+"""
+Gerador de dados sintéticos em massa (popular-estoque.py e cenários de benchmark).
+
+Categorias, produtos e usuários entram com bulk_create e as movimentações com INSERTs
+diretos em lote (executemany, sem montar um objeto do ORM por linha nem passar pelo
+Movimentacao.save(): ~10x mais rápido com milhões de linhas). O saldo de cada produto e as
+fotografias diárias (SaldoDiario) saem do próprio histórico gerado, acumulados enquanto ele é
+sorteado, e o índice de busca é refeito uma vez no fim.
+
+Distribuições pensadas para parecer um estoque de verdade:
+- popularidade dos produtos segue uma Zipf (poucos produtos concentram o movimento);
+- volume por dia varia com o dia da semana e com a época do ano (pico em dezembro);
+- dentro do dia, horário comercial com picos de manhã e no meio da tarde;
+- saídas pequenas e frequentes; sem saldo para a saída, entra uma reposição no lugar.
+
+Determinístico: a mesma semente (e o mesmo último dia) gera exatamente os mesmos dados.
+"""
+import bisect
+import itertools
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Categoria, Produto, Movimentacao, SaldoDiario
+from .busca import backend_busca
+from .caches import invalidar_catalogo, invalidar_categorias
+from .sku import reservar_skus
+
+PALAVRAS_PRODUTO = [
+    'Guaraná', 'Açúcar', 'Café', 'Pão', 'Feijão', 'Maçã', 'Limão', 'Chocolate', 'Água', 'Cachaça',
+    'Pêssego', 'Biscoito', 'Macarrão', 'Farinha', 'Sabão', 'Detergente', 'Óleo', 'Leite', 'Manteiga', 'Suco',
+]
+
+NOMES_SOLICITANTES = [
+    'Ana Souza', 'Bruno Lima', 'Carla Mendes', 'Diego Rocha', 'Eduarda Alves', 'Felipe Costa',
+    'Gabriela Nunes', 'Henrique Dias', 'Isabela Ramos', 'João Pereira', 'Larissa Gomes', 'Marcos Teixeira',
+]
+
+TOTAL_CPFS = 500 # Poucos CPFs repetidos em muitas saídas, como na vida real
+
+# Peso de cada hora do dia (0h a 23h): expediente com picos às 10h e às 15h
+PESOS_HORA = (0, 0, 0, 0, 0, 0.1, 0.3, 1, 2.5, 3.5, 4, 3.5, 2, 2.5, 3.5, 4, 3.5, 2.5, 1.5, 0.8, 0.4, 0.2, 0.1, 0)
+# Segunda a domingo
+PESOS_DIA_SEMANA = (1.0, 1.0, 1.0, 1.0, 1.15, 0.5, 0.15)
+AMPLITUDE_SAZONAL = 0.35 # +35% no pico (fim de dezembro), -35% no vale (fim de junho)
+
+QUANTIDADE_SAIDA = (1, 5)
+QUANTIDADE_ENTRADA = (5, 30)
+QUANTIDADE_REPOSICAO = (20, 100)
+
+
+def gerar_cpf(aleatorio):
+    """CPF válido (dígitos verificadores calculados) a partir de 9 dígitos sorteados."""
+    numeros = [aleatorio.randint(0, 9) for _ in range(9)]
+    for tamanho in (9, 10):
+        soma = sum(numero * peso for numero, peso in zip(numeros, range(tamanho + 1, 1, -1)))
+        numeros.append(soma * 10 % 11 % 10)
+    return ''.join(map(str, numeros))
+
+
+def peso_do_dia(dia):
+    sazonal = 1 + AMPLITUDE_SAZONAL * math.cos(2 * math.pi * (dia.timetuple().tm_yday - 358) / 365.25)
+    return PESOS_DIA_SEMANA[dia.weekday()] * sazonal
+
+
+def movimentacoes_por_dia(total, dias, fim):
+    """Reparte `total` entre os `dias` dias terminados em `fim`, proporcional ao peso de cada dia."""
+    periodo = [fim - timedelta(days=dias - 1 - i) for i in range(dias)]
+    pesos = [peso_do_dia(dia) for dia in periodo]
+    cotas = [total * peso / sum(pesos) for peso in pesos]
+    quantidades = [int(cota) for cota in cotas]
+    # O que sobrou do arredondamento vai para os dias com a maior parte fracionária
+    sobra = total - sum(quantidades)
+    for indice in sorted(range(dias), key=lambda i: cotas[i] - quantidades[i], reverse=True)[:sobra]:
+        quantidades[indice] += 1
+    return list(zip(periodo, quantidades))
+
+
+def pesos_zipf(total, expoente):
+    """Pesos acumulados de uma Zipf: o produto na posição k pesa 1/k^expoente."""
+    return list(itertools.accumulate(1 / posicao ** expoente for posicao in range(1, total + 1)))
+
+
+# Colunas preenchidas pelo gerador, na ordem das tuplas passadas a inserir_movimentacoes()
+CAMPOS_MOVIMENTACAO = (
+    'produto', 'tipo', 'quantidade', 'usuario', 'solicitante_nome', 'solicitante_cpf', 'created_at', 'updated_at',
+)
+CAMPOS_SALDO_DIARIO = ('produto', 'data', 'saldo_inicial', 'entradas', 'saidas', 'saldo_final')
+
+
+def inserir(modelo, campos, linhas):
+    """INSERT em lote de tuplas já prontas para o banco (valores na ordem de `campos`)."""
+    operacoes = connection.ops
+    colunas = [modelo._meta.get_field(campo).column for campo in campos]
+    sql = (
+        f"INSERT INTO {operacoes.quote_name(modelo._meta.db_table)} "
+        f"({', '.join(map(operacoes.quote_name, colunas))}) VALUES ({', '.join(['%s'] * len(colunas))})"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, linhas)
+
+
+def inserir_movimentacoes(linhas):
+    inserir(Movimentacao, CAMPOS_MOVIMENTACAO, linhas)
+
+
+def gerar_categorias(total):
+    """Categorias 'Categoria 000', 'Categoria 001'... continuando a numeração das que já existem."""
+    inicio = Categoria.objects.count()
+    categorias = Categoria.objects.bulk_create([Categoria(nome=f'Categoria {i:03d}') for i in range(inicio, inicio + total)])
+    invalidar_categorias() # bulk_create não dispara os sinais
+    return categorias
+
+
+def gerar_usuarios(total, senha='usuario'):
+    """Operadores comuns 'operador001', 'operador002'... (continuando a numeração), todos com a mesma senha."""
+    inicio = User.objects.filter(username__startswith='operador').count()
+    # Um hash só para todos: o PBKDF2 por usuário levaria ~0,5s cada
+    hash_senha = make_password(senha)
+    return User.objects.bulk_create([
+        User(username=f'operador{i:03d}', password=hash_senha) for i in range(inicio + 1, inicio + total + 1)
+    ])
+
+
+def gerar_produtos(categorias, total, prefixo_sku='GER', semente=42, lote=10_000):
+    """Produtos com nomes em português e SKUs reservados na sequência do prefixo. Devolve os ids."""
+    aleatorio = random.Random(semente)
+    # Uma única reserva para o lote inteiro (um UPDATE), sem colidir com SKUs existentes
+    skus = reservar_skus(prefixo_sku, total)
+
+    ids = []
+    for inicio in range(0, total, lote):
+        produtos = Produto.objects.bulk_create([
+            Produto(
+                nome=f"{aleatorio.choice(PALAVRAS_PRODUTO)} {aleatorio.choice(PALAVRAS_PRODUTO)} {skus[i]}",
+                sku=skus[i],
+                categoria=categorias[i % len(categorias)],
+                preco=round(aleatorio.uniform(1, 100), 2),
+            )
+            for i in range(inicio, min(inicio + lote, total))
+        ])
+        ids.extend(produto.pk for produto in produtos)
+    invalidar_catalogo()
+    return ids
+
+
+def gerar_movimentacoes(ids, total, dias=0, semente=42, lote=10_000, usuarios=(), progresso=None,
+                        zipf=1.1, proporcao_saidas=0.6, fim=None, fotografias=False):
+    """
+    Gera `total` movimentações entre os produtos `ids`, em ordem cronológica nos `dias` dias
+    terminados em `fim` (padrão: ontem, para não haver horários no futuro); com dias=0 todas
+    ficam com a data de agora. `zipf` é o expoente da popularidade (0 = uniforme) e
+    `proporcao_saidas` a chance de cada linha ser uma saída. Saídas só acontecem com saldo,
+    então o histórico é sempre válido. Com `fotografias`, grava também as linhas de SaldoDiario
+    desses produtos (as mesmas que reconstruir_saldos_diarios() calcularia, sem reler a tabela).
+    Devolve {produto_id: saldo final}.
+    """
+    aleatorio = random.Random(semente)
+    cpfs = [gerar_cpf(aleatorio) for _ in range(TOTAL_CPFS)]
+    usuarios = [usuario.pk for usuario in usuarios] or [None]
+    saldos = dict.fromkeys(ids, 0)
+
+    # Ordem de popularidade sorteada (senão os primeiros ids seriam sempre os mais movimentados)
+    por_popularidade = list(ids)
+    aleatorio.shuffle(por_popularidade)
+    acumulados = pesos_zipf(len(por_popularidade), zipf)
+    limite_zipf = acumulados[-1] if acumulados else 0
+
+    if dias:
+        agenda = movimentacoes_por_dia(total, dias, fim or timezone.localdate() - timedelta(days=1))
+    else:
+        agenda = [(timezone.localdate(), total)]
+    fuso = timezone.get_current_timezone()
+    horas = range(24)
+    adaptar_data, adaptar_dia = connection.ops.adapt_datetimefield_value, connection.ops.adapt_datefield_value
+
+    # Atalhos locais: o laço abaixo roda milhões de vezes
+    sortear, sortear_inteiro, escolher, buscar = aleatorio.random, aleatorio.randint, aleatorio.choice, bisect.bisect
+    minimo_saida, maximo_saida = QUANTIDADE_SAIDA
+
+    linhas, fechamentos, gerados = [], [], 0
+    for dia, quantidade_dia in agenda:
+        if dias:
+            meia_noite = timezone.make_aware(datetime.combine(dia, datetime.min.time()), fuso)
+            segundos = sorted(hora * 3600 + sortear() * 3600 for hora in aleatorio.choices(horas, PESOS_HORA, k=quantidade_dia))
+            datas = (adaptar_data(meia_noite + timedelta(seconds=segundo)) for segundo in segundos)
+        else:
+            datas = itertools.repeat(adaptar_data(timezone.now()), quantidade_dia)
+
+        do_dia = {} # produto -> [saldo inicial, entradas, saídas]
+        for data in datas:
+            # Zipf por busca binária nos pesos acumulados (o mesmo que random.choices, sem criar listas)
+            produto_id = por_popularidade[buscar(acumulados, sortear() * limite_zipf)]
+            movimento = do_dia.get(produto_id)
+            if movimento is None:
+                movimento = do_dia[produto_id] = [saldos[produto_id], 0, 0]
+
+            nome, cpf = '', None
+            if sortear() < proporcao_saidas:
+                quantidade = sortear_inteiro(minimo_saida, maximo_saida)
+                if saldos[produto_id] >= quantidade:
+                    tipo = 'S'
+                    nome = escolher(NOMES_SOLICITANTES)
+                    cpf = escolher(cpfs) if sortear() < 0.6 else None
+                else:
+                    tipo, quantidade = 'E', sortear_inteiro(*QUANTIDADE_REPOSICAO)
+            else:
+                tipo, quantidade = 'E', sortear_inteiro(*QUANTIDADE_ENTRADA)
+
+            if tipo == 'E':
+                saldos[produto_id] += quantidade
+                movimento[1] += quantidade
+            else:
+                saldos[produto_id] -= quantidade
+                movimento[2] += quantidade
+            linhas.append((produto_id, tipo, quantidade, escolher(usuarios), nome, cpf, data, data))
+
+            if len(linhas) >= lote:
+                inserir_movimentacoes(linhas)
+                gerados += len(linhas)
+                linhas = []
+                if progresso:
+                    progresso(gerados, total)
+
+        if fotografias:
+            data_dia = adaptar_dia(dia)
+            fechamentos.extend(
+                (produto_id, data_dia, inicial, entradas, saidas, saldos[produto_id])
+                for produto_id, (inicial, entradas, saidas) in do_dia.items()
+            )
+            if len(fechamentos) >= lote:
+                inserir(SaldoDiario, CAMPOS_SALDO_DIARIO, fechamentos)
+                fechamentos = []
+
+    if linhas:
+        inserir_movimentacoes(linhas)
+        if progresso:
+            progresso(total, total)
+    if fechamentos:
+        inserir(SaldoDiario, CAMPOS_SALDO_DIARIO, fechamentos)
+
+    return saldos
+
+
+def gravar_saldos(saldos, lote=5_000):
+    """Grava o saldo final de cada produto: um UPDATE por valor de saldo (e não um CASE por produto)."""
+    por_saldo = defaultdict(list)
+    for pk, saldo in saldos.items():
+        por_saldo[saldo].append(pk)
+    for saldo, pks in por_saldo.items():
+        for inicio in range(0, len(pks), lote):
+            Produto.objects.filter(pk__in=pks[inicio:inicio + lote]).update(quantidade=saldo)
+    invalidar_catalogo()
+
+
+def gerar_dados(categorias=10, produtos=1_000, movimentacoes=100_000, usuarios=5, dias=90, semente=42,
+                lote=10_000, prefixo_sku='GER', responsaveis=(), progresso=None, **distribuicao):
+    """
+    Carga completa: categorias, usuários, produtos, movimentações, saldos, fotografias diárias
+    e índice de busca (só acrescenta: o que já existia no banco fica como está). As movimentações são divididas entre os `usuarios` operadores criados
+    aqui e os `responsaveis` informados (ex: o admin). `distribuicao` vai para
+    gerar_movimentacoes() (zipf, proporcao_saidas, fim). `progresso(etapa, feitos, total)` é
+    chamado a cada lote. Devolve um resumo com as quantidades e o tempo de cada etapa (segundos).
+    """
+    def avisar(etapa):
+        return (lambda feitos, total: progresso(etapa, feitos, total)) if progresso else None
+
+    tempos = {}
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        lista_categorias = gerar_categorias(categorias)
+        operadores = gerar_usuarios(usuarios)
+        ids = gerar_produtos(lista_categorias, produtos, prefixo_sku, semente, lote)
+        tempos['catalogo_s'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        fotografias_antes = SaldoDiario.objects.count()
+        saldos = gerar_movimentacoes(
+            ids, movimentacoes, dias, semente, lote, [*operadores, *responsaveis], avisar('movimentacoes'),
+            fotografias=True, **distribuicao,
+        )
+        gravar_saldos(saldos)
+        fotografias = SaldoDiario.objects.count() - fotografias_antes
+        tempos['movimentacoes_s'] = time.perf_counter() - inicio
+
+    # Sem save() nem sinais: o que depende deles é refeito uma vez no fim
+    inicio = time.perf_counter()
+    backend_busca().reconstruir()
+    tempos['derivados_s'] = time.perf_counter() - inicio
+
+    return {
+        'categorias': categorias,
+        'produtos': produtos,
+        'usuarios': usuarios,
+        'movimentacoes': movimentacoes,
+        'saldos_diarios': fotografias,
+        **{etapa: round(segundos, 2) for etapa, segundos in tempos.items()},
+    }
@@ -0,0 +1,157 @@
+"""
+Chave de idempotência nos POSTs que gravam movimentações (Saída Rápida e Movimentação).
+
+O formulário leva uma chave nova a cada exibição (campo oculto `chave_idempotencia`; clientes
+de API podem mandar o cabeçalho Idempotency-Key). Na primeira vez, a chave é reservada numa
+linha de RespostaIdempotente antes da view rodar e a resposta é guardada depois. Se o
+celular reenviar o mesmo pedido (a resposta se perdeu, duplo toque, retentativa), a view não
+roda de novo: a resposta original volta de uma consulta pelo índice único (usuário, chave),
+sem tocar no estoque.
+
+- Mesma chave com outros dados: 422 (a chave foi reaproveitada por engano).
+- Mesma chave com o primeiro pedido ainda em processamento: 409, para o cliente tentar de novo.
+- Só o resultado de quem gravou algo é guardado: o redirecionamento de sucesso (PRG) ou
+  respostas que não sejam página HTML. O formulário devolvido com erro não grava nada, e a
+  chave fica livre para o pedido corrigido.
+
+A reserva vale ESTOQUE_IDEMPOTENCIA_RESERVA segundos: se o processo morrer no meio do pedido,
+a chave volta a valer depois disso. Por isso ela fica bem acima do tempo limite de uma
+requisição; menor que ele, um reenvio assumiria a chave de um pedido ainda em andamento e
+gravaria a movimentação duas vezes.
+
+As respostas valem por ESTOQUE_IDEMPOTENCIA_TTL segundos. As vencidas são apagadas por
+limpar_respostas_vencidas(), chamada nos próprios POSTs no máximo a cada
+ESTOQUE_IDEMPOTENCIA_LIMPEZA segundos por processo (um DELETE pelo índice de expira_em).
+"""
+import hashlib
+import json
+import time
+import uuid
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.utils import timezone
+
+from .models import RespostaIdempotente
+
+CAMPO = 'chave_idempotencia'
+CAMPOS_IGNORADOS = {'csrfmiddlewaretoken', CAMPO} # O token CSRF muda a cada página, a chave é a própria busca
+CABECALHOS_GUARDADOS = ('Content-Type', 'Location')
+TAMANHO_CHAVE = RespostaIdempotente._meta.get_field('chave').max_length
+
+ultima_limpeza = 0.0
+
+
+def nova_chave():
+    return uuid.uuid4().hex
+
+
+def impressao(request):
+    """Hash do que o pedido faz: rota e dados enviados (sem o token CSRF e a própria chave)."""
+    if request.content_type in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+        campos = sorted((campo, valor) for campo, valores in request.POST.lists() if campo not in CAMPOS_IGNORADOS for valor in valores)
+        dados = json.dumps(campos).encode('utf-8')
+    else:
+        dados = request.body
+    return hashlib.sha256(request.path.encode('utf-8') + b'\0' + dados).hexdigest()
+
+
+def limpar_respostas_vencidas(forcar=False):
+    """Apaga as respostas vencidas, no máximo uma vez a cada ESTOQUE_IDEMPOTENCIA_LIMPEZA segundos."""
+    global ultima_limpeza
+    agora = time.monotonic()
+    if not forcar and agora - ultima_limpeza < settings.ESTOQUE_IDEMPOTENCIA_LIMPEZA:
+        return 0
+    ultima_limpeza = agora
+    # Nenhuma tabela aponta para esta: o Django apaga com um único DELETE
+    return RespostaIdempotente.objects.filter(expira_em__lt=timezone.now()).delete()[0]
+
+
+def guardar(resposta):
+    if resposta.streaming or resposta.status_code >= 400:
+        return False
+    return resposta.status_code in (301, 302, 303, 307, 308) or not resposta.get('Content-Type', '').startswith('text/html')
+
+
+def repetir(registro):
+    resposta = HttpResponse(bytes(registro.conteudo), status=registro.status)
+    for cabecalho, valor in registro.cabecalhos.items():
+        resposta[cabecalho] = valor
+    resposta['Idempotent-Replayed'] = 'true'
+    return resposta
+
+
+def reservar(usuario, chave, impressao_pedido):
+    """
+    Reserva a chave para este pedido. Devolve (registro, None) se a view deve rodar ou
+    (None, resposta) se a chave já tem dono.
+    """
+    agora = timezone.now()
+    reserva = timedelta(seconds=settings.ESTOQUE_IDEMPOTENCIA_RESERVA)
+    try:
+        with transaction.atomic():
+            return RespostaIdempotente.objects.create(
+                usuario=usuario, chave=chave, impressao=impressao_pedido, expira_em=agora + reserva
+            ), None
+    except IntegrityError:
+        pass
+
+    registro = RespostaIdempotente.objects.filter(usuario=usuario, chave=chave).first()
+    if registro is not None and registro.expira_em <= agora:
+        # Vencida e ainda não limpa (ou reserva abandonada): o UPDATE condicional decide quem a assume
+        assumida = RespostaIdempotente.objects.filter(pk=registro.pk, expira_em__lte=agora).update(
+            impressao=impressao_pedido, status=None, cabecalhos={}, conteudo=b'', expira_em=agora + reserva
+        )
+        if assumida:
+            registro.impressao, registro.status = impressao_pedido, None
+            return registro, None
+        registro.refresh_from_db()
+
+    if registro is None or registro.status is None:
+        resposta = HttpResponse("Este pedido ainda está sendo processado. Tente de novo em instantes.", status=409)
+        resposta['Retry-After'] = '1'
+        return None, resposta
+    if registro.impressao != impressao_pedido:
+        return None, HttpResponse("Esta chave de idempotência já foi usada com outros dados.", status=422)
+    return None, repetir(registro)
+
+
+def idempotente(view):
+    """
+    Decorator para views de POST que gravam dados (usar abaixo do @login_required).
+    Sem chave no pedido, a view roda normalmente.
+    """
+    @wraps(view)
+    def envoltorio(request, *args, **kwargs):
+        chave = (request.headers.get('Idempotency-Key') or request.POST.get(CAMPO)) if request.method == 'POST' else None
+        if not chave or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        if len(chave) > TAMANHO_CHAVE:
+            return HttpResponseBadRequest(f"A chave de idempotência deve ter até {TAMANHO_CHAVE} caracteres.")
+
+        limpar_respostas_vencidas()
+        registro, resposta = reservar(request.user, chave, impressao(request))
+        if resposta is not None:
+            return resposta
+
+        try:
+            resposta = view(request, *args, **kwargs)
+        except BaseException:
+            registro.delete()
+            raise
+
+        if not guardar(resposta):
+            registro.delete() # Nada foi gravado: a chave fica livre para o pedido corrigido
+            return resposta
+
+        registro.status = resposta.status_code
+        registro.cabecalhos = {cabecalho: resposta[cabecalho] for cabecalho in CABECALHOS_GUARDADOS if resposta.has_header(cabecalho)}
+        registro.conteudo = resposta.content
+        registro.expira_em = timezone.now() + timedelta(seconds=settings.ESTOQUE_IDEMPOTENCIA_TTL)
+        registro.save(update_fields=['status', 'cabecalhos', 'conteudo', 'expira_em'])
+        return resposta
+
+    return envoltorio
@@ -0,0 +1,240 @@
+"""
+Importação de movimentações em lote (entrega de fornecedor, migração de dados antigos).
+
+Em vez de um save() por linha (full_clean + lock + UPDATE do saldo + SaldoDiario), cada
+bloco de linhas é validado de uma vez (produtos buscados com uma consulta, CPFs repetidos
+validados uma única vez), gravado com bulk_create e o saldo de cada produto recebe a
+diferença líquida do bloco de uma só vez (UPDATE com F expression).
+
+Modos de transação:
+- 'tudo': o arquivo inteiro numa transação; qualquer linha inválida desfaz a importação.
+- 'lote': cada bloco na sua transação; blocos com erro são descartados e os demais gravados.
+"""
+import csv
+import itertools
+import json
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+
+from .autocompletar import registrar_volume_em_massa
+from .caches import invalidar_catalogo
+from .concorrencia import com_retentativas
+from .forms import is_cpf_valido
+from .models import Produto, Movimentacao, SaldoDiario
+
+MODOS = ('tudo', 'lote')
+FORMATOS_IMPORTACAO = ('csv', 'jsonl')
+
+# Aceita tanto o código (E/S) quanto o nome do tipo, com ou sem acento
+TIPOS_IMPORTACAO = {
+    'E': 'E',
+    'ENTRADA': 'E',
+    'S': 'S',
+    'SAIDA': 'S',
+    'SAÍDA': 'S',
+}
+
+LIMITE_ERROS = 1000 # Erros devolvidos no resultado (o total continua sendo contado)
+
+# Numa importação o mesmo CPF costuma aparecer em muitas linhas: valida cada um só uma vez
+cpf_valido = lru_cache(maxsize=10_000)(is_cpf_valido)
+
+
+def ler_registros(linhas, formato='csv'):
+    """
+    Lê as linhas (texto) de um CSV com cabeçalho (',' ou ';') ou de um JSONL e devolve
+    (número da linha, dict). Linhas que não são um objeto JSON saem como (número, None).
+    """
+    if formato == 'jsonl':
+        for numero, linha in enumerate(linhas, start=1):
+            if not linha.strip():
+                continue
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                registro = None
+            yield numero, registro if isinstance(registro, dict) else None
+        return
+
+    linhas = iter(linhas)
+    cabecalho = next(linhas, '')
+    delimitador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    leitor = csv.DictReader(itertools.chain([cabecalho], linhas), delimiter=delimitador)
+    leitor.fieldnames = [campo.strip().lower() for campo in leitor.fieldnames or []]
+    for registro in leitor:
+        yield leitor.line_num, registro
+
+
+def texto(registro, campo):
+    valor = registro.get(campo)
+    return str(valor).strip() if valor is not None else ''
+
+
+def preparar_bloco(bloco, usuario=None):
+    """
+    Valida um bloco de (número, registro) de uma vez só. Devolve (itens, erros), onde cada
+    item é (número, dict com os campos da Movimentacao) e cada erro é uma mensagem "Linha N: ...".
+    """
+    registros = [(numero, registro) for numero, registro in bloco if registro is not None]
+    erros = [f"Linha {numero}: registro inválido." for numero, registro in bloco if registro is None]
+
+    # Produtos do bloco inteiro em duas consultas (por SKU e por id)
+    skus = {texto(registro, 'sku') for _, registro in registros} - {''}
+    ids = {texto(registro, 'produto') for _, registro in registros} - {''}
+    por_sku = dict(Produto.objects.filter(sku__in=skus).values_list('sku', 'pk'))
+    ids_existentes = set(
+        Produto.objects.filter(pk__in=[int(pk) for pk in ids if pk.isdigit()]).values_list('pk', flat=True)
+    )
+
+    itens = []
+    for numero, registro in registros:
+        problemas = []
+
+        sku = texto(registro, 'sku')
+        produto = texto(registro, 'produto')
+        if sku:
+            produto_id = por_sku.get(sku)
+            if produto_id is None:
+                problemas.append(f"SKU '{sku}' não encontrado")
+        elif produto.isdigit() and int(produto) in ids_existentes:
+            produto_id = int(produto)
+        else:
+            produto_id = None
+            problemas.append(f"produto '{produto}' não encontrado" if produto else "informe o produto (id) ou o sku")
+
+        tipo = TIPOS_IMPORTACAO.get(texto(registro, 'tipo').upper())
+        if tipo is None:
+            problemas.append("tipo deve ser E (Entrada) ou S (Saída)")
+
+        quantidade = texto(registro, 'quantidade')
+        if not quantidade.isdigit() or int(quantidade) < 1:
+            problemas.append("quantidade deve ser um número inteiro maior que zero")
+
+        nome = texto(registro, 'solicitante_nome')
+        if len(nome) > 100:
+            problemas.append("solicitante_nome com mais de 100 caracteres")
+
+        cpf = re.sub(r'\D', '', texto(registro, 'solicitante_cpf'))
+        if cpf and not cpf_valido(cpf):
+            problemas.append("CPF inválido")
+
+        if problemas:
+            erros.append(f"Linha {numero}: {'; '.join(problemas)}.")
+            continue
+
+        itens.append((numero, {
+            'produto_id': produto_id,
+            'tipo': tipo,
+            'quantidade': int(quantidade),
+            'usuario': usuario,
+            'solicitante_nome': nome,
+            'solicitante_cpf': cpf or None,
+            'observacao': texto(registro, 'observacao') or None,
+        }))
+
+    return itens, erros
+
+
+def gravar_bloco(itens, tamanho_insert=2_000):
+    """
+    Grava um bloco já validado: trava os produtos envolvidos, confere o saldo linha a linha
+    (uma saída nunca pode deixar o produto negativo), insere tudo com bulk_create e aplica
+    a diferença líquida de cada produto uma única vez. Devolve quantas linhas foram gravadas.
+    """
+    with transaction.atomic():
+        ids = sorted({campos['produto_id'] for _, campos in itens})
+        # Ordem fixa dos locks (por pk) para dois lotes simultâneos não travarem um ao outro
+        saldos_antes = dict(
+            Produto.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', 'quantidade')
+        )
+        saldos = dict(saldos_antes)
+        totais = {pk: [0, 0] for pk in ids} # entradas, saídas
+
+        erros = []
+        for numero, campos in itens:
+            produto_id, quantidade = campos['produto_id'], campos['quantidade']
+            if campos['tipo'] == 'E':
+                saldos[produto_id] += quantidade
+                totais[produto_id][0] += quantidade
+            elif saldos[produto_id] < quantidade:
+                erros.append(f"Linha {numero}: estoque insuficiente. Disponível: {saldos[produto_id]}.")
+            else:
+                saldos[produto_id] -= quantidade
+                totais[produto_id][1] += quantidade
+        if erros:
+            raise ValidationError(erros)
+
+        Movimentacao.objects.bulk_create(
+            [Movimentacao(**campos) for _, campos in itens], batch_size=tamanho_insert
+        )
+
+        aplicar_saldos(saldos_antes, saldos)
+        SaldoDiario.registrar_lote(totais, saldos)
+        # Descartado junto com o savepoint se a importação for desfeita
+        registrar_volume_em_massa({pk: entradas + saidas for pk, (entradas, saidas) in totais.items()})
+
+    return len(itens)
+
+
+def aplicar_saldos(saldos_antes, saldos):
+    """
+    Leva os produtos (já travados) de `saldos_antes` para `saldos`. Um UPDATE por valor de
+    diferença (F expression), e não um CASE gigante por produto: numa entrega típica poucos
+    valores distintos se repetem entre centenas de produtos.
+    """
+    por_diferenca = defaultdict(list)
+    for pk, saldo in saldos.items():
+        if saldo != saldos_antes[pk]:
+            por_diferenca[saldo - saldos_antes[pk]].append(pk)
+    for diferenca, pks in por_diferenca.items():
+        Produto.objects.filter(pk__in=pks).update(quantidade=F('quantidade') + diferenca)
+
+
+def importar_registros(registros, usuario=None, modo='tudo', lote=1000):
+    """
+    Importa os registros (saída de ler_registros) em blocos de `lote` linhas.
+    Devolve {'importadas', 'rejeitadas', 'total_erros', 'erros'}.
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo inválido '{modo}'. Use: {', '.join(MODOS)}.")
+
+    resultado = {'importadas': 0, 'rejeitadas': 0, 'total_erros': 0, 'erros': []}
+
+    def registrar_erros(erros, linhas_bloco):
+        resultado['rejeitadas'] += linhas_bloco
+        resultado['total_erros'] += len(erros)
+        resultado['erros'].extend(erros[:LIMITE_ERROS - len(resultado['erros'])])
+
+    def processar():
+        registros_iter = iter(registros)
+        while bloco := list(itertools.islice(registros_iter, lote)):
+            itens, erros = preparar_bloco(bloco, usuario)
+            if not erros:
+                try:
+                    # No modo 'lote' cada bloco é uma transação própria (com retentativa em conflito
+                    # de lock); no modo 'tudo' vira um savepoint dentro da transação maior
+                    resultado['importadas'] += com_retentativas(lambda: gravar_bloco(itens))
+                    continue
+                except ValidationError as e:
+                    erros = e.messages
+            registrar_erros(erros, len(bloco))
+
+    if modo == 'tudo':
+        with transaction.atomic():
+            processar()
+            if resultado['total_erros']:
+                # Tudo ou nada: desfaz também os blocos que tinham passado
+                transaction.set_rollback(True)
+                resultado['rejeitadas'] += resultado['importadas']
+                resultado['importadas'] = 0
+    else:
+        processar()
+
+    if resultado['importadas']:
+        invalidar_catalogo() # bulk_create/bulk_update não disparam os sinais
+    return resultado
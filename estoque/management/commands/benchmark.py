@@ -0,0 +1,97 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from estoque.benchmarks import CENARIOS, banco_descartavel, ambiente, comparar_resultados
+
+
+class Command(BaseCommand):
+    help = "Executa os cenários de benchmark do estoque, cada um num banco descartável próprio (nunca no banco real)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('cenarios', nargs='*', help="Cenários a executar (padrão: todos).")
+        parser.add_argument(
+            '-p', '--param', action='append', default=[], metavar='CHAVE=VALOR',
+            help="Parâmetro repassado aos cenários. Ex: -p historicos=100,1000 -p amostras=50",
+        )
+        parser.add_argument('--listar', action='store_true', help="Lista os cenários disponíveis e sai.")
+        parser.add_argument('--json', metavar='ARQUIVO', help="Grava os resultados (e o ambiente) em JSON.")
+        parser.add_argument(
+            '--comparar', metavar='ARQUIVO',
+            help="JSON de uma execução anterior: mostra a variação de cada métrica em relação a ela.",
+        )
+        parser.add_argument(
+            '--tolerancia', type=float, default=10.0,
+            help="Variação (%%) acima da qual uma métrica é marcada como regressão (padrão: 10).",
+        )
+
+    def handle(self, *args, **options):
+        if options['listar']:
+            for nome, func in CENARIOS.items():
+                self.stdout.write(f"{nome:<15} {func.__doc__ or ''}")
+            return
+
+        nomes = options['cenarios'] or list(CENARIOS)
+        desconhecidos = [nome for nome in nomes if nome not in CENARIOS]
+        if desconhecidos:
+            raise CommandError(f"Cenário(s) desconhecido(s): {', '.join(desconhecidos)}")
+
+        params = {}
+        for item in options['param']:
+            chave, sep, valor = item.partition('=')
+            if not sep:
+                raise CommandError(f"Parâmetro inválido '{item}'. Use CHAVE=VALOR.")
+            params[chave] = valor
+
+        anterior = {}
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as arquivo:
+                    anterior = json.load(arquivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Não foi possível ler '{options['comparar']}': {e}")
+            self.stdout.write(f"Comparando com o commit {anterior.get('commit') or '?'} ({anterior.get('data', '?')})")
+
+        regressoes = 0
+        relatorio = {**ambiente(), 'params': params, 'cenarios': {}}
+
+        for nome in nomes:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"▶ {nome}"))
+            # Banco novo a cada cenário: as linhas semeadas por um não entram na medição do próximo
+            with banco_descartavel():
+                inicio = time.perf_counter()
+                resultados = CENARIOS[nome](params)
+            relatorio['cenarios'][nome] = {
+                'duracao_s': round(time.perf_counter() - inicio, 2),
+                'resultados': resultados,
+            }
+
+            anteriores = anterior.get('cenarios', {}).get(nome, {}).get('resultados', [])
+            for resultado, variacoes, piorou in comparar_resultados(anteriores, resultados, options['tolerancia']):
+                linha = "  ".join(f"{chave}={valor}" for chave, valor in resultado.items())
+                self.stdout.write(f"   {linha}")
+                if not options['comparar']:
+                    continue
+                if variacoes is None:
+                    self.stdout.write("      (sem correspondente na execução anterior)")
+                    continue
+                texto = "  ".join(f"{chave} {variacao:+.1f}%" for chave, variacao in variacoes.items())
+                if piorou:
+                    regressoes += 1
+                    self.stdout.write(self.style.WARNING(f"      Δ {texto}  ⚠️ regressão"))
+                else:
+                    self.stdout.write(f"      Δ {texto}")
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as arquivo:
+                json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Resultados gravados em {options['json']}"))
+
+        if options['comparar']:
+            if regressoes:
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ {regressoes} linha(s) pioraram mais de {options['tolerancia']:g}% em relação à execução anterior."
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS("✅ Nenhuma regressão acima da tolerância."))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from estoque.saldos import reconstruir_saldos_diarios
+
+
+class Command(BaseCommand):
+    help = "Reconstrói as fotografias diárias de saldo (SaldoDiario) a partir de todo o histórico de movimentações."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help="Tamanho do lote do bulk_create (padrão: 5000).")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = reconstruir_saldos_diarios(lote=options['lote'])
+        duracao = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} fotografias diárias geradas em {duracao:.2f}s."))
@@ -0,0 +1,57 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from estoque.importacao import MODOS, FORMATOS_IMPORTACAO, ler_registros, importar_registros
+
+
+class Command(BaseCommand):
+    help = "Importa movimentações em lote de um arquivo CSV ou JSONL (entregas de fornecedor, migração de dados)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help="Caminho do arquivo .csv ou .jsonl.")
+        parser.add_argument(
+            '--formato', choices=FORMATOS_IMPORTACAO,
+            help="Formato do arquivo (padrão: deduzido pela extensão).",
+        )
+        parser.add_argument(
+            '--modo', choices=MODOS, default='tudo',
+            help="'tudo': qualquer erro desfaz a importação inteira; 'lote': só os blocos com erro são descartados.",
+        )
+        parser.add_argument('--lote', type=int, default=1000, help="Linhas por bloco (padrão: 1000).")
+        parser.add_argument('--usuario', help="Username registrado como responsável pelas movimentações.")
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or ('jsonl' if options['arquivo'].endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        usuario = None
+        if options['usuario']:
+            usuario = User.objects.filter(username=options['usuario']).first()
+            if usuario is None:
+                raise CommandError(f"Usuário '{options['usuario']}' não encontrado.")
+
+        inicio = time.perf_counter()
+        try:
+            with open(options['arquivo'], encoding='utf-8-sig', newline='') as arquivo:
+                resultado = importar_registros(
+                    ler_registros(arquivo, formato), usuario=usuario, modo=options['modo'], lote=options['lote'],
+                )
+        except OSError as erro:
+            raise CommandError(f"Não foi possível ler o arquivo: {erro}")
+        duracao = time.perf_counter() - inicio
+
+        for erro in resultado['erros']:
+            self.stderr.write(f"   {erro}")
+        if resultado['total_erros'] > len(resultado['erros']):
+            self.stderr.write(f"   ... e mais {resultado['total_erros'] - len(resultado['erros'])} erro(s).")
+
+        linhas_por_s = resultado['importadas'] / duracao if duracao else 0
+        if resultado['total_erros']:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {resultado['importadas']} linha(s) importada(s), {resultado['rejeitadas']} rejeitada(s). ({duracao:.2f}s)"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {resultado['importadas']} linha(s) importada(s) em {duracao:.2f}s ({linhas_por_s:.0f} linhas/s)."
+            ))
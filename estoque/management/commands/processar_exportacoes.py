@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from estoque.exportacao import limpar_exportacoes_expiradas, processar_pendentes
+
+
+class Command(BaseCommand):
+    help = "Worker das exportações em segundo plano: processa os jobs pendentes (uma vez ou em loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help="Fica rodando e verificando a fila.")
+        parser.add_argument('--intervalo', type=float, default=2.0, help="Segundos entre verificações no modo contínuo.")
+
+    def handle(self, *args, **options):
+        while True:
+            limpar_exportacoes_expiradas()
+            executados = processar_pendentes()
+            if executados:
+                self.stdout.write(self.style.SUCCESS(f"✅ {executados} exportação(ões) processada(s)."))
+
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
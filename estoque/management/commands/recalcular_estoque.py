@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from estoque.saldos import recalcular_saldos
+
+
+class Command(BaseCommand):
+    help = "Recalcula o saldo de todos os produtos com base no histórico de movimentações (mesma lógica do botão Sincronizar)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help="Tamanho do lote do bulk update (padrão: 1000).")
+        parser.add_argument(
+            '--usar-snapshots', action='store_true',
+            help=(
+                "Parte do fechamento de ontem (SaldoDiario) e só soma as movimentações de hoje. As fotografias "
+                "acompanham o save() e a exclusão de movimentações; se o histórico foi alterado por update() ou "
+                "SQL direto, rode `gerar_saldos_diarios` antes ou use o recálculo completo (sem esta opção)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        atualizados = recalcular_saldos(lote=options['lote'], usar_snapshots=options['usar_snapshots'])
+        duracao = time.perf_counter() - inicio
+
+        if atualizados > 0:
+            self.stdout.write(self.style.WARNING(
+                f"Sincronização concluída! {atualizados} produtos tiveram o saldo corrigido. ({duracao:.2f}s)"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"O estoque já estava 100% sincronizado. ({duracao:.2f}s)"))
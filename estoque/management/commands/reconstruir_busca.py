@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from estoque.busca import backend_busca
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice de busca de produtos (necessário após cargas com bulk_create, que não disparam sinais)."
+
+    def handle(self, *args, **options):
+        backend = backend_busca()
+        inicio = time.perf_counter()
+        total = backend.reconstruir()
+        duracao = time.perf_counter() - inicio
+
+        if backend.nome == 'fts5':
+            self.stdout.write(self.style.SUCCESS(f"✅ {total} produto(s) indexado(s) na busca FTS5. ({duracao:.2f}s)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ Backend '{backend.nome}': o índice é mantido pelo próprio banco, nada a fazer."))
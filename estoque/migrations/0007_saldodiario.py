@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0006_alter_movimentacao_options_alter_produto_categoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('saldo_inicial', models.PositiveIntegerField(default=0)),
+                ('entradas', models.PositiveIntegerField(default=0)),
+                ('saidas', models.PositiveIntegerField(default=0)),
+                ('saldo_final', models.PositiveIntegerField(default=0)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_diarios', to='estoque.produto')),
+            ],
+            options={
+                'verbose_name': 'Saldo Diário',
+                'verbose_name_plural': 'Saldos Diários',
+                'ordering': ['-data'],
+                'constraints': [models.UniqueConstraint(fields=('produto', 'data'), name='saldo_diario_produto_data_unico')],
+            },
+        ),
+    ]
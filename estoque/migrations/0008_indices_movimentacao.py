@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0007_saldodiario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['created_at', 'id'], name='mov_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['tipo', 'created_at', 'id'], name='mov_tipo_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['produto', 'created_at'], include=('tipo', 'quantidade'), name='mov_produto_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacao',
+            index=models.Index(fields=['usuario', 'created_at'], name='mov_usuario_created_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:50
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0008_indices_movimentacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacaoJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('chave', models.CharField(db_index=True, max_length=64)),
+                ('filtros', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('P', 'Pendente'), ('E', 'Em processamento'), ('C', 'Concluído'), ('F', 'Falhou')], default='P', max_length=1)),
+                ('arquivo', models.CharField(blank=True, max_length=255)),
+                ('linhas', models.PositiveIntegerField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('expira_em', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exportacoes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exportação',
+                'verbose_name_plural': 'Exportações',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+import unicodedata
+
+from django.db import migrations, transaction
+from django.db.utils import DatabaseError
+
+# Mantidos aqui (e não importados de estoque.busca) para a migração não mudar se o módulo mudar
+TABELA_FTS = 'estoque_produto_busca'
+FUNCAO_SEM_ACENTO = 'estoque_sem_acento'
+
+
+def normalizar(texto):
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acento = ''.join(letra for letra in decomposto if not unicodedata.combining(letra))
+    return ' '.join(sem_acento.lower().split())
+
+
+def criar_indice_busca(apps, schema_editor):
+    conexao = schema_editor.connection
+
+    if conexao.vendor == 'postgresql':
+        try:
+            with transaction.atomic(using=conexao.alias):
+                schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                schema_editor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+                # unaccent() não é IMMUTABLE (depende do dicionário); o wrapper fixa o dicionário
+                # e permite usar a função num índice de expressão
+                schema_editor.execute(
+                    f"CREATE OR REPLACE FUNCTION {FUNCAO_SEM_ACENTO}(text) RETURNS text AS "
+                    "$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$ "
+                    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"
+                )
+                schema_editor.execute(
+                    "CREATE INDEX IF NOT EXISTS produto_busca_trgm_idx ON estoque_produto "
+                    f"USING gin ({FUNCAO_SEM_ACENTO}(lower(nome || ' ' || coalesce(sku, ''))) gin_trgm_ops)"
+                )
+        except DatabaseError:
+            # Sem permissão para criar extensões: a busca continua funcionando com icontains
+            pass
+
+    elif conexao.vendor == 'sqlite':
+        try:
+            schema_editor.execute(f"CREATE VIRTUAL TABLE {TABELA_FTS} USING fts5(texto, tokenize='trigram')")
+        except DatabaseError:
+            # SQLite compilado sem FTS5 (ou anterior ao 3.34, sem o tokenizer trigram)
+            return
+
+        Produto = apps.get_model('estoque', 'Produto')
+        linhas = [(pk, normalizar(f"{nome} {sku or ''}")) for pk, nome, sku in Produto.objects.values_list('pk', 'nome', 'sku')]
+        with conexao.cursor() as cursor:
+            cursor.executemany(f"INSERT INTO {TABELA_FTS}(rowid, texto) VALUES (%s, %s)", linhas)
+
+
+def remover_indice_busca(apps, schema_editor):
+    conexao = schema_editor.connection
+    if conexao.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS produto_busca_trgm_idx")
+        schema_editor.execute(f"DROP FUNCTION IF EXISTS {FUNCAO_SEM_ACENTO}(text)")
+    elif conexao.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABELA_FTS}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0009_exportacaojob'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice_busca, remover_indice_busca),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:12
+
+import re
+
+from django.db import migrations, models
+
+
+def semear_sequencias(apps, schema_editor):
+    """Cada prefixo já usado começa depois do maior SKU existente (ex: REF-9876 -> próximo REF-9877)."""
+    Produto = apps.get_model('estoque', 'Produto')
+    SequenciaSku = apps.get_model('estoque', 'SequenciaSku')
+
+    maiores = {}
+    for sku in Produto.objects.exclude(sku=None).values_list('sku', flat=True).iterator():
+        encontrado = re.match(r'^(.+)-(\d+)$', sku)
+        if encontrado and len(encontrado[1]) <= 10:
+            prefixo, numero = encontrado[1], int(encontrado[2])
+            maiores[prefixo] = max(maiores.get(prefixo, 0), numero)
+
+    SequenciaSku.objects.bulk_create(
+        [SequenciaSku(prefixo=prefixo, ultimo=ultimo) for prefixo, ultimo in maiores.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0010_indice_busca_produto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenciaSku',
+            fields=[
+                ('prefixo', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('ultimo', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sequência de SKU',
+                'verbose_name_plural': 'Sequências de SKU',
+            },
+        ),
+        migrations.RunPython(semear_sequencias, migrations.RunPython.noop),
+    ]
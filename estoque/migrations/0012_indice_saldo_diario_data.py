@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0011_sequenciasku'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='saldodiario',
+            index=models.Index(fields=['data'], name='saldo_diario_data_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0012_indice_saldo_diario_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimentacao',
+            name='chave_idempotencia',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0013_movimentacao_chave_idempotencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespostaIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=64)),
+                ('impressao', models.CharField(max_length=64)),
+                ('status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('cabecalhos', models.JSONField(default=dict)),
+                ('conteudo', models.BinaryField(blank=True, default=bytes)),
+                ('expira_em', models.DateTimeField()),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resposta Idempotente',
+                'verbose_name_plural': 'Respostas Idempotentes',
+                'indexes': [models.Index(fields=['expira_em'], name='resposta_idem_expira_idx')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'chave'), name='resposta_idempotente_unica')],
+            },
+        ),
+    ]
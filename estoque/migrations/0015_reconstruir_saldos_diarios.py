@@ -0,0 +1,57 @@
+from django.db import migrations
+from django.db.models import Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def reconstruir_saldos_diarios(apps, schema_editor):
+    """
+    Bancos com histórico anterior à 0007 ficaram sem fotografias (ou só com os dias depois dela),
+    e o que lê SaldoDiario contaria esse histórico como zero. Refaz tudo a partir das
+    movimentações, como o comando `gerar_saldos_diarios` (mantido aqui, e não importado de
+    estoque.saldos, para a migração não mudar se o módulo mudar).
+    """
+    Movimentacao = apps.get_model('estoque', 'Movimentacao')
+    SaldoDiario = apps.get_model('estoque', 'SaldoDiario')
+
+    por_dia = (
+        Movimentacao.objects.order_by()
+        .annotate(data=TruncDate('created_at'))
+        .values('produto_id', 'data')
+        .annotate(
+            entradas=Coalesce(Sum('quantidade', filter=Q(tipo='E')), Value(0)),
+            saidas=Coalesce(Sum('quantidade', filter=Q(tipo='S')), Value(0)),
+        )
+        .order_by('produto_id', 'data')
+    )
+
+    SaldoDiario.objects.all().delete()
+    pendentes = []
+    produto_atual, saldo = None, 0
+    for linha in por_dia.iterator(chunk_size=5000):
+        if linha['produto_id'] != produto_atual:
+            produto_atual, saldo = linha['produto_id'], 0
+        saldo_inicial = saldo
+        saldo = max(saldo + linha['entradas'] - linha['saidas'], 0)
+        pendentes.append(SaldoDiario(
+            produto_id=produto_atual,
+            data=linha['data'],
+            saldo_inicial=saldo_inicial,
+            entradas=linha['entradas'],
+            saidas=linha['saidas'],
+            saldo_final=saldo,
+        ))
+        if len(pendentes) >= 5000:
+            SaldoDiario.objects.bulk_create(pendentes)
+            pendentes = []
+    SaldoDiario.objects.bulk_create(pendentes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0014_respostaidempotente'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconstruir_saldos_diarios, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0015_reconstruir_saldos_diarios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoCache',
+            fields=[
+                ('grupo', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('versao', models.CharField(max_length=12)),
+            ],
+            options={
+                'verbose_name': 'Versão de Cache',
+                'verbose_name_plural': 'Versões de Cache',
+            },
+        ),
+    ]
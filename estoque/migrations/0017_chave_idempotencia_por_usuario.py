@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0016_versaocache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimentacao',
+            name='chave_idempotencia',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='movimentacao',
+            constraint=models.UniqueConstraint(fields=('usuario', 'chave_idempotencia'), name='mov_usuario_chave_unica'),
+        ),
+    ]
@@ -1,8 +1,13 @@
-from django.db import models
+from datetime import datetime, time
+
+from django.db import models, transaction
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.contrib.auth.models import User
-import random
+import uuid
 
 class Categoria(models.Model):
     nome = models.CharField(max_length=50, unique=True)
@@ -30,22 +35,31 @@ class Produto(models.Model):
     def save(self, *args, **kwargs):
         # Apenas gera se o SKU estiver vazio e tivermos uma categoria selecionada
         if not self.sku and self.categoria:
+            from .sku import gerar_sku
+
             # Pega as 3 primeiras letras da categoria (Ex: "Refrigerante" -> "REF")
             prefixo = self.categoria.nome[:3].upper()
-            
-            # Gera 4 números aleatórios
-            aleatorio = random.randint(1000, 9999)
-            
-            # Monta o SKU final
-            self.sku = f"{prefixo}-{aleatorio}"
-            
-            # (Opcional) Loop simples para garantir que não gere um duplicado (muito raro acontecer)
-            while Produto.objects.filter(sku=self.sku).exists():
-                aleatorio = random.randint(1000, 9999)
-                self.sku = f"{prefixo}-{aleatorio}"
+
+            # Próximo número da sequência do prefixo (contador no banco; pula SKUs digitados à mão)
+            self.sku = gerar_sku(prefixo)
 
         super().save(*args, **kwargs)
 
+class SequenciaSku(models.Model):
+    """
+    Contador de SKUs por prefixo (ex: "REF" -> último número usado).
+    Incrementado com um único UPDATE atômico em sku.py; nunca volta atrás.
+    """
+    prefixo = models.CharField(max_length=10, primary_key=True)
+    ultimo = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefixo}: {self.ultimo}"
+
+    class Meta:
+        verbose_name = "Sequência de SKU"
+        verbose_name_plural = "Sequências de SKU"
+
 class Movimentacao(models.Model):
     TIPO_CHOICES = (
         ('E', 'Entrada'),
@@ -61,6 +75,10 @@ class Movimentacao(models.Model):
     # Dados do solicitante
     solicitante_nome = models.CharField(max_length=100, blank=True)
     solicitante_cpf = models.CharField(max_length=14, blank=True, null=True) # Ex: 000.000.000-00
+
+    # Gerada no aparelho para cada saída da fila offline (ver sincronizacao.py): reenviar o
+    # mesmo lote depois de uma queda de rede não grava a saída duas vezes
+    chave_idempotencia = models.CharField(max_length=64, null=True, blank=True, editable=False) # Única por usuário (ver Meta)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -96,14 +114,69 @@ class Movimentacao(models.Model):
             #     raise ValidationError(f"O CPF {self.solicitante_cpf} já atingiu o limite de 3 retiradas hoje.")
 
     def save(self, *args, **kwargs):
-        # Executa as validações (o clean não roda automaticamente no save por padrão)
-        self.full_clean()
-        
-        # Atualiza o estoque do produto automaticamente
-        # Nota: Em um sistema real de alta concorrência, usaríamos F() expressions ou Signals
-        super().save(*args, **kwargs) 
-        
-        # Recalcula o saldo do produto (Simples e Seguro)
+        nova = self._state.adding
+
+        try:
+            with transaction.atomic():
+                # Trava a linha do produto até o fim da transação (SELECT ... FOR UPDATE no
+                # PostgreSQL; no SQLite a transação IMMEDIATE já serializa os escritores).
+                # Assim o clean() valida contra o saldo real do banco, não uma cópia antiga.
+                if self.produto_id:
+                    self.produto.quantidade = (
+                        Produto.objects.select_for_update()
+                        .values_list('quantidade', flat=True)
+                        .get(pk=self.produto_id)
+                    )
+
+                # Executa as validações (o clean não roda automaticamente no save por padrão)
+                self.full_clean()
+
+                # Modo auditoria (ou edição de registro antigo): refaz a soma completa do histórico
+                if not nova or getattr(settings, 'ESTOQUE_MODO_AUDITORIA', False):
+                    super().save(*args, **kwargs)
+                    self.recalcular_saldo_produto()
+                else:
+                    # Caminho rápido: aplica só a diferença no saldo (custo fixo, independe do histórico)
+                    self.aplicar_delta_saldo()
+                    super().save(*args, **kwargs)
+
+                # Fotografia diária do saldo: a nova soma no dia; a edição refaz os dias seguintes
+                if nova:
+                    SaldoDiario.registrar(self)
+                else:
+                    SaldoDiario.refazer(self.produto_id, timezone.localdate(self.created_at))
+        except Exception:
+            # Se a transação foi desfeita, o objeto volta a ser "novo" para poder ser salvo de novo
+            # (ex: retentativa após conflito de lock em concorrencia.com_retentativas)
+            if nova:
+                self.pk = None
+                self._state.adding = True
+            raise
+
+    def aplicar_delta_saldo(self):
+        """
+        Atualiza o saldo com um único UPDATE atômico (F expression).
+        Na saída, a condição quantidade >= X fica no próprio WHERE, então o banco
+        nunca deixa o saldo negativo, mesmo com duas requisições simultâneas.
+        """
+        produtos = Produto.objects.filter(pk=self.produto_id)
+
+        if self.tipo == 'S':
+            atualizados = produtos.filter(quantidade__gte=self.quantidade).update(
+                quantidade=F('quantidade') - self.quantidade
+            )
+        else:
+            atualizados = produtos.update(quantidade=F('quantidade') + self.quantidade)
+
+        self.produto.refresh_from_db(fields=['quantidade'])
+
+        if not atualizados:
+            raise ValidationError({
+                'quantidade': f'Estoque insuficiente. Disponível: {self.produto.quantidade}.'
+            })
+
+    def recalcular_saldo_produto(self):
+        """Recalcula o saldo somando todo o histórico do produto (usado no modo auditoria)."""
         entradas = self.produto.movimentacoes.filter(tipo='E').aggregate(models.Sum('quantidade'))['quantidade__sum'] or 0
         saidas = self.produto.movimentacoes.filter(tipo='S').aggregate(models.Sum('quantidade'))['quantidade__sum'] or 0
         
@@ -115,7 +188,241 @@ class Movimentacao(models.Model):
         
         self.produto.quantidade = novo_saldo
         self.produto.save()
+
     class Meta:
         verbose_name = "Movimentação"
         verbose_name_plural = "Movimentações"
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        # Índices pensados para os filtros do Histórico, da Exportação e do Admin,
+        # que sempre ordenam por -created_at (o banco percorre o índice de trás para frente)
+        indexes = [
+            # Listagem padrão, intervalos de data e paginação por cursor (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='mov_created_id_idx'),
+            # Filtro por tipo (Entrada/Saída) + ordem por data
+            models.Index(fields=['tipo', 'created_at', 'id'], name='mov_tipo_created_idx'),
+            # Histórico de um produto (Admin inline, recálculos); no PostgreSQL cobre tipo e quantidade
+            models.Index(fields=['produto', 'created_at'], name='mov_produto_created_idx', include=['tipo', 'quantidade']),
+            # Filtro por responsável no Admin
+            models.Index(fields=['usuario', 'created_at'], name='mov_usuario_created_idx'),
+        ]
+        constraints = [
+            # Chave da fila offline da Saída Rápida (sincronizacao.py): cada aparelho gera as
+            # suas, então só precisam ser únicas por usuário
+            models.UniqueConstraint(fields=['usuario', 'chave_idempotencia'], name='mov_usuario_chave_unica'),
+        ]
+
+class SaldoDiario(models.Model):
+    """
+    Fotografia do saldo de um produto por dia (abertura, entradas, saídas, fechamento).
+    Mantida a cada movimentação (editar ou excluir uma antiga refaz os dias seguintes) e
+    reconstruída pelo comando `gerar_saldos_diarios`, permite saber o saldo em qualquer
+    data lendo O(dias) linhas em vez de O(movimentações).
+    """
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='saldos_diarios')
+    data = models.DateField()
+    saldo_inicial = models.PositiveIntegerField(default=0)
+    entradas = models.PositiveIntegerField(default=0)
+    saidas = models.PositiveIntegerField(default=0)
+    saldo_final = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.produto.nome} - {self.data:%d/%m/%Y}: {self.saldo_final}"
+
+    @classmethod
+    def registrar(cls, movimentacao):
+        """
+        Soma a movimentação na linha do dia. Roda dentro da transação do save, com a linha do
+        produto travada, então duas movimentações do mesmo produto nunca disputam o mesmo dia.
+        """
+        data = timezone.localdate(movimentacao.created_at)
+        entrada = movimentacao.quantidade if movimentacao.tipo == 'E' else 0
+        saida = movimentacao.quantidade if movimentacao.tipo == 'S' else 0
+        saldo_atual = movimentacao.produto.quantidade
+
+        atualizados = cls.objects.filter(produto_id=movimentacao.produto_id, data=data).update(
+            entradas=F('entradas') + entrada,
+            saidas=F('saidas') + saida,
+            saldo_final=saldo_atual,
+        )
+        if not atualizados:
+            cls.objects.create(
+                produto_id=movimentacao.produto_id,
+                data=data,
+                saldo_inicial=saldo_atual - entrada + saida,
+                entradas=entrada,
+                saidas=saida,
+                saldo_final=saldo_atual,
+            )
+
+    @classmethod
+    def registrar_lote(cls, totais, saldos):
+        """
+        Versão em massa do registrar (importação): `totais` é {produto_id: (entradas, saídas)}
+        do bloco e `saldos` o saldo final de cada produto. Roda com os produtos travados.
+        """
+        data = timezone.localdate()
+        existentes = set(cls.objects.filter(data=data, produto_id__in=totais).values_list('produto_id', flat=True))
+
+        # Linhas do dia que já existem: um UPDATE por combinação (entradas, saídas), com o
+        # fechamento recalculado pelo próprio banco (abertura + entradas - saídas)
+        por_total = {}
+        for produto_id in existentes:
+            por_total.setdefault(tuple(totais[produto_id]), []).append(produto_id)
+        for (entradas, saidas), produtos in por_total.items():
+            cls.objects.filter(data=data, produto_id__in=produtos).update(
+                entradas=F('entradas') + entradas,
+                saidas=F('saidas') + saidas,
+                saldo_final=F('saldo_inicial') + F('entradas') + entradas - F('saidas') - saidas,
+            )
+
+        cls.objects.bulk_create(
+            [
+                cls(
+                    produto_id=produto_id,
+                    data=data,
+                    saldo_inicial=saldos[produto_id] - entradas + saidas,
+                    entradas=entradas,
+                    saidas=saidas,
+                    saldo_final=saldos[produto_id],
+                )
+                for produto_id, (entradas, saidas) in totais.items()
+                if produto_id not in existentes
+            ],
+            batch_size=1000,
+        )
+
+    @classmethod
+    def refazer(cls, produto_id, desde):
+        """
+        Refaz as fotografias do produto da data `desde` em diante, a partir das movimentações
+        (editar ou excluir um registro antigo muda todos os fechamentos seguintes). Lê só os
+        dias a partir de `desde`: a abertura vem do fechamento anterior.
+        """
+        inicio = timezone.make_aware(datetime.combine(desde, time.min))
+        entradas = Coalesce(Sum('quantidade', filter=Q(tipo='E')), Value(0))
+        saidas = Coalesce(Sum('quantidade', filter=Q(tipo='S')), Value(0))
+        movimentacoes = Movimentacao.objects.filter(produto_id=produto_id).order_by()
+
+        with transaction.atomic():
+            cls.objects.filter(produto_id=produto_id, data__gte=desde).delete()
+            saldo = (
+                cls.objects.filter(produto_id=produto_id, data__lt=desde)
+                .order_by('-data').values_list('saldo_final', flat=True).first()
+            )
+            if saldo is None:
+                # Sem fotografia anterior: histórico de antes das fotografias (ou nenhum)
+                totais = movimentacoes.filter(created_at__lt=inicio).aggregate(entradas=entradas, saidas=saidas)
+                saldo = max(totais['entradas'] - totais['saidas'], 0)
+
+            por_dia = (
+                movimentacoes.filter(created_at__gte=inicio)
+                .annotate(data=TruncDate('created_at'))
+                .values('data')
+                .annotate(entradas=entradas, saidas=saidas)
+                .order_by('data')
+            )
+            novas = []
+            for linha in por_dia:
+                saldo_inicial = saldo
+                saldo = max(saldo + linha['entradas'] - linha['saidas'], 0)
+                novas.append(cls(
+                    produto_id=produto_id,
+                    data=linha['data'],
+                    saldo_inicial=saldo_inicial,
+                    entradas=linha['entradas'],
+                    saidas=linha['saidas'],
+                    saldo_final=saldo,
+                ))
+            cls.objects.bulk_create(novas)
+
+    class Meta:
+        verbose_name = "Saldo Diário"
+        verbose_name_plural = "Saldos Diários"
+        ordering = ['-data']
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'data'], name='saldo_diario_produto_data_unico'),
+        ]
+        indexes = [
+            # Período coberto e dias com movimento (filtros de data do Admin de Movimentações)
+            models.Index(fields=['data'], name='saldo_diario_data_idx'),
+        ]
+
+
+class ExportacaoJob(models.Model):
+    """
+    Exportação do Histórico processada em segundo plano (ver exportacao.py).
+    Jobs com os mesmos filtros compartilham o mesmo arquivo enquanto ele não expira.
+    """
+    STATUS_CHOICES = (
+        ('P', 'Pendente'),
+        ('E', 'Em processamento'),
+        ('C', 'Concluído'),
+        ('F', 'Falhou'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    chave = models.CharField(max_length=64, db_index=True) # Hash dos filtros (deduplicação)
+    filtros = models.JSONField(default=dict)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default='P')
+    arquivo = models.CharField(max_length=255, blank=True)
+    linhas = models.PositiveIntegerField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='exportacoes')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+    expira_em = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Exportação {self.id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Exportação"
+        verbose_name_plural = "Exportações"
+        ordering = ['-created_at']
+
+
+class RespostaIdempotente(models.Model):
+    """
+    Resposta já dada a um POST com chave de idempotência (ver idempotencia.py). Se o cliente
+    repetir o pedido (celular que perdeu a resposta, duplo toque), recebe a mesma resposta
+    sem a movimentação ser gravada de novo. Linhas vencidas são apagadas automaticamente.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    chave = models.CharField(max_length=64)
+    impressao = models.CharField(max_length=64) # Hash da rota e dos dados enviados
+    status = models.PositiveSmallIntegerField(null=True, blank=True) # Vazio: ainda em processamento
+    cabecalhos = models.JSONField(default=dict) # Só os necessários (Content-Type, Location)
+    conteudo = models.BinaryField(default=bytes, blank=True)
+    expira_em = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.chave} ({self.status or 'em processamento'})"
+
+    class Meta:
+        verbose_name = "Resposta Idempotente"
+        verbose_name_plural = "Respostas Idempotentes"
+        constraints = [
+            # A busca de cada pedido é por este índice único
+            models.UniqueConstraint(fields=['usuario', 'chave'], name='resposta_idempotente_unica'),
+        ]
+        indexes = [
+            # Limpeza das respostas vencidas
+            models.Index(fields=['expira_em'], name='resposta_idem_expira_idx'),
+        ]
+
+
+class VersaoCache(models.Model):
+    """
+    Versão de cada grupo do cache (ver caches.py) quando o cache é por processo (LocMem):
+    guardada no banco, a troca feita por um worker vale para todos.
+    """
+    grupo = models.CharField(max_length=20, primary_key=True)
+    versao = models.CharField(max_length=12)
+
+    def __str__(self):
+        return f"{self.grupo}: {self.versao}"
+
+    class Meta:
+        verbose_name = "Versão de Cache"
+        verbose_name_plural = "Versões de Cache"
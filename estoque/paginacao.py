@@ -0,0 +1,111 @@
+"""
+Paginação por cursor (keyset) para listas grandes ordenadas por data.
+
+Em vez de OFFSET (que fica mais lento quanto mais fundo a página) e COUNT(*) a cada
+página, cada link carrega a posição (created_at, id) do último/primeiro item exibido e
+a próxima consulta começa exatamente dali: o custo de qualquer página é o mesmo.
+"""
+import base64
+import json
+
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def codificar_cursor(obj):
+    valor = f"{obj.created_at.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devolve (created_at, id) ou None se o cursor for inválido (link adulterado/antigo)."""
+    try:
+        valor = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        data, pk = valor.rsplit('|', 1)
+        created_at = parse_datetime(data)
+        return (created_at, int(pk)) if created_at else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class PaginaCursor:
+    """Página de resultados com a mesma cara do Page do Django (iterável, has_next, has_previous)."""
+
+    def __init__(self, itens, tem_proxima, tem_anterior):
+        self.object_list = itens
+        self.has_next = tem_proxima
+        self.has_previous = tem_anterior
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        return codificar_cursor(self.object_list[-1]) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return codificar_cursor(self.object_list[0]) if self.has_previous else None
+
+
+def paginar_por_cursor(queryset, cursor=None, anterior=False, por_pagina=10):
+    """
+    Pagina o queryset em ordem decrescente de (created_at, id).
+    `cursor` é a posição de referência; com `anterior=True` busca a página antes dela.
+    """
+    posicao = decodificar_cursor(cursor) if cursor else None
+    queryset = queryset.order_by('-created_at', '-id')
+
+    if posicao is None:
+        itens = list(queryset[:por_pagina + 1])
+        return PaginaCursor(itens[:por_pagina], len(itens) > por_pagina, False)
+
+    created_at, pk = posicao
+    if anterior:
+        # Anda "para trás": ordem crescente a partir do cursor e depois inverte
+        itens = list(
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            .order_by('created_at', 'id')[:por_pagina + 1]
+        )
+        tem_anterior = len(itens) > por_pagina
+        return PaginaCursor(itens[:por_pagina][::-1], True, tem_anterior)
+
+    itens = list(
+        queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))[:por_pagina + 1]
+    )
+    return PaginaCursor(itens[:por_pagina], len(itens) > por_pagina, True)
+
+
+def contagem_aproximada(queryset):
+    """
+    Total de registros sem COUNT(*) exato quando possível: no PostgreSQL usa a
+    estimativa do planejador (EXPLAIN); nos demais bancos cai para o count() normal.
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    plano = json.loads(queryset.order_by().explain(format='json'))
+    return int(plano[0]['Plan']['Plan Rows'])
+
+
+class PaginadorEstimado(Paginator):
+    """
+    Paginator do Admin para tabelas grandes: o total vem da estimativa do planejador
+    (contagem_aproximada) em vez de um COUNT(*) exato. Estimativas pequenas são confirmadas
+    com o count() de verdade, que nesse tamanho é barato (e a última página fica exata).
+    """
+
+    LIMITE_CONTAGEM_EXATA = 10_000
+
+    @cached_property
+    def count(self):
+        estimativa = contagem_aproximada(self.object_list)
+        if connection.vendor == 'postgresql' and estimativa < self.LIMITE_CONTAGEM_EXATA:
+            return self.object_list.count()
+        return estimativa
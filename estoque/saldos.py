@@ -0,0 +1,222 @@
+"""
+Rotinas de conferência/correção de saldo em massa.
+
+O saldo do dia a dia é mantido por Movimentacao.save(); aqui fica a ferramenta de
+auditoria (botão "Sincronizar" e comando `recalcular_estoque`), que recalcula o saldo
+de todos os produtos a partir do histórico usando consultas agrupadas, e as consultas
+sobre as fotografias diárias (SaldoDiario).
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Case, Exists, F, FilteredRelation, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+
+from .models import Produto, Movimentacao, SaldoDiario
+from .caches import invalidar_catalogo
+
+
+def saldo_real_expressao(relacao='movimentacoes', base=Value(0)):
+    """Soma condicional do histórico do produto: entradas somam, saídas subtraem."""
+    return Greatest(
+        base + Coalesce(
+            Sum(
+                Case(
+                    When(**{f'{relacao}__tipo': 'E'}, then=F(f'{relacao}__quantidade')),
+                    When(**{f'{relacao}__tipo': 'S'}, then=-F(f'{relacao}__quantidade')),
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            ),
+            Value(0),
+        ),
+        # Proteção contra negativo (caso o banco tenha sido manipulado erradamente)
+        Value(0),
+    )
+
+
+def inicio_do_dia(data):
+    """Meia-noite (no fuso do projeto) da data informada, como datetime aware."""
+    return timezone.make_aware(datetime.combine(data, time.min))
+
+
+def produtos_divergentes(usar_snapshots=False):
+    """
+    Uma única consulta agrupada (LEFT JOIN produto x movimentações, GROUP BY produto)
+    que devolve só os produtos cujo saldo gravado difere do histórico: (id, saldo_real).
+
+    Com `usar_snapshots`, parte do fechamento de ontem (SaldoDiario) e só soma as
+    movimentações de hoje, em vez de varrer o histórico inteiro. Produtos sem nenhuma
+    fotografia antes de hoje (novos, ou de um banco anterior às fotografias) são
+    conferidos pelo histórico inteiro numa segunda consulta: faltar a fotografia nunca
+    pode ser lido como saldo zero. As fotografias acompanham o save() e a exclusão das
+    movimentações; alterações por update() ou SQL direto exigem `gerar_saldos_diarios` antes.
+    """
+    produtos = Produto.objects.order_by()
+
+    if not usar_snapshots:
+        return divergentes(produtos, saldo_real_expressao())
+
+    hoje = timezone.localdate()
+    anteriores = SaldoDiario.objects.filter(produto=OuterRef('pk'), data__lt=hoje)
+    fechamento_anterior = anteriores.order_by('-data').values('saldo_final')[:1]
+    com_fotografia = produtos.filter(Exists(anteriores)).annotate(
+        # O JOIN só traz as movimentações de hoje (usa o índice produto + data)
+        movimentacoes_hoje=FilteredRelation(
+            'movimentacoes', condition=Q(movimentacoes__created_at__gte=inicio_do_dia(hoje))
+        ),
+    )
+    saldo = saldo_real_expressao(
+        'movimentacoes_hoje',
+        base=Subquery(fechamento_anterior, output_field=IntegerField()),
+    )
+    return [
+        *divergentes(com_fotografia, saldo),
+        *divergentes(produtos.filter(~Exists(anteriores)), saldo_real_expressao()),
+    ]
+
+
+def divergentes(produtos, saldo):
+    return (
+        produtos.values('pk', 'quantidade')
+        .annotate(saldo_real=saldo)
+        .filter(~Q(quantidade=F('saldo_real')))
+        .values_list('pk', 'saldo_real')
+    )
+
+
+def recalcular_saldos(lote=1000, usar_snapshots=False):
+    """Corrige em massa os saldos divergentes. Retorna quantos produtos foram corrigidos."""
+    with transaction.atomic():
+        corrigidos = [Produto(pk=pk, quantidade=saldo) for pk, saldo in produtos_divergentes(usar_snapshots)]
+        # bulk_update gera um UPDATE ... CASE WHEN por lote, em vez de um save() por produto
+        Produto.objects.bulk_update(corrigidos, ['quantidade'], batch_size=lote)
+
+        if corrigidos:
+            invalidar_catalogo()
+
+    return len(corrigidos)
+
+
+# --- Fotografias diárias (SaldoDiario) ---
+
+def reconstruir_saldos_diarios(lote=5000):
+    """
+    Apaga e refaz todas as fotografias diárias a partir do histórico: uma consulta
+    agrupada por produto e dia, percorrida em ordem para acumular o saldo.
+    Retorna quantas linhas foram geradas.
+    """
+    por_dia = (
+        Movimentacao.objects.order_by()
+        .annotate(data=TruncDate('created_at'))
+        .values('produto_id', 'data')
+        .annotate(
+            entradas=Coalesce(Sum('quantidade', filter=Q(tipo='E')), Value(0)),
+            saidas=Coalesce(Sum('quantidade', filter=Q(tipo='S')), Value(0)),
+        )
+        .order_by('produto_id', 'data')
+    )
+
+    total = 0
+    with transaction.atomic():
+        SaldoDiario.objects.all().delete()
+
+        pendentes = []
+        produto_atual, saldo = None, 0
+        for linha in por_dia.iterator(chunk_size=lote):
+            if linha['produto_id'] != produto_atual:
+                produto_atual, saldo = linha['produto_id'], 0
+
+            saldo_inicial = saldo
+            saldo = max(saldo + linha['entradas'] - linha['saidas'], 0)
+            pendentes.append(SaldoDiario(
+                produto_id=produto_atual,
+                data=linha['data'],
+                saldo_inicial=saldo_inicial,
+                entradas=linha['entradas'],
+                saidas=linha['saidas'],
+                saldo_final=saldo,
+            ))
+
+            if len(pendentes) >= lote:
+                SaldoDiario.objects.bulk_create(pendentes)
+                total += len(pendentes)
+                pendentes = []
+
+        SaldoDiario.objects.bulk_create(pendentes)
+        total += len(pendentes)
+
+    return total
+
+
+def fotografias_cobrem(desde=None):
+    """
+    As fotografias diárias cobrem as movimentações a partir de `desde` (ou o histórico inteiro)?
+    Num banco com histórico anterior às fotografias, só depois da migração 0015 ou do
+    `gerar_saldos_diarios`. Duas buscas em índice: a movimentação e a fotografia mais antigas.
+    """
+    movimentacoes = Movimentacao.objects.order_by('created_at')
+    if desde:
+        movimentacoes = movimentacoes.filter(created_at__gte=inicio_do_dia(desde))
+    primeira = movimentacoes.values_list('created_at', flat=True).first()
+    if primeira is None:
+        return True
+    fotografia = SaldoDiario.objects.order_by('data').values_list('data', flat=True).first()
+    return fotografia is not None and fotografia <= timezone.localdate(primeira)
+
+
+def totais_movimentacoes(movimentacoes):
+    """Entradas e saídas somadas direto das movimentações (quando não há fotografia que cubra)."""
+    return movimentacoes.order_by().aggregate(
+        entradas=Coalesce(Sum('quantidade', filter=Q(tipo='E')), Value(0)),
+        saidas=Coalesce(Sum('quantidade', filter=Q(tipo='S')), Value(0)),
+    )
+
+
+def saldo_em(produto, data):
+    """Saldo do produto ao final do dia `data`: fechamento da última fotografia até essa data."""
+    fechamento = (
+        SaldoDiario.objects.filter(produto=produto, data__lte=data)
+        .order_by('-data')
+        .values_list('saldo_final', flat=True)
+        .first()
+    )
+    if fechamento is not None:
+        return fechamento
+    # Sem fotografia até a data: ou não houve movimento até ali, ou o histórico é anterior às fotografias
+    totais = totais_movimentacoes(
+        Movimentacao.objects.filter(produto=produto, created_at__lt=inicio_do_dia(data + timedelta(days=1)))
+    )
+    return max(totais['entradas'] - totais['saidas'], 0)
+
+
+def resumo_periodo(data_inicio=None, data_fim=None, **filtros_produto):
+    """
+    Totais de entradas/saídas de um período somando as fotografias diárias
+    (O(dias x produtos)) em vez de varrer as movimentações; se elas não cobrem o
+    período (ver fotografias_cobrem), soma as movimentações.
+    `filtros_produto` aceita lookups do Produto, ex: nome__icontains, categoria_id.
+    """
+    if not fotografias_cobrem(data_inicio):
+        movimentacoes = Movimentacao.objects.all()
+        if data_inicio:
+            movimentacoes = movimentacoes.filter(created_at__gte=inicio_do_dia(data_inicio))
+        if data_fim:
+            movimentacoes = movimentacoes.filter(created_at__lt=inicio_do_dia(data_fim + timedelta(days=1)))
+        if filtros_produto:
+            movimentacoes = movimentacoes.filter(**{f'produto__{chave}': valor for chave, valor in filtros_produto.items()})
+        return totais_movimentacoes(movimentacoes)
+
+    saldos = SaldoDiario.objects.all()
+    if data_inicio:
+        saldos = saldos.filter(data__gte=data_inicio)
+    if data_fim:
+        saldos = saldos.filter(data__lte=data_fim)
+    if filtros_produto:
+        saldos = saldos.filter(**{f'produto__{chave}': valor for chave, valor in filtros_produto.items()})
+
+    return saldos.aggregate(
+        entradas=Coalesce(Sum('entradas'), Value(0)),
+        saidas=Coalesce(Sum('saidas'), Value(0)),
+    )
@@ -0,0 +1,71 @@
+"""
+Sinais do app: mantêm os caches, o índice de busca e as fotografias diárias coerentes quando
+produtos, categorias ou movimentações mudam. Operações em massa (bulk_create, bulk_update, update) não disparam
+sinais, então quem as usa chama as invalidações (e registrar_volume_em_massa) diretamente.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .autocompletar import indice_carregado
+from .busca import backend_busca
+from .caches import invalidar_catalogo, invalidar_categorias
+from .models import Categoria, Produto, Movimentacao, SaldoDiario
+
+
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+@receiver(post_save, sender=Movimentacao)
+def produto_alterado(sender, **kwargs):
+    # Movimentação altera o saldo (via UPDATE, sem sinal do Produto): também invalida
+    invalidar_catalogo()
+
+
+@receiver(post_delete, sender=Movimentacao)
+def refazer_fotografias(sender, instance, origin=None, **kwargs):
+    # Só quando a própria movimentação foi excluída: na cascata do produto as fotografias vão junto
+    if isinstance(origin, Movimentacao) or getattr(origin, 'model', None) is Movimentacao:
+        SaldoDiario.refazer(instance.produto_id, timezone.localdate(instance.created_at))
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def categoria_alterada(sender, **kwargs):
+    # Dropdowns, filtros e a tabela do Dashboard (que mostra o nome da categoria)
+    invalidar_categorias()
+
+
+@receiver(post_save, sender=Produto)
+def indexar_produto(sender, instance, **kwargs):
+    # Tabela FTS5 do SQLite (no PostgreSQL o índice é do próprio banco e isto não faz nada)
+    backend_busca().indexar(instance)
+
+
+@receiver(post_delete, sender=Produto)
+def remover_produto_da_busca(sender, instance, **kwargs):
+    backend_busca().remover(instance.pk)
+
+
+@receiver(post_save, sender=Produto)
+def atualizar_autocompletar(sender, instance, **kwargs):
+    indice = indice_carregado()
+    if indice is not None:
+        # Só depois do commit: um save desfeito não pode aparecer nas sugestões
+        dados = (instance.pk, instance.nome, instance.sku, instance.categoria_id)
+        transaction.on_commit(lambda: indice.atualizar(*dados))
+
+
+@receiver(post_delete, sender=Produto)
+def remover_do_autocompletar(sender, instance, **kwargs):
+    indice = indice_carregado()
+    if indice is not None:
+        pk = instance.pk
+        transaction.on_commit(lambda: indice.remover(pk))
+
+
+@receiver(post_save, sender=Movimentacao)
+def somar_volume_autocompletar(sender, instance, created, **kwargs):
+    indice = indice_carregado()
+    if indice is not None and created:
+        transaction.on_commit(lambda: indice.registrar_movimento(instance.produto_id, instance.quantidade))
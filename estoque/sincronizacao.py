@@ -0,0 +1,125 @@
+"""
+Sincronização da fila offline da Saída Rápida.
+
+O aparelho guarda as saídas numa fila local (localStorage) e manda várias de uma vez quando
+há rede. O lote inteiro é aplicado numa única transação: os produtos envolvidos são travados
+uma vez, as saídas entram com bulk_create e cada produto recebe a diferença líquida num só
+UPDATE (como na importação, ver importacao.py).
+
+Cada saída traz uma chave de idempotência gerada no aparelho, única por usuário (a mesma
+chave de dois usuários são duas saídas). Se a resposta se perder e o aparelho reenviar o
+lote, as saídas já gravadas voltam como 'ja_aplicada' em vez de baixarem o estoque de novo.
+Uma chave já usada com outro produto ou quantidade volta como 'conflito'. Dois envios
+simultâneos do mesmo lote disputam o lock do produto e o segundo já enxerga as chaves do
+primeiro; se a mesma chave vier com produtos diferentes, quem perde a corrida recebe o
+erro do índice único e o lote é refeito, agora enxergando as chaves gravadas.
+
+Diferente da importação, uma saída recusada (estoque insuficiente, produto apagado) não
+desfaz as outras: cada item volta com o seu status, junto com o saldo atual dos produtos
+do lote, para o aparelho atualizar a tela sem baixar o catálogo de novo.
+"""
+from django.db import IntegrityError, transaction
+
+from .autocompletar import registrar_volume_em_massa
+from .caches import invalidar_catalogo
+from .concorrencia import com_retentativas
+from .importacao import aplicar_saldos
+from .models import Produto, Movimentacao, SaldoDiario
+
+LIMITE_LOTE = 200 # Saídas por requisição (o aparelho divide filas maiores)
+TAMANHO_CHAVE = Movimentacao._meta.get_field('chave_idempotencia').max_length
+
+
+def ler_saida(item):
+    """Devolve (chave, produto_id, quantidade, erro) de um item do lote enviado pelo aparelho."""
+    if not isinstance(item, dict):
+        return None, None, None, "Item inválido."
+
+    chave = item.get('chave')
+    if not isinstance(chave, str) or not chave or len(chave) > TAMANHO_CHAVE:
+        return None, None, None, f"Informe a chave da saída (até {TAMANHO_CHAVE} caracteres)."
+
+    produto_id, quantidade = item.get('produto'), item.get('quantidade')
+    # bool é subclasse de int: true/false no JSON não valem como número
+    if not isinstance(produto_id, int) or isinstance(produto_id, bool):
+        return chave, None, None, "Produto inválido."
+    if not isinstance(quantidade, int) or isinstance(quantidade, bool) or quantidade < 1:
+        return chave, produto_id, None, "A quantidade deve ser um número inteiro maior que zero."
+    return chave, produto_id, quantidade, None
+
+
+def sincronizar_saidas(saidas, usuario=None):
+    """
+    Aplica a lista de saídas ({'chave', 'produto', 'quantidade'}) do usuário numa transação.
+    Devolve {'resultados': [{'chave', 'status', 'erro'?}, ...] na ordem recebida,
+    'saldos': {produto_id: saldo}} com o status 'aplicada', 'ja_aplicada', 'conflito' ou 'rejeitada'.
+    """
+    if len(saidas) > LIMITE_LOTE:
+        raise ValueError(f"Envie no máximo {LIMITE_LOTE} saídas por vez.")
+
+    itens = [ler_saida(item) for item in saidas]
+
+    def gravar():
+        resultados = []
+        novas = []
+        with transaction.atomic():
+            ids = sorted({produto_id for _, produto_id, _, erro in itens if not erro})
+            # Ordem fixa dos locks (por pk), como na importação
+            saldos_antes = dict(
+                Produto.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', 'quantidade')
+            )
+            saldos = dict(saldos_antes)
+            totais = {pk: [0, 0] for pk in saldos_antes} # entradas, saídas
+            # Chave -> (produto, quantidade) das saídas já gravadas deste usuário
+            gravadas = {
+                chave: (produto_id, quantidade)
+                for chave, produto_id, quantidade in Movimentacao.objects.filter(
+                    usuario=usuario, chave_idempotencia__in=[chave for chave, _, _, erro in itens if not erro]
+                ).values_list('chave_idempotencia', 'produto_id', 'quantidade')
+            }
+
+            for chave, produto_id, quantidade, erro in itens:
+                if not erro and chave in gravadas: # Reenvio (ou chave repetida no próprio lote)
+                    if gravadas[chave] == (produto_id, quantidade):
+                        resultados.append({'chave': chave, 'status': 'ja_aplicada'})
+                    else:
+                        resultados.append({
+                            'chave': chave,
+                            'status': 'conflito',
+                            'erro': "Esta chave já foi usada numa saída com outro produto ou quantidade.",
+                        })
+                    continue
+                if not erro and produto_id not in saldos:
+                    erro = "Produto não encontrado."
+                elif not erro and saldos[produto_id] < quantidade:
+                    erro = f"Estoque insuficiente. Disponível: {saldos[produto_id]}."
+                if erro:
+                    resultados.append({'chave': chave, 'status': 'rejeitada', 'erro': erro})
+                    continue
+
+                saldos[produto_id] -= quantidade
+                totais[produto_id][1] += quantidade
+                gravadas[chave] = (produto_id, quantidade)
+                novas.append(Movimentacao(
+                    produto_id=produto_id,
+                    tipo='S',
+                    quantidade=quantidade,
+                    usuario=usuario,
+                    solicitante_nome="Saída Rápida",
+                    chave_idempotencia=chave,
+                ))
+                resultados.append({'chave': chave, 'status': 'aplicada'})
+
+            if novas:
+                Movimentacao.objects.bulk_create(novas)
+                aplicar_saldos(saldos_antes, saldos)
+                SaldoDiario.registrar_lote({pk: total for pk, total in totais.items() if total[1]}, saldos)
+                registrar_volume_em_massa({pk: saidas for pk, (_, saidas) in totais.items() if saidas})
+                invalidar_catalogo() # bulk_create/update não disparam os sinais
+        return {'resultados': resultados, 'saldos': saldos}
+
+    try:
+        return com_retentativas(gravar)
+    except IntegrityError:
+        # Outro envio gravou a mesma chave (com outro produto) entre a consulta e o INSERT
+        return com_retentativas(gravar)
@@ -0,0 +1,126 @@
+"""
+Geração de SKUs sem colisão: PREFIXO-NNNN a partir de um contador por prefixo (SequenciaSku).
+
+Cada reserva é um único `UPDATE ... SET ultimo = ultimo + n RETURNING ultimo`: dois
+processos nunca recebem o mesmo número, sem loop de "sorteia e confere se existe".
+O número cresce sem limite (REF-9999 é seguido de REF-10000).
+
+SKUs digitados ou importados com o mesmo prefixo podem ocupar um número que o contador
+ainda vai entregar. Antes de devolver um SKU, gerar_sku() confere se ele já existe (uma
+consulta pelo índice único); se existir, o contador pula para depois do maior SKU do prefixo.
+
+Com ESTOQUE_SKU_BLOCO > 1 cada processo reserva blocos de números e os distribui da
+memória (uma ida ao banco a cada N produtos). Números de um bloco não usado até o fim
+do processo ficam como "buracos" na sequência, o que não afeta a unicidade.
+"""
+import re
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from .models import Produto, SequenciaSku
+
+FORMATO_SKU = re.compile(r'^(?P<prefixo>.+)-(?P<numero>\d+)$')
+
+
+def formatar_sku(prefixo, numero):
+    return f"{prefixo}-{numero:04d}"
+
+
+def maior_numero_existente(prefixo):
+    """Maior número já usado com o prefixo (SKUs antigos, importados ou digitados)."""
+    maior = 0
+    for sku in Produto.objects.filter(sku__startswith=f"{prefixo}-").values_list('sku', flat=True).iterator():
+        encontrado = FORMATO_SKU.match(sku)
+        if encontrado and encontrado['prefixo'] == prefixo:
+            maior = max(maior, int(encontrado['numero']))
+    return maior
+
+
+def criar_sequencia(prefixo):
+    """Primeira vez que o prefixo aparece: o contador começa depois do maior SKU existente."""
+    try:
+        with transaction.atomic():
+            SequenciaSku.objects.create(prefixo=prefixo, ultimo=maior_numero_existente(prefixo))
+    except IntegrityError:
+        pass # Outro processo criou ao mesmo tempo: vale a dele
+
+
+def _incrementar(prefixo, quantidade):
+    """Soma `quantidade` ao contador e devolve o novo valor (ou None se o prefixo não existe)."""
+    if connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert:
+        # Uma ida ao banco: o próprio UPDATE devolve o valor (PostgreSQL e SQLite >= 3.35)
+        tabela = connection.ops.quote_name(SequenciaSku._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {tabela} SET ultimo = ultimo + %s WHERE prefixo = %s RETURNING ultimo",
+                [quantidade, prefixo],
+            )
+            linha = cursor.fetchone()
+        return linha[0] if linha else None
+
+    with transaction.atomic():
+        if not SequenciaSku.objects.filter(prefixo=prefixo).update(ultimo=F('ultimo') + quantidade):
+            return None
+        return SequenciaSku.objects.values_list('ultimo', flat=True).get(prefixo=prefixo)
+
+
+def reservar_numeros(prefixo, quantidade=1):
+    """Reserva `quantidade` números seguidos e devolve o range deles."""
+    ultimo = _incrementar(prefixo, quantidade)
+    if ultimo is None:
+        criar_sequencia(prefixo)
+        ultimo = _incrementar(prefixo, quantidade)
+    return range(ultimo - quantidade + 1, ultimo + 1)
+
+
+def avancar_sequencia(prefixo):
+    """Leva o contador para depois do maior SKU existente do prefixo (nunca para trás)."""
+    maior = maior_numero_existente(prefixo)
+    SequenciaSku.objects.filter(prefixo=prefixo, ultimo__lt=maior).update(ultimo=maior)
+    with _trava_blocos:
+        _blocos.pop(prefixo, None) # O bloco em memória pode ter os números ocupados
+
+
+def reservar_skus(prefixo, quantidade):
+    """Vários SKUs de uma vez (cargas em massa com bulk_create)."""
+    numeros = reservar_numeros(prefixo, quantidade)
+    # Uma varredura dos SKUs do prefixo, em vez de um IN com milhares de SKUs
+    if maior_numero_existente(prefixo) >= numeros.start:
+        avancar_sequencia(prefixo)
+        numeros = reservar_numeros(prefixo, quantidade)
+    return [formatar_sku(prefixo, numero) for numero in numeros]
+
+
+# --- Blocos pré-reservados por processo ---
+
+_blocos = {}
+_trava_blocos = threading.Lock()
+
+
+def gerar_sku(prefixo):
+    """Próximo SKU livre do prefixo."""
+    sku = proximo_sku(prefixo)
+    if Produto.objects.filter(sku=sku).exists():
+        avancar_sequencia(prefixo)
+        sku = proximo_sku(prefixo)
+    return sku
+
+
+def proximo_sku(prefixo):
+    tamanho_bloco = getattr(settings, 'ESTOQUE_SKU_BLOCO', 1)
+
+    # Dentro de uma transação a reserva seria desfeita junto com ela, mas o bloco continuaria
+    # na memória (e outro processo receberia os mesmos números): ali só reserva o necessário
+    if tamanho_bloco <= 1 or connection.in_atomic_block:
+        return formatar_sku(prefixo, reservar_numeros(prefixo)[0])
+
+    with _trava_blocos:
+        numero = next(_blocos.get(prefixo, iter(())), None)
+        if numero is None:
+            # Bloco acabou (ou é o primeiro): reserva o próximo numa transação própria
+            _blocos[prefixo] = iter(reservar_numeros(prefixo, tamanho_bloco))
+            numero = next(_blocos[prefixo])
+    return formatar_sku(prefixo, numero)
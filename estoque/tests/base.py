@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from ..models import Categoria
+
+
+def criar_admin():
+    return User.objects.create_superuser('admin', 'admin@exemplo.com', 'admin')
+
+
+def criar_operador(nome='operador'):
+    return User.objects.create_user(nome, password='x')
+
+
+class EstoqueTestCase(TestCase):
+    """
+    Base dos testes do app: cria uma vez o superusuário `cls.admin` e a categoria `cls.bebidas`,
+    e a cada teste entra no client com o usuário do atributo indicado em `logado` (None não entra).
+    """
+
+    logado = 'admin'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_admin()
+        cls.bebidas = Categoria.objects.create(nome='Bebidas')
+
+    def setUp(self):
+        if self.logado:
+            self.client.force_login(getattr(self, self.logado))
@@ -0,0 +1,130 @@
+import sys
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, include, path, reverse
+
+from ..admin import LIMITE_HISTORICO_INLINE
+from ..models import Categoria, Movimentacao, Produto, SaldoDiario
+from .base import EstoqueTestCase, criar_operador
+
+
+class ConsultasAdminTests(EstoqueTestCase):
+    """
+    As listagens do Admin precisam fazer o mesmo número de consultas com 2 ou 20 linhas
+    (sem N+1), e a página do produto não pode crescer com o tamanho do histórico.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.operador = criar_operador()
+
+    def criar_linhas(self, quantidade):
+        """Categorias, produtos e movimentações novas (com usuários diferentes) para cada listagem."""
+        inicio = Categoria.objects.count()
+        for i in range(inicio, inicio + quantidade):
+            categoria = Categoria.objects.create(nome=f'Categoria {i}')
+            produto = Produto.objects.create(nome=f'Produto {i}', categoria=categoria)
+            usuario = self.admin if i % 2 else self.operador
+            Movimentacao(produto=produto, tipo='E', quantidade=5, usuario=usuario).save()
+
+    def contar_consultas(self, url):
+        self.client.get(url) # Aquece caches do processo (content types, permissões)
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return len(consultas)
+
+    def assertConsultasConstantes(self, url, linhas_iniciais=2, linhas_extras=18):
+        """Mede a página, cria mais linhas e mede de novo: o número de consultas não pode mudar."""
+        self.criar_linhas(linhas_iniciais)
+        antes = self.contar_consultas(url)
+        self.criar_linhas(linhas_extras)
+        depois = self.contar_consultas(url)
+        self.assertEqual(antes, depois, f"{url}: {antes} consultas com {linhas_iniciais} linhas, {depois} com mais {linhas_extras}")
+
+    def test_listagem_categorias(self):
+        self.assertConsultasConstantes(reverse('admin:estoque_categoria_changelist'))
+
+    def test_listagem_produtos(self):
+        self.assertConsultasConstantes(reverse('admin:estoque_produto_changelist'))
+
+    def test_listagem_movimentacoes(self):
+        self.assertConsultasConstantes(reverse('admin:estoque_movimentacao_changelist'))
+
+    def test_listagem_saldos_diarios(self):
+        self.assertConsultasConstantes(reverse('admin:estoque_saldodiario_changelist'))
+
+    @override_settings(ESTOQUE_ADMIN_TABELA_GRANDE=True)
+    def test_listagem_movimentacoes_tabela_grande(self):
+        cache.clear()
+        self.criar_linhas(20)
+        url = reverse('admin:estoque_movimentacao_changelist')
+        mes = SaldoDiario.objects.latest('data').data
+
+        for parametros in ('', f'?mes={mes:%Y-%m}', f'?mes={mes:%Y-%m}&dia={mes:%Y-%m-%d}'):
+            self.client.get(url + parametros) # Preenche o cache dos filtros
+            with CaptureQueriesContext(connection) as consultas:
+                resposta = self.client.get(url + parametros)
+            self.assertEqual(resposta.status_code, 200)
+            self.assertEqual(resposta.context['cl'].result_count, 20)
+
+            # Só o COUNT do paginador; nada de DISTINCT de datas nem consultas dos filtros
+            sql = [consulta['sql'] for consulta in consultas.captured_queries if 'estoque_movimentacao' in consulta['sql']]
+            self.assertEqual(sum('COUNT(' in consulta for consulta in sql), 1, sql)
+            self.assertFalse([consulta for consulta in sql if 'DISTINCT' in consulta], sql)
+            self.assertFalse([consulta for consulta in consultas.captured_queries if 'estoque_saldodiario' in consulta['sql']])
+
+        resposta = self.client.get(url + '?mes=invalido')
+        self.assertEqual(resposta.status_code, 302)
+
+    def test_pagina_do_produto_com_historico_grande(self):
+        produto = Produto.objects.create(nome='Guaraná', categoria=self.bebidas)
+        url = reverse('admin:estoque_produto_change', args=[produto.pk])
+
+        Movimentacao.objects.bulk_create([Movimentacao(produto=produto, tipo='E', quantidade=1) for _ in range(5)])
+        antes = self.contar_consultas(url)
+
+        Movimentacao.objects.bulk_create([Movimentacao(produto=produto, tipo='E', quantidade=1) for _ in range(500)])
+        self.assertEqual(self.contar_consultas(url), antes)
+
+        resposta = self.client.get(url)
+        self.assertEqual(len(resposta.context['inline_admin_formsets'][0].formset.forms), LIMITE_HISTORICO_INLINE)
+
+
+class UrlsSemAdmin:
+    # core/urls.py com ADMIN_SOB_DEMANDA=True: o Admin só existe no core/urls_admin.py
+    urlpatterns = [path('', include('estoque.urls'))]
+
+
+@override_settings(ADMIN_SOB_DEMANDA=True, ROOT_URLCONF=UrlsSemAdmin)
+class AdminSobDemandaTests(EstoqueTestCase):
+    """ADMIN_SOB_DEMANDA: as páginas do site não carregam o Admin; as do Admin continuam funcionando."""
+
+    def setUp(self):
+        super().setUp()
+        sys.modules.pop('core.urls_admin', None)
+        clear_url_caches()
+        self.addCleanup(clear_url_caches)
+
+    def test_admin_so_carrega_nas_urls_do_admin(self):
+        resposta = self.client.get(reverse('dashboard'))
+        self.assertContains(resposta, 'href="/admin/"')
+        self.assertNotIn('core.urls_admin', sys.modules)
+
+        self.assertRedirects(self.client.get('/admin'), '/admin/', status_code=301, fetch_redirect_response=False)
+        resposta = self.client.get('/admin/estoque/produto/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.resolver_match.view_name, 'admin:estoque_produto_changelist')
+        self.assertIn('core.urls_admin', sys.modules)
+
+        # O Admin continua revertendo as URLs do site (link "Ver site", dashboard)
+        self.assertEqual(reverse('dashboard', urlconf='core.urls_admin'), '/')
+
+    def test_so_o_prefixo_admin_exato_troca_o_urlconf(self):
+        self.assertEqual(self.client.get('/administracao/').status_code, 404)
+        self.assertEqual(self.client.get('/adminx').status_code, 404)
+        self.assertNotIn('core.urls_admin', sys.modules)
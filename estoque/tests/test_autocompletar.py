@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+from django.urls import reverse
+
+from .. import autocompletar
+from ..autocompletar import IndicePrefixos
+from ..models import Categoria, Movimentacao, Produto
+from .base import EstoqueTestCase
+
+
+class AutocompletarTests(EstoqueTestCase):
+    """Índice de prefixos em memória: busca sem acento, ordem por volume e mudanças durante a remontagem."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.limpeza = Categoria.objects.create(nome='Limpeza')
+        cls.guarana = Produto.objects.create(nome='Guaraná Antárctica', categoria=cls.bebidas)
+        cls.coca = Produto.objects.create(nome='Coca-Cola Zero', categoria=cls.bebidas)
+        cls.cloro = Produto.objects.create(nome='Cloro Gel', categoria=cls.limpeza)
+        for produto, quantidade in ((cls.cloro, 9), (cls.coca, 2)):
+            Movimentacao(produto=produto, tipo='E', quantidade=quantidade, usuario=cls.admin).save()
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(autocompletar.descartar_indice)
+
+    def nomes(self, indice, termo, **kwargs):
+        return [nome for _, nome, _, _ in indice.buscar(termo, **kwargs)]
+
+    def test_prefixo_de_qualquer_palavra_e_sku(self):
+        indice = IndicePrefixos.construir()
+        self.assertEqual(self.nomes(indice, 'GUARA'), ['Guaraná Antárctica'])
+        self.assertEqual(self.nomes(indice, 'antarc'), ['Guaraná Antárctica'])
+        self.assertEqual(self.nomes(indice, 'zero'), ['Coca-Cola Zero'])
+        self.assertEqual(self.nomes(indice, self.coca.sku.lower()), ['Coca-Cola Zero'])
+        self.assertEqual(self.nomes(indice, 'uarana'), []) # Prefixo, não substring
+
+        # Mais movimentados primeiro; a categoria filtra
+        self.assertEqual(self.nomes(indice, 'c'), ['Cloro Gel', 'Coca-Cola Zero'])
+        self.assertEqual(self.nomes(indice, 'c', categoria_id=self.bebidas.pk), ['Coca-Cola Zero'])
+
+    def test_sinais_atualizam_o_indice_carregado(self):
+        indice = autocompletar.indice_produtos()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guarana.nome = 'Guaraná Jesus'
+            self.guarana.save()
+            Movimentacao(produto=self.coca, tipo='E', quantidade=20, usuario=self.admin).save()
+
+        self.assertEqual(self.nomes(indice, 'jesus'), ['Guaraná Jesus'])
+        self.assertEqual(self.nomes(indice, 'antarc'), [])
+        self.assertEqual(self.nomes(indice, 'c'), ['Coca-Cola Zero', 'Cloro Gel'])
+
+    def test_mudancas_durante_a_remontagem_nao_se_perdem(self):
+        antigo = autocompletar.indice_produtos()
+        construir = IndicePrefixos.construir
+
+        def construir_com_mudancas():
+            novo = construir() # Leu o banco; os sinais abaixo chegam antes da troca
+            antigo.atualizar(self.guarana.pk, 'Guaraná Jesus', self.guarana.sku, self.bebidas.pk)
+            antigo.remover(self.cloro.pk)
+            antigo.registrar_movimento(self.coca.pk, 5)
+            return novo
+
+        with patch.object(IndicePrefixos, 'construir', construir_com_mudancas):
+            autocompletar._remontar()
+
+        novo = autocompletar.indice_carregado()
+        self.assertIsNot(novo, antigo)
+        self.assertEqual(self.nomes(novo, 'jesus'), ['Guaraná Jesus'])
+        self.assertEqual(self.nomes(novo, 'cloro'), [])
+        self.assertEqual(novo.volume[self.coca.pk], 7)
+
+        # Um sinal que ainda tinha o índice antigo em mãos chega ao novo
+        antigo.atualizar(self.coca.pk, 'Coca-Cola Café', self.coca.sku, self.bebidas.pk)
+        self.assertEqual(self.nomes(novo, 'cafe'), ['Coca-Cola Café'])
+
+    def test_busca_da_saida_rapida(self):
+        self.assertContains(self.client.get(reverse('registrar_saida_rapida')), reverse('autocompletar_produtos'))
+
+        resposta = self.client.get(reverse('autocompletar_produtos'), {'q': 'guara'})
+        self.assertEqual(resposta.json()['resultados'], [
+            {'id': self.guarana.pk, 'nome': 'Guaraná Antárctica', 'sku': self.guarana.sku, 'categoria_id': self.bebidas.pk},
+        ])
+        self.assertEqual(self.client.get(reverse('autocompletar_produtos'), {'q': 'c', 'limite': 'x'}).status_code, 400)
@@ -0,0 +1,68 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.db import connection
+from django.urls import reverse
+
+from .. import busca
+from ..busca import BuscaFTS5, BuscaPostgres, backend_busca, buscar_produtos
+from ..models import Produto
+from .base import EstoqueTestCase
+
+
+class BuscaProdutosTests(EstoqueTestCase):
+    """Busca do Dashboard pelo índice do banco (FTS5 trigram no SQLite, pg_trgm no PostgreSQL): sem acento nem caixa."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.guarana = Produto.objects.create(nome='GUARANÁ Antárctica 2L', categoria=cls.bebidas)
+        cls.suco = Produto.objects.create(nome='Suco de Maçã', categoria=cls.bebidas)
+        cls.agua = Produto.objects.create(nome='Água com gás 100%', categoria=cls.bebidas)
+
+    def setUp(self):
+        super().setUp()
+        self.assertIsInstance(backend_busca(), (BuscaFTS5, BuscaPostgres)) # A migração criou o índice
+
+    def buscar(self, termo):
+        return set(buscar_produtos(Produto.objects.all(), termo).values_list('nome', flat=True))
+
+    def test_sem_acento_e_sem_caixa(self):
+        self.assertEqual(self.buscar('guarana'), {'GUARANÁ Antárctica 2L'})
+        self.assertEqual(self.buscar('Guaraná antarctica'), {'GUARANÁ Antárctica 2L'})
+        self.assertEqual(self.buscar('MAÇÃ'), {'Suco de Maçã'})
+        self.assertEqual(self.buscar('agua com gas'), {'Água com gás 100%'})
+        self.assertEqual(self.buscar(self.suco.sku.lower()), {'Suco de Maçã'})
+        self.assertEqual(self.buscar('guaranaa'), set())
+
+    def test_termos_curtos_caem_no_like(self):
+        # Menos de 3 letras não forma um trigrama: a busca passa pelo LIKE, ainda sem acento
+        self.assertEqual(self.buscar('SÚ'), {'Suco de Maçã'})
+        self.assertEqual(self.buscar('2l'), {'GUARANÁ Antárctica 2L'})
+        self.assertEqual(self.buscar('a'), {'GUARANÁ Antárctica 2L', 'Suco de Maçã', 'Água com gás 100%'})
+        # Curingas do LIKE são texto comum
+        self.assertEqual(self.buscar('0%'), {'Água com gás 100%'})
+        self.assertEqual(self.buscar('_'), set())
+
+    def test_renomear_atualiza_o_indice(self):
+        self.suco.nome = 'Suco de Uva'
+        self.suco.save()
+        self.assertEqual(self.buscar('maca'), set())
+        self.assertEqual(self.buscar('uva'), {'Suco de Uva'})
+
+    @skipUnless(connection.vendor == 'sqlite', "Tabela FTS5 só existe no SQLite")
+    def test_indice_criado_depois_passa_a_ser_usado(self):
+        # Antes da migração o "não existe" não fica guardado; depois o "existe" dispensa a consulta
+        busca._encontrados.clear()
+        self.addCleanup(busca._encontrados.clear)
+        with patch.object(connection.introspection, 'table_names', return_value=[]):
+            self.assertFalse(busca.tabela_fts_existe())
+        self.assertTrue(busca.tabela_fts_existe())
+        with patch.object(connection.introspection, 'table_names', return_value=[]) as table_names:
+            self.assertTrue(busca.tabela_fts_existe())
+        table_names.assert_not_called()
+
+    def test_busca_do_dashboard(self):
+        resposta = self.client.get(reverse('dashboard'), {'search': 'guarana'})
+        self.assertContains(resposta, 'GUARANÁ Antárctica 2L')
+        self.assertNotContains(resposta, 'Suco de Maçã')
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..caches import catalogo_json, estatisticas, versoes
+from ..models import Categoria, Movimentacao, Produto, VersaoCache
+from .base import EstoqueTestCase
+
+
+class CacheDashboardTests(EstoqueTestCase):
+    """A tabela do Dashboard sai do cache até um produto, saldo ou categoria mudar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.produto = Produto.objects.create(nome='Guaraná', categoria=cls.bebidas)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        estatisticas.limpar()
+
+    def consultas_de_produto(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('dashboard'))
+        self.assertEqual(resposta.status_code, 200)
+        return resposta, [consulta['sql'] for consulta in consultas.captured_queries if 'estoque_produto' in consulta['sql']]
+
+    def test_segunda_visita_sai_do_cache(self):
+        _, consultas = self.consultas_de_produto()
+        self.assertTrue(consultas)
+        _, consultas = self.consultas_de_produto()
+        self.assertEqual(consultas, [])
+        self.assertEqual(estatisticas.resumo()['dashboard'], {'acertos': 1, 'falhas': 1, 'taxa_acerto_%': 50.0})
+
+    def test_movimentacao_e_categoria_invalidam(self):
+        self.consultas_de_produto()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Movimentacao(produto=self.produto, tipo='E', quantidade=7, usuario=self.admin).save()
+        resposta, consultas = self.consultas_de_produto()
+        self.assertTrue(consultas)
+        self.assertRegex(resposta.context['tabela'], r'>\s*7\s*</span>')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.filter(pk=self.bebidas.pk).update(nome='x') # update() não dispara sinal
+        self.assertNotContains(self.client.get(reverse('dashboard')), '>x<')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bebidas.nome = 'Refrigerantes'
+            self.bebidas.save()
+        self.assertContains(self.client.get(reverse('dashboard')), 'Refrigerantes', count=2) # dropdown + linha
+
+
+    def test_invalidacao_de_outro_worker(self):
+        # Outro worker grava um produto: a troca de versão chega pelo banco, não pelo LocMem deste processo
+        versao, _ = catalogo_json()
+        self.assertEqual(versoes('catalogo'), (versao,))
+        Produto.objects.filter(pk=self.produto.pk).update(quantidade=42)
+        VersaoCache.objects.filter(grupo='catalogo').update(versao='outro')
+
+        nova, conteudo = catalogo_json()
+        self.assertEqual(nova, 'outro')
+        self.assertIn(b'"quantidade":42', conteudo)
+
+        # Um worker que acabou de subir (LocMem vazio) enxerga a mesma versão
+        cache.clear()
+        self.assertEqual(catalogo_json()[0], 'outro')
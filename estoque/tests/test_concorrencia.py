@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+from django.db import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+from ..concorrencia import com_retentativas
+from ..models import Movimentacao, Produto
+from .base import EstoqueTestCase
+
+
+@patch('estoque.concorrencia.time.sleep')
+@patch('estoque.concorrencia.connection')
+class RetentativasTests(TestCase):
+    """com_retentativas repete só os erros de lock, com backoff, e desiste depois da última tentativa."""
+
+    def setUp(self):
+        self.chamadas = 0
+
+    def falhar(self, vezes, mensagem='database is locked'):
+        def func():
+            self.chamadas += 1
+            if self.chamadas <= vezes:
+                raise OperationalError(mensagem)
+            return 'gravado'
+        return func
+
+    def test_repete_ate_conseguir(self, conexao, dormir):
+        conexao.in_atomic_block = False
+        self.assertEqual(com_retentativas(self.falhar(2)), 'gravado')
+        self.assertEqual(self.chamadas, 3)
+        esperas = [chamada.args[0] for chamada in dormir.call_args_list]
+        self.assertEqual(len(esperas), 2)
+        self.assertLessEqual(esperas[0], esperas[1] * 1.5) # Backoff exponencial (com jitter de ±50%)
+
+    def test_desiste_na_ultima_tentativa(self, conexao, dormir):
+        conexao.in_atomic_block = False
+        with self.assertRaisesMessage(OperationalError, 'database is locked'):
+            com_retentativas(self.falhar(10), tentativas=3)
+        self.assertEqual(self.chamadas, 3)
+
+    def test_erro_que_nao_e_de_lock_sobe_direto(self, conexao, dormir):
+        conexao.in_atomic_block = False
+        with self.assertRaises(OperationalError):
+            com_retentativas(self.falhar(1, 'no such table: estoque_produto'))
+        self.assertEqual(self.chamadas, 1)
+        dormir.assert_not_called()
+
+    def test_dentro_de_transacao_nao_repete(self, conexao, dormir):
+        conexao.in_atomic_block = True # Ex: Admin (repetir só o trecho interno não seria seguro)
+        with self.assertRaises(OperationalError):
+            com_retentativas(self.falhar(1))
+        self.assertEqual(self.chamadas, 1)
+
+
+class RetentativasAdminTests(EstoqueTestCase):
+    """O formulário de movimentação do Admin repete a transação inteira num conflito de lock."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.produto = Produto.objects.create(nome='Guaraná', categoria=cls.bebidas)
+
+    @patch('estoque.concorrencia.time.sleep')
+    @patch('estoque.concorrencia.connection')
+    def test_lock_no_save_repete_o_formulario(self, conexao, _sleep):
+        conexao.in_atomic_block = False # Como numa requisição real, fora da transação do TestCase
+        salvar = Movimentacao.save
+        tentativas = []
+
+        def save_com_lock(instancia, *args, **kwargs):
+            tentativas.append(instancia)
+            if len(tentativas) == 1:
+                raise OperationalError('database is locked')
+            return salvar(instancia, *args, **kwargs)
+
+        dados = {'tipo': 'E', 'produto': self.produto.pk, 'quantidade': 4}
+        with patch.object(Movimentacao, 'save', save_com_lock):
+            resposta = self.client.post(reverse('admin:estoque_movimentacao_add'), dados)
+
+        self.assertEqual(resposta.status_code, 302)
+        self.assertEqual(len(tentativas), 2)
+        self.assertIsNot(tentativas[0], tentativas[1]) # Formulário e transação refeitos, não só o save
+        movimentacao = Movimentacao.objects.get()
+        self.assertEqual((movimentacao.usuario, movimentacao.solicitante_nome), (self.admin, 'Ajuste Admin (admin)'))
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.quantidade, 4)
@@ -0,0 +1,198 @@
+import gzip
+import io
+import sys
+import tempfile
+from datetime import timedelta
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import exportacao
+from ..models import ExportacaoJob, Movimentacao, Produto
+from .base import EstoqueTestCase, criar_operador
+
+
+class ExportacaoJobTests(EstoqueTestCase):
+    """Jobs de exportação: deduplicação, reivindicação pelo worker, expiração e falha sem arquivo pela metade."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        produto = Produto.objects.create(nome='Guaraná', categoria=cls.bebidas)
+        for quantidade in (5, 3):
+            Movimentacao(produto=produto, tipo='E', quantidade=quantidade, usuario=cls.admin).save()
+
+    def setUp(self):
+        super().setUp()
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = pasta.name
+        configuracao = override_settings(ESTOQUE_EXPORTACOES_DIR=self.pasta, ESTOQUE_EXPORTACAO_EXECUTOR='comando')
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def test_mesmos_filtros_reaproveitam_o_job(self):
+        job = exportacao.enfileirar_exportacao({'tipo': 'E'}, self.admin)
+        self.assertEqual(exportacao.enfileirar_exportacao({'tipo': 'E'}, self.admin).pk, job.pk)
+        self.assertNotEqual(exportacao.enfileirar_exportacao({'tipo': 'S'}, self.admin).pk, job.pk)
+
+        exportacao.processar_exportacao(job.pk)
+        self.assertEqual(exportacao.enfileirar_exportacao({'tipo': 'E'}, self.admin).pk, job.pk) # Concluído e dentro do TTL
+
+    def test_worker_reivindica_uma_vez_e_grava_o_arquivo(self):
+        job = exportacao.enfileirar_exportacao({}, self.admin)
+        self.assertEqual(exportacao.processar_pendentes(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.linhas), ('C', 2))
+        with gzip.open(exportacao.pasta_exportacoes() / job.arquivo, 'rt', encoding='utf-8-sig') as arquivo:
+            self.assertEqual(len(arquivo.read().splitlines()), 3) # Cabeçalho + 2 movimentações
+
+        # Um segundo worker com o mesmo id não faz nada: o UPDATE de P para E já não casa
+        with patch.object(exportacao, 'gerar_csv') as gerar:
+            self.assertFalse(exportacao.processar_exportacao(job.pk))
+        gerar.assert_not_called()
+        self.assertEqual(exportacao.processar_pendentes(), 0)
+
+    def test_pendentes_contam_so_os_reivindicados(self):
+        exportacao.enfileirar_exportacao({}, self.admin)
+        processar = exportacao.processar_exportacao
+
+        def outro_worker_chega_antes(job_id):
+            ExportacaoJob.objects.filter(pk=job_id).update(status='E')
+            return processar(job_id)
+
+        with patch.object(exportacao, 'processar_exportacao', outro_worker_chega_antes):
+            self.assertEqual(exportacao.processar_pendentes(), 0)
+
+    def test_jobs_vencidos_saem_com_o_arquivo(self):
+        job = exportacao.enfileirar_exportacao({}, self.admin)
+        exportacao.processar_exportacao(job.pk)
+        job.refresh_from_db()
+        caminho = exportacao.pasta_exportacoes() / job.arquivo
+        self.assertTrue(caminho.exists())
+
+        ExportacaoJob.objects.filter(pk=job.pk).update(expira_em=timezone.now() - timedelta(seconds=1))
+        exportacao.limpar_exportacoes_expiradas()
+        self.assertFalse(ExportacaoJob.objects.filter(pk=job.pk).exists())
+        self.assertFalse(caminho.exists())
+
+    @override_settings(ESTOQUE_EXPORTACAO_TTL=60, ESTOQUE_EXPORTACAO_LIMITE_EXECUCAO=3600)
+    def test_job_em_processamento_so_sai_depois_do_limite(self):
+        job = exportacao.enfileirar_exportacao({}, self.admin)
+        ExportacaoJob.objects.filter(pk=job.pk).update(status='E', created_at=timezone.now() - timedelta(minutes=10))
+        exportacao.limpar_exportacoes_expiradas()
+        self.assertTrue(ExportacaoJob.objects.filter(pk=job.pk).exists()) # Passou do TTL, mas o worker ainda pode estar gravando
+
+        ExportacaoJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(hours=2))
+        exportacao.limpar_exportacoes_expiradas()
+        self.assertFalse(ExportacaoJob.objects.filter(pk=job.pk).exists())
+
+    def test_job_removido_durante_a_execucao_descarta_o_arquivo(self):
+        job = exportacao.enfileirar_exportacao({}, self.admin)
+        gerar_csv = exportacao.gerar_csv
+
+        def gerar_e_remover_o_job(linhas):
+            yield from gerar_csv(linhas)
+            ExportacaoJob.objects.filter(pk=job.pk).delete() # A limpeza o deu como abandonado
+
+        with patch.object(exportacao, 'gerar_csv', gerar_e_remover_o_job), self.assertLogs('estoque.exportacao', 'WARNING'):
+            self.assertTrue(exportacao.processar_exportacao(job.pk))
+        self.assertEqual(list(exportacao.pasta_exportacoes().iterdir()), [])
+
+    def test_falha_no_meio_nao_deixa_arquivo(self):
+        def gerar_e_quebrar(linhas):
+            yield b'Data/Hora;Tipo\n'
+            raise OSError("disco cheio")
+
+        job = exportacao.enfileirar_exportacao({}, self.admin)
+        with patch.object(exportacao, 'gerar_csv', gerar_e_quebrar), self.assertLogs('estoque.exportacao', 'ERROR'):
+            exportacao.processar_exportacao(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.erro), ('F', "disco cheio"))
+        self.assertEqual(list(exportacao.pasta_exportacoes().iterdir()), [])
+
+    def test_desligada_responde_503(self):
+        with override_settings(ESTOQUE_EXPORTACAO_EXECUTOR='desligado'):
+            resposta = self.client.post(reverse('exportar_relatorio_job'))
+            self.assertEqual(resposta.status_code, 503)
+            self.assertNotContains(self.client.get(reverse('historico')), 'btn-exportar-job')
+        self.assertFalse(ExportacaoJob.objects.exists())
+
+        resposta = self.client.post(reverse('exportar_relatorio_job'))
+        self.assertEqual((resposta.status_code, resposta.json()['status']), (202, 'P'))
+
+    def test_outro_usuario_nao_ve_o_job(self):
+        job = exportacao.enfileirar_exportacao({}, self.admin)
+        exportacao.processar_exportacao(job.pk)
+        status_url, download_url = reverse('status_exportacao', args=[job.pk]), reverse('download_exportacao', args=[job.pk])
+
+        operador = criar_operador()
+        self.client.force_login(operador)
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+        self.assertEqual(self.client.get(download_url).status_code, 404)
+        self.assertNotEqual(exportacao.enfileirar_exportacao({}, operador).pk, job.pk) # Nem reaproveita o job alheio
+
+        self.client.force_login(self.admin) # O dono (e qualquer superusuário) continua acessando
+        self.assertEqual(self.client.get(status_url).json()['status'], 'C')
+        resposta = self.client.get(download_url)
+        self.assertEqual(resposta.status_code, 200)
+        resposta.close()
+
+
+class FormatosRelatorioTests(EstoqueTestCase):
+    """?format= do download direto: csv.gz é o mesmo CSV compactado e o Parquet volta tipado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        produto = Produto.objects.create(nome='Guaraná', categoria=cls.bebidas)
+        for tipo, quantidade in (('E', 5), ('E', 3), ('S', 2)):
+            Movimentacao(produto=produto, tipo=tipo, quantidade=quantidade, usuario=cls.admin).save()
+
+    def baixar(self, formato):
+        resposta = self.client.get(reverse('exportar_relatorio'), {'format': formato})
+        self.assertEqual(resposta.status_code, 200)
+        return resposta, b''.join(resposta.streaming_content)
+
+    def test_csv_gz_e_o_csv_compactado(self):
+        _, csv = self.baixar('csv')
+        resposta, compactado = self.baixar('csv.gz')
+        self.assertEqual(resposta['Content-Type'], 'application/gzip')
+        self.assertIn('relatorio_estoque.csv.gz', resposta['Content-Disposition'])
+        self.assertEqual(gzip.decompress(compactado), csv)
+        self.assertEqual(len(csv.decode('utf-8-sig').splitlines()), 4) # Cabeçalho + 3 movimentações
+
+    @skipUnless(exportacao.parquet_disponivel(), "pyarrow não instalado")
+    def test_parquet_tipado(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        _, conteudo = self.baixar('parquet')
+        tabela = pq.read_table(io.BytesIO(conteudo))
+        self.assertEqual(tabela.num_rows, 3)
+        for coluna in ('tipo', 'produto', 'categoria'):
+            self.assertTrue(pa.types.is_dictionary(tabela.schema.field(coluna).type), coluna)
+        self.assertTrue(pa.types.is_timestamp(tabela.schema.field('data_hora').type))
+        self.assertEqual(sorted(tabela.column('tipo').to_pylist()), ['Entrada', 'Entrada', 'Saída'])
+        self.assertEqual(sum(tabela.column('quantidade').to_pylist()), 10)
+
+        # Um row group por lote: o BufferSaida entrega os bytes de cada um sem corromper o arquivo
+        movimentacoes = Movimentacao.objects.order_by('-created_at', '-id')
+        arquivo = pq.ParquetFile(io.BytesIO(b''.join(exportacao.gerar_parquet(movimentacoes, linhas_por_grupo=2))))
+        self.assertEqual((arquivo.metadata.num_rows, arquivo.metadata.num_row_groups), (3, 2))
+
+    def test_formato_desconhecido(self):
+        resposta = self.client.get(reverse('exportar_relatorio'), {'format': 'xlsx'})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertContains(resposta, 'Formato inválido', status_code=400)
+
+    def test_parquet_sem_pyarrow(self):
+        with patch.dict(sys.modules, {'pyarrow': None, 'pyarrow.parquet': None}): # import falha como se não estivesse instalado
+            self.assertFalse(exportacao.parquet_disponivel())
+            resposta = self.client.get(reverse('exportar_relatorio'), {'format': 'parquet'})
+        self.assertContains(resposta, "instale o pacote 'pyarrow'", status_code=400)
@@ -0,0 +1,30 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from ..gerador import gerar_categorias, gerar_dados, gerar_movimentacoes, gerar_produtos
+from ..models import Movimentacao, SaldoDiario
+from ..saldos import inicio_do_dia, produtos_divergentes, reconstruir_saldos_diarios
+
+
+class GeradorTests(TestCase):
+    """O gerador em massa grava direto no banco: o resultado tem que bater com o que o save() produziria."""
+
+    def test_saldos_e_fotografias_batem_com_o_historico(self):
+        resumo = gerar_dados(categorias=2, produtos=30, movimentacoes=3_000, usuarios=2, dias=20)
+
+        self.assertEqual(Movimentacao.objects.count(), 3_000)
+        self.assertEqual(list(produtos_divergentes()), [])
+        self.assertFalse(Movimentacao.objects.filter(created_at__gte=inicio_do_dia(timezone.localdate())).exists())
+
+        campos = ('produto_id', 'data', 'saldo_inicial', 'entradas', 'saidas', 'saldo_final')
+        geradas = sorted(SaldoDiario.objects.values_list(*campos))
+        self.assertEqual(len(geradas), resumo['saldos_diarios'])
+        reconstruir_saldos_diarios()
+        self.assertEqual(sorted(SaldoDiario.objects.values_list(*campos)), geradas)
+
+    def test_mesma_semente_mesmos_dados(self):
+        ids = gerar_produtos(gerar_categorias(1), 10)
+        fim = timezone.localdate()
+        primeira = gerar_movimentacoes(ids, 500, dias=7, fim=fim)
+        self.assertEqual(gerar_movimentacoes(ids, 500, dias=7, fim=fim), primeira)
+        self.assertNotEqual(gerar_movimentacoes(ids, 500, dias=7, fim=fim, semente=7), primeira)
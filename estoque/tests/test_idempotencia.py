@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import idempotencia
+from ..models import Movimentacao, Produto, RespostaIdempotente
+from .base import EstoqueTestCase, criar_operador
+
+
+class IdempotenciaTests(EstoqueTestCase):
+    """Repetir o POST de uma movimentação com a mesma chave devolve a resposta original sem gravar de novo."""
+
+    logado = 'operador'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.operador = criar_operador()
+        cls.produto = Produto.objects.create(nome='Guaraná', categoria=cls.bebidas, quantidade=10)
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('registrar_saida_rapida')
+
+    def saida(self, quantidade=1, chave='k1', **extra):
+        dados = {'categoria': self.bebidas.pk, 'produto': self.produto.pk, 'quantidade': quantidade, 'chave_idempotencia': chave}
+        return self.client.post(self.url, dados, **extra)
+
+    def saldo(self):
+        self.produto.refresh_from_db()
+        return self.produto.quantidade
+
+    def test_reenvio_devolve_a_mesma_resposta(self):
+        primeira = self.saida(quantidade=2)
+        self.assertRedirects(primeira, self.url, fetch_redirect_response=False)
+        with CaptureQueriesContext(connection) as consultas:
+            repetida = self.saida(quantidade=2)
+        self.assertEqual((repetida.status_code, repetida['Location']), (302, primeira['Location']))
+        self.assertEqual(repetida['Idempotent-Replayed'], 'true')
+        self.assertFalse([c for c in consultas.captured_queries if 'estoque_produto' in c['sql']]) # Estoque intocado
+        self.assertEqual(self.saldo(), 8)
+        self.assertEqual(Movimentacao.objects.count(), 1)
+
+        # Mesma chave com outros dados; chave nova grava normalmente
+        self.assertEqual(self.saida(quantidade=3).status_code, 422)
+        self.saida(quantidade=3, chave='k2')
+        self.assertEqual(self.saldo(), 5)
+
+    def test_formulario_com_erro_nao_consome_a_chave(self):
+        resposta = self.saida(quantidade=50)
+        self.assertContains(resposta, 'Estoque insuficiente')
+        self.assertNotEqual(resposta.context['chave_idempotencia'], 'k1') # Nova chave para o próximo envio
+        self.assertFalse(RespostaIdempotente.objects.exists())
+        self.assertRedirects(self.saida(quantidade=4), self.url, fetch_redirect_response=False)
+        self.assertEqual(self.saldo(), 6)
+
+    def test_movimentacao_com_cabecalho(self):
+        url = reverse('registrar_movimentacao')
+        dados = {'tipo': 'E', 'categoria': self.bebidas.pk, 'produto': self.produto.pk, 'quantidade': 5}
+        for _ in range(2):
+            resposta = self.client.post(url, dados, headers={'Idempotency-Key': 'entrada-1'})
+            self.assertEqual((resposta.status_code, resposta['Location']), (302, reverse('dashboard')))
+        self.assertEqual(self.saldo(), 15)
+
+    def test_pedido_em_processamento_e_limpeza(self):
+        agora = timezone.now()
+        RespostaIdempotente.objects.create(usuario=self.operador, chave='k1', impressao='x', expira_em=agora + timedelta(seconds=30))
+        self.assertEqual(self.saida().status_code, 409)
+
+        # Reserva abandonada (processo que morreu no meio): depois de vencer, o reenvio é processado
+        RespostaIdempotente.objects.filter(chave='k1').update(expira_em=agora - timedelta(seconds=1))
+        self.assertEqual(self.saida().status_code, 302)
+        self.assertEqual(self.saldo(), 9)
+
+        RespostaIdempotente.objects.create(usuario=self.operador, chave='velha', impressao='x', status=302, expira_em=agora - timedelta(days=1))
+        self.assertEqual(idempotencia.limpar_respostas_vencidas(forcar=True), 1)
+        self.assertEqual(list(RespostaIdempotente.objects.values_list('chave', flat=True)), ['k1'])
+
+    @override_settings(ESTOQUE_IDEMPOTENCIA_RESERVA=900)
+    def test_reserva_configuravel(self):
+        registro, resposta = idempotencia.reservar(self.operador, 'k2', 'x')
+        self.assertIsNone(resposta)
+        self.assertAlmostEqual((registro.expira_em - timezone.now()).total_seconds(), 900, delta=5)
@@ -0,0 +1,77 @@
+import io
+
+from django.urls import reverse
+
+from .. import autocompletar
+from ..importacao import importar_registros, ler_registros
+from ..models import Movimentacao, Produto, SaldoDiario
+from .base import EstoqueTestCase
+
+
+class ImportacaoTests(EstoqueTestCase):
+    """Importação em lote: tudo ou nada, linhas com erro apontadas e o volume do autocompletar."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.produto = Produto.objects.create(nome='Guaraná', categoria=cls.bebidas)
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(autocompletar.descartar_indice)
+
+    def importar(self, corpo, modo='tudo', content_type='text/csv'):
+        url = f"{reverse('importar_movimentacoes')}?modo={modo}"
+        return self.client.post(url, data=corpo, content_type=content_type)
+
+    def test_linha_invalida_desfaz_tudo(self):
+        corpo = f"produto;tipo;quantidade\n{self.produto.pk};E;10\n{self.produto.pk};X;5\n"
+        resposta = self.importar(corpo)
+
+        self.assertEqual(resposta.status_code, 400)
+        dados = resposta.json()
+        self.assertEqual((dados['importadas'], dados['rejeitadas'], dados['total_erros']), (0, 2, 1))
+        self.assertEqual(dados['erros'], ["Linha 3: tipo deve ser E (Entrada) ou S (Saída)."])
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.quantidade, 0)
+        self.assertFalse(Movimentacao.objects.exists())
+        self.assertFalse(SaldoDiario.objects.exists())
+
+    def test_saida_acima_do_saldo_desfaz_blocos_ja_gravados(self):
+        linhas = [f'{{"produto": {self.produto.pk}, "tipo": "E", "quantidade": 3}}', f'{{"produto": {self.produto.pk}, "tipo": "S", "quantidade": 5}}']
+        resultado = importar_registros(ler_registros(linhas, 'jsonl'), usuario=self.admin, lote=1) # Um bloco por linha
+
+        self.assertEqual((resultado['importadas'], resultado['rejeitadas']), (0, 2))
+        self.assertEqual(resultado['erros'], ["Linha 2: estoque insuficiente. Disponível: 3."])
+        self.assertFalse(Movimentacao.objects.exists())
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.quantidade, 0)
+
+    def test_modo_lote_grava_os_blocos_validos_e_soma_o_volume(self):
+        indice = autocompletar.indice_produtos()
+        corpo = f"sku,tipo,quantidade\n{self.produto.sku},entrada,10\n{self.produto.sku},S,4\n"
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.importar(corpo, modo='lote')
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['importadas'], 2)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.quantidade, 6)
+        self.assertEqual(indice.volume[self.produto.pk], 14) # bulk_create não dispara o sinal
+
+    def test_importacao_desfeita_nao_soma_volume(self):
+        indice = autocompletar.indice_produtos()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.importar(f"produto;tipo;quantidade\n{self.produto.pk};E;10\n;E;1\n")
+        self.assertNotIn(self.produto.pk, indice.volume)
+
+    def test_formulario_urlencoded_e_recusado(self):
+        resposta = self.importar(f"produto={self.produto.pk}&tipo=E&quantidade=1", content_type='application/x-www-form-urlencoded')
+        self.assertEqual(resposta.status_code, 415)
+        self.assertFalse(Movimentacao.objects.exists())
+
+    def test_arquivo_no_campo_multipart(self):
+        arquivo = io.BytesIO(f"produto,tipo,quantidade\n{self.produto.pk},E,2\n".encode('utf-8-sig'))
+        arquivo.name = 'entrega.csv'
+        self.assertEqual(self.client.post(reverse('importar_movimentacoes'), {'arquivo': arquivo}).json()['importadas'], 1)
+        self.assertEqual(self.client.post(reverse('importar_movimentacoes'), {'outro': 'x'}).status_code, 400)
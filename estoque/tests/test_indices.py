@@ -0,0 +1,68 @@
+import re
+
+from django.db import connection
+
+from ..filtros import filtrar_movimentacoes
+from ..models import Movimentacao, Produto
+from .base import EstoqueTestCase
+
+
+class IndicesMovimentacaoTests(EstoqueTestCase):
+    """
+    Regressão de plano de execução: as consultas principais do Histórico, da Exportação
+    e do Admin precisam acessar estoque_movimentacao por índice, nunca por varredura completa.
+    """
+
+    logado = None
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.produto = Produto.objects.create(nome='Guaraná', categoria=cls.bebidas)
+        Movimentacao.objects.bulk_create(
+            [Movimentacao(produto=cls.produto, tipo='E' if i % 2 else 'S', quantidade=1) for i in range(50)]
+        )
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Com tabelas minúsculas o PostgreSQL prefere Seq Scan; forçamos o uso de índice se existir
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertUsaIndice(self, queryset):
+        plano = queryset.explain()
+
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan on estoque_movimentacao', plano, plano)
+            return
+
+        acessos = [linha for linha in plano.splitlines() if re.search(r'\b(SCAN|SEARCH) estoque_movimentacao\b', linha)]
+        self.assertTrue(acessos, plano)
+        for linha in acessos:
+            self.assertRegex(linha, r'USING (COVERING )?INDEX|USING INTEGER PRIMARY KEY', plano)
+
+    def historico(self, **params):
+        base = Movimentacao.objects.select_related('produto', 'produto__categoria').order_by('-created_at', '-id')
+        return filtrar_movimentacoes(base, params)[:11]
+
+    def exportacao(self, **params):
+        base = Movimentacao.objects.select_related('produto', 'produto__categoria', 'usuario').order_by('-created_at', '-id')
+        return filtrar_movimentacoes(base, params)
+
+    def test_historico_sem_filtros(self):
+        self.assertUsaIndice(self.historico())
+
+    def test_historico_por_tipo(self):
+        self.assertUsaIndice(self.historico(tipo='S'))
+
+    def test_historico_por_categoria(self):
+        self.assertUsaIndice(self.historico(categoria=str(self.bebidas.pk)))
+
+    def test_historico_por_periodo(self):
+        self.assertUsaIndice(self.historico(data_inicio='2025-01-01', data_fim='2025-01-31'))
+
+    def test_exportacao_tipo_e_periodo(self):
+        self.assertUsaIndice(self.exportacao(tipo='E', data_inicio='2025-01-01'))
+
+    def test_historico_de_um_produto(self):
+        self.assertUsaIndice(self.produto.movimentacoes.order_by('-created_at'))
@@ -0,0 +1,72 @@
+import re
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Movimentacao, Produto
+from ..paginacao import codificar_cursor, decodificar_cursor, paginar_por_cursor
+from .base import EstoqueTestCase
+
+
+class PaginacaoCursorTests(EstoqueTestCase):
+    """Histórico por cursor (created_at, id): nenhuma linha repetida ou pulada, inclusive em empates de data."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        produto = Produto.objects.create(nome='Guaraná', categoria=cls.bebidas)
+        Movimentacao.objects.bulk_create(
+            [Movimentacao(produto=produto, tipo='E' if i % 3 else 'S', quantidade=1) for i in range(25)]
+        )
+        # Grupos de 4 movimentações com o mesmo created_at: as páginas de 10 cortam no meio dos empates
+        base = timezone.now() - timedelta(days=1)
+        for posicao, pk in enumerate(Movimentacao.objects.order_by('pk').values_list('pk', flat=True)):
+            Movimentacao.objects.filter(pk=pk).update(created_at=base + timedelta(minutes=posicao // 4))
+        cls.ordem = list(Movimentacao.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def ids(self, pagina):
+        return [movimentacao.pk for movimentacao in pagina]
+
+    def test_cursor_codifica_e_rejeita_lixo(self):
+        movimentacao = Movimentacao.objects.get(pk=self.ordem[3])
+        self.assertEqual(decodificar_cursor(codificar_cursor(movimentacao)), (movimentacao.created_at, movimentacao.pk))
+        for invalido in ('', 'lixo', '!!!', codificar_cursor(movimentacao)[:-3]):
+            self.assertIsNone(decodificar_cursor(invalido))
+        # Cursor inválido volta para a primeira página
+        self.assertEqual(self.ids(paginar_por_cursor(Movimentacao.objects.all(), cursor='lixo')), self.ordem[:10])
+
+    def test_ida_e_volta_entre_as_paginas(self):
+        movimentacoes = Movimentacao.objects.all()
+        paginas = [paginar_por_cursor(movimentacoes)]
+        self.assertFalse(paginas[0].has_previous)
+        while paginas[-1].has_next:
+            paginas.append(paginar_por_cursor(movimentacoes, cursor=paginas[-1].next_cursor))
+        self.assertEqual([self.ids(pagina) for pagina in paginas], [self.ordem[:10], self.ordem[10:20], self.ordem[20:]])
+        self.assertTrue(paginas[-1].has_previous)
+
+        # De volta, a partir da última página: as mesmas páginas, e a primeira sem "anterior"
+        anterior = paginar_por_cursor(movimentacoes, cursor=paginas[2].previous_cursor, anterior=True)
+        self.assertEqual(self.ids(anterior), self.ordem[10:20])
+        self.assertTrue(anterior.has_next)
+        primeira = paginar_por_cursor(movimentacoes, cursor=anterior.previous_cursor, anterior=True)
+        self.assertEqual(self.ids(primeira), self.ordem[:10])
+        self.assertFalse(primeira.has_previous)
+        self.assertIsNone(primeira.previous_cursor)
+
+    def test_links_mantem_os_filtros(self):
+        resposta = self.client.get(reverse('historico'), {'tipo': 'E'})
+        entradas = list(Movimentacao.objects.filter(tipo='E').order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(self.ids(resposta.context['page_obj']), entradas[:10])
+
+        proxima = re.search(r'href="\?(cursor=[^"]+)"', resposta.content.decode()).group(1).replace('&amp;', '&')
+        self.assertIn('tipo=E', proxima)
+        resposta = self.client.get(f"{reverse('historico')}?{proxima}")
+        self.assertEqual(self.ids(resposta.context['page_obj']), entradas[10:])
+
+        # A volta leva o cursor e os filtros, mas nunca um cursor antigo repetido
+        links = re.findall(r'href="\?(cursor=[^"]+)"', resposta.content.decode())
+        self.assertEqual(len(links), 1)
+        self.assertIn('dir=ant', links[0])
+        self.assertIn('tipo=E', links[0])
+        self.assertEqual(links[0].count('cursor='), 1)
@@ -0,0 +1,228 @@
+import importlib
+import io
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.apps import apps as django_apps
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..autocompletar import IndicePrefixos
+from ..filtros_admin import DiaFilter, MesFilter
+from ..models import Movimentacao, Produto, SaldoDiario
+from ..saldos import (
+    fotografias_cobrem, inicio_do_dia, produtos_divergentes, recalcular_saldos, reconstruir_saldos_diarios,
+    resumo_periodo, saldo_em,
+)
+from .base import EstoqueTestCase
+
+
+class SaldoMovimentacaoTests(EstoqueTestCase):
+    """Movimentacao.save(): o saldo muda só pela diferença e nunca fica negativo."""
+
+    logado = None
+
+    def setUp(self):
+        self.produto = Produto.objects.create(nome='Guaraná', categoria=self.bebidas)
+
+    def movimentar(self, tipo, quantidade):
+        Movimentacao(produto=self.produto, tipo=tipo, quantidade=quantidade).save()
+        self.produto.refresh_from_db()
+        return self.produto.quantidade
+
+    def test_entradas_e_saidas(self):
+        self.assertEqual(self.movimentar('E', 10), 10)
+        self.assertEqual(self.movimentar('S', 4), 6)
+        self.assertEqual(self.movimentar('S', 6), 0)
+
+    def test_saida_maior_que_o_estoque(self):
+        self.movimentar('E', 3)
+        with self.assertRaises(ValidationError) as erro:
+            self.movimentar('S', 4)
+        self.assertEqual(erro.exception.message_dict['quantidade'], ['Estoque insuficiente. Disponível: 3.'])
+        self.assertEqual(self.produto.quantidade, 3)
+        self.assertEqual(Movimentacao.objects.filter(tipo='S').count(), 0)
+        self.assertEqual(SaldoDiario.objects.get(produto=self.produto).saidas, 0)
+
+    def test_update_condicional_barra_saldo_desatualizado(self):
+        # O clean() viu saldo suficiente, mas outra saída levou o estoque antes do UPDATE:
+        # o WHERE quantidade >= X do próprio UPDATE recusa, e a transação é desfeita
+        self.movimentar('E', 5)
+        movimentacao = Movimentacao(produto=self.produto, tipo='S', quantidade=5)
+        original = Movimentacao.full_clean
+
+        def clean_e_concorrente(instancia, *args, **kwargs):
+            original(instancia, *args, **kwargs)
+            Produto.objects.filter(pk=self.produto.pk).update(quantidade=2)
+
+        with patch.object(Movimentacao, 'full_clean', clean_e_concorrente), self.assertRaises(ValidationError):
+            movimentacao.save()
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.quantidade, 5) # O UPDATE concorrente também foi desfeito (mesma transação)
+        self.assertIsNone(movimentacao.pk)
+        self.assertFalse(Movimentacao.objects.filter(tipo='S').exists())
+
+    @override_settings(ESTOQUE_MODO_AUDITORIA=True)
+    def test_modo_auditoria_recalcula_pelo_historico(self):
+        self.movimentar('E', 8)
+        # Saldo corrompido por fora: o modo auditoria soma o histórico em vez de aplicar a diferença
+        Produto.objects.filter(pk=self.produto.pk).update(quantidade=100)
+        self.assertEqual(self.movimentar('S', 3), 5)
+        with self.assertRaises(ValidationError):
+            self.movimentar('S', 50)
+
+
+class RecalcularSaldosTests(EstoqueTestCase):
+    """Recálculo em massa: só os produtos divergentes são corrigidos, e a contagem é informada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.produtos = Produto.objects.bulk_create([Produto(nome=f'Produto {i}', categoria=cls.bebidas) for i in range(4)])
+        Movimentacao.objects.bulk_create([
+            Movimentacao(produto=cls.produtos[0], tipo='E', quantidade=10),
+            Movimentacao(produto=cls.produtos[0], tipo='S', quantidade=3),
+            Movimentacao(produto=cls.produtos[1], tipo='E', quantidade=5),
+            Movimentacao(produto=cls.produtos[2], tipo='E', quantidade=2),
+        ])
+        # Saldos gravados: 0 certo (7), 1 e 3 corrompidos, 2 zerado por engano
+        for produto, quantidade in zip(cls.produtos, (7, 50, 0, 9)):
+            Produto.objects.filter(pk=produto.pk).update(quantidade=quantidade)
+
+    def saldos(self):
+        return list(Produto.objects.order_by('pk').values_list('quantidade', flat=True))
+
+    def test_corrige_so_os_divergentes(self):
+        self.assertEqual(sorted(produtos_divergentes()), sorted([
+            (self.produtos[1].pk, 5), (self.produtos[2].pk, 2), (self.produtos[3].pk, 0),
+        ]))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(recalcular_saldos(lote=2), 3)
+        self.assertEqual(self.saldos(), [7, 5, 2, 0])
+        self.assertEqual(recalcular_saldos(), 0)
+
+    def test_comando_e_botao_informam_a_contagem(self):
+        saida = io.StringIO()
+        call_command('recalcular_estoque', stdout=saida)
+        self.assertIn('3 produtos tiveram o saldo corrigido', saida.getvalue())
+
+        Produto.objects.filter(pk=self.produtos[0].pk).update(quantidade=1)
+        resposta = self.client.get(reverse('recalcular_estoque'), follow=True)
+        self.assertContains(resposta, '1 produtos tiveram o saldo corrigido')
+        self.assertEqual(self.saldos(), [7, 5, 2, 0])
+
+
+class FotografiasEdicaoTests(EstoqueTestCase):
+    """Editar ou excluir uma movimentação antiga refaz as fotografias dos dias seguintes."""
+
+    logado = None
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.produto = Produto.objects.create(nome='Guaraná', categoria=cls.bebidas)
+        cls.hoje = timezone.localdate()
+        cls.movimentacoes = {}
+        for tipo, quantidade, dias_atras in (('E', 10, 5), ('S', 3, 3), ('E', 4, 1)):
+            movimentacao = Movimentacao.objects.create(produto=cls.produto, tipo=tipo, quantidade=quantidade)
+            Movimentacao.objects.filter(pk=movimentacao.pk).update(
+                created_at=inicio_do_dia(cls.hoje - timedelta(days=dias_atras)) + timedelta(hours=12)
+            )
+            cls.movimentacoes[dias_atras] = movimentacao.pk
+        reconstruir_saldos_diarios()
+
+    def fotografias(self):
+        return list(SaldoDiario.objects.order_by('data').values_list('data', 'saldo_inicial', 'entradas', 'saidas', 'saldo_final'))
+
+    def assertFotografiasBatemComOHistorico(self):
+        atuais = self.fotografias()
+        reconstruir_saldos_diarios()
+        self.assertEqual(atuais, self.fotografias())
+        self.assertEqual(list(produtos_divergentes(usar_snapshots=True)), list(produtos_divergentes()))
+
+    def test_editar_refaz_os_dias_seguintes(self):
+        movimentacao = Movimentacao.objects.get(pk=self.movimentacoes[5])
+        movimentacao.quantidade = 20
+        movimentacao.save()
+
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).quantidade, 21)
+        self.assertEqual(saldo_em(self.produto, self.hoje - timedelta(days=2)), 17)
+        self.assertFotografiasBatemComOHistorico()
+        self.assertEqual(list(produtos_divergentes(usar_snapshots=True)), [])
+
+    def test_excluir_refaz_os_dias_seguintes(self):
+        Movimentacao.objects.get(pk=self.movimentacoes[3]).delete()
+        self.assertEqual(saldo_em(self.produto, self.hoje - timedelta(days=1)), 14)
+        self.assertFotografiasBatemComOHistorico()
+
+        Movimentacao.objects.filter(pk=self.movimentacoes[1]).delete() # Exclusão por queryset também
+        self.assertEqual(saldo_em(self.produto, self.hoje), 10)
+        self.assertFotografiasBatemComOHistorico()
+
+    def test_excluir_o_produto_leva_as_fotografias(self):
+        Produto.objects.get(pk=self.produto.pk).delete()
+        self.assertFalse(SaldoDiario.objects.exists())
+
+
+class FotografiasAnterioresTests(EstoqueTestCase):
+    """
+    Banco com histórico anterior às fotografias diárias: quem lê SaldoDiario não pode contar
+    esse histórico como zero, antes ou depois da migração que reconstrói as fotografias.
+    """
+
+    logado = None
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.produto = Produto.objects.create(nome='Guaraná', categoria=cls.bebidas)
+        cls.hoje = timezone.localdate()
+        for tipo, quantidade, dias_atras in (('E', 10, 5), ('S', 3, 2)):
+            movimentacao = Movimentacao.objects.create(produto=cls.produto, tipo=tipo, quantidade=quantidade)
+            Movimentacao.objects.filter(pk=movimentacao.pk).update(
+                created_at=inicio_do_dia(cls.hoje - timedelta(days=dias_atras)) + timedelta(hours=12)
+            )
+        Produto.objects.filter(pk=cls.produto.pk).update(quantidade=7)
+
+    def assertLeiturasBatemComOHistorico(self):
+        self.assertEqual(list(produtos_divergentes(usar_snapshots=True)), list(produtos_divergentes()))
+        self.assertEqual(recalcular_saldos(usar_snapshots=True), 0)
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).quantidade, 7)
+
+        self.assertEqual(saldo_em(self.produto, self.hoje - timedelta(days=10)), 0)
+        self.assertEqual(saldo_em(self.produto, self.hoje - timedelta(days=3)), 10)
+        self.assertEqual(saldo_em(self.produto, self.hoje), 7)
+        self.assertEqual(resumo_periodo(), {'entradas': 10, 'saidas': 3})
+        self.assertEqual(resumo_periodo(self.hoje - timedelta(days=3), self.hoje), {'entradas': 0, 'saidas': 3})
+
+        mes = self.hoje - timedelta(days=5)
+        self.assertIn(f'{mes:%Y-%m}', dict(MesFilter.carregar_opcoes(None, None)))
+        dia = object.__new__(DiaFilter)
+        dias = dict(dia.carregar_opcoes(RequestFactory().get('/', {'mes': f'{mes:%Y-%m}'})))
+        self.assertIn(f'{mes:%Y-%m-%d}', dias)
+
+        indice = IndicePrefixos()
+        indice.carregar_volume()
+        self.assertEqual(indice.volume, {self.produto.pk: 13})
+
+        # Saldo corrompido: os dois caminhos apontam o mesmo saldo real
+        Produto.objects.filter(pk=self.produto.pk).update(quantidade=0)
+        self.assertEqual(list(produtos_divergentes(usar_snapshots=True)), [(self.produto.pk, 7)])
+        self.assertEqual(list(produtos_divergentes()), [(self.produto.pk, 7)])
+
+    def test_sem_fotografias(self):
+        SaldoDiario.objects.all().delete() # Como num banco migrado antes da 0007
+        self.assertFalse(fotografias_cobrem())
+        self.assertLeiturasBatemComOHistorico()
+
+    def test_fotografias_da_migracao(self):
+        SaldoDiario.objects.all().delete()
+        migracao = importlib.import_module('estoque.migrations.0015_reconstruir_saldos_diarios')
+        migracao.reconstruir_saldos_diarios(django_apps, None)
+        self.assertEqual(SaldoDiario.objects.count(), 2)
+        self.assertEqual(SaldoDiario.objects.order_by('data').last().saldo_final, 7)
+        self.assertTrue(fotografias_cobrem())
+        self.assertLeiturasBatemComOHistorico()
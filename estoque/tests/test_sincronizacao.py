@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..caches import versoes
+from ..models import Movimentacao, Produto, SaldoDiario
+from .base import EstoqueTestCase, criar_operador
+
+
+class SincronizacaoSaidasTests(EstoqueTestCase):
+    """Lote da fila offline da Saída Rápida: uma transação, sem aplicar duas vezes a mesma chave."""
+
+    logado = 'operador'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.operador = criar_operador()
+        cls.guarana = Produto.objects.create(nome='Guaraná', categoria=cls.bebidas, quantidade=10)
+        cls.agua = Produto.objects.create(nome='Água', categoria=cls.bebidas, quantidade=2)
+        cls.suco = Produto.objects.create(nome='Suco', categoria=cls.bebidas, quantidade=5)
+
+    def sincronizar(self, saidas):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('sincronizar_saidas'), {'saidas': saidas}, content_type='application/json')
+
+    def test_lote_aplicado_e_reenvio_ignorado(self):
+        lote = [
+            {'chave': 'a1', 'produto': self.guarana.pk, 'quantidade': 3},
+            {'chave': 'a2', 'produto': self.guarana.pk, 'quantidade': 4},
+            {'chave': 'a3', 'produto': self.agua.pk, 'quantidade': 3}, # Só há 2
+            {'chave': 'a4', 'produto': 999_999, 'quantidade': 1},
+        ]
+        resposta = self.sincronizar(lote)
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.json()
+        self.assertEqual([r['status'] for r in dados['resultados']], ['aplicada', 'aplicada', 'rejeitada', 'rejeitada'])
+        self.assertEqual(dados['resultados'][2]['erro'], 'Estoque insuficiente. Disponível: 2.')
+        # Só os produtos do lote, e não o catálogo inteiro
+        self.assertEqual(dados['saldos'], {str(self.guarana.pk): 3, str(self.agua.pk): 2})
+
+        # A resposta se perdeu e o aparelho reenvia o mesmo lote: nada é aplicado de novo
+        dados = self.sincronizar(lote[:2]).json()
+        self.assertEqual([r['status'] for r in dados['resultados']], ['ja_aplicada', 'ja_aplicada'])
+        self.guarana.refresh_from_db()
+        self.assertEqual(self.guarana.quantidade, 3)
+        self.assertEqual(Movimentacao.objects.filter(produto=self.guarana, tipo='S').count(), 2)
+        self.assertEqual(Movimentacao.objects.get(chave_idempotencia='a1').usuario, self.operador)
+        self.assertEqual(SaldoDiario.objects.get(produto=self.guarana).saidas, 7)
+        self.assertFalse(SaldoDiario.objects.filter(produto=self.agua).exists())
+
+    def test_consultas_nao_crescem_com_o_lote(self):
+        def consultas(produto, chaves):
+            with CaptureQueriesContext(connection) as capturadas:
+                self.sincronizar([{'chave': chave, 'produto': produto.pk, 'quantidade': 1} for chave in chaves])
+            return len(capturadas)
+
+        versoes('catalogo') # A linha da versão já existe (só o primeiro uso do banco a cria)
+        self.assertEqual(consultas(self.guarana, ['b1']), consultas(self.suco, ['c1', 'c2', 'c3', 'c4', 'c5']))
+
+    def test_chave_por_usuario_e_conflito(self):
+        self.sincronizar([{'chave': 'e1', 'produto': self.guarana.pk, 'quantidade': 1}])
+
+        # Outro aparelho (outro usuário) gerou a mesma chave: é outra saída
+        self.client.force_login(criar_operador('outro'))
+        dados = self.sincronizar([{'chave': 'e1', 'produto': self.guarana.pk, 'quantidade': 1}]).json()
+        self.assertEqual(dados['resultados'], [{'chave': 'e1', 'status': 'aplicada'}])
+
+        # A mesma chave com outro produto ou quantidade: conflito no item, e não erro no lote
+        dados = self.sincronizar([
+            {'chave': 'e1', 'produto': self.suco.pk, 'quantidade': 1},
+            {'chave': 'e1', 'produto': self.guarana.pk, 'quantidade': 2},
+            {'chave': 'e2', 'produto': self.suco.pk, 'quantidade': 1},
+            {'chave': 'e2', 'produto': self.suco.pk, 'quantidade': 1}, # Repetida no próprio lote
+        ]).json()
+        self.assertEqual([r['status'] for r in dados['resultados']], ['conflito', 'conflito', 'aplicada', 'ja_aplicada'])
+        self.guarana.refresh_from_db()
+        self.suco.refresh_from_db()
+        self.assertEqual((self.guarana.quantidade, self.suco.quantidade), (8, 4))
+
+    def test_corrida_com_a_mesma_chave_refaz_o_lote(self):
+        # Outro envio gravou a mesma chave (com outro produto) depois da consulta das chaves deste:
+        # o INSERT esbarra no índice único e o lote é refeito, agora enxergando a chave
+        Movimentacao.objects.create(produto=self.agua, tipo='S', quantidade=1, usuario=self.operador, chave_idempotencia='f1')
+        filtrar = Movimentacao.objects.filter
+        consultas = []
+
+        def consulta_antes_do_outro(*args, **kwargs):
+            consultas.append(kwargs)
+            return Movimentacao.objects.none() if len(consultas) == 1 else filtrar(*args, **kwargs)
+
+        with patch.object(Movimentacao.objects, 'filter', consulta_antes_do_outro):
+            dados = self.sincronizar([{'chave': 'f1', 'produto': self.guarana.pk, 'quantidade': 1}]).json()
+        self.assertEqual(len(consultas), 2)
+        self.assertEqual([r['status'] for r in dados['resultados']], ['conflito'])
+        self.guarana.refresh_from_db()
+        self.assertEqual(self.guarana.quantidade, 10)
+
+    def test_fila_do_aparelho_por_usuario(self):
+        resposta = self.client.get(reverse('registrar_saida_rapida'))
+        self.assertContains(resposta, f'const usuarioId = {self.operador.pk};')
+        self.assertContains(resposta, 'id="form-sair"') # Apaga a fila ao sair
+
+    def test_lote_invalido(self):
+        url = reverse('sincronizar_saidas')
+        self.assertEqual(self.client.post(url, 'x', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'saidas': {}}, content_type='application/json').status_code, 400)
+        dados = self.sincronizar([{'chave': 'd1', 'produto': self.suco.pk, 'quantidade': 0}, 'x']).json()
+        self.assertEqual([r['status'] for r in dados['resultados']], ['rejeitada', 'rejeitada'])
+        self.assertEqual(self.client.get(url).status_code, 405)
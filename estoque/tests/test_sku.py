@@ -0,0 +1,48 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import override_settings
+
+from .. import sku
+from ..models import Categoria, Produto
+from ..sku import gerar_sku, reservar_skus
+from .base import EstoqueTestCase
+
+
+class SkuTests(EstoqueTestCase):
+    """SKUs automáticos: contador por prefixo que nunca entrega um SKU já usado."""
+
+    logado = None
+
+    def test_sequencia_por_prefixo(self):
+        primeiro = Produto.objects.create(nome='Guaraná', categoria=self.bebidas)
+        segundo = Produto.objects.create(nome='Suco', categoria=self.bebidas)
+        self.assertEqual((primeiro.sku, segundo.sku), ('BEB-0001', 'BEB-0002'))
+        self.assertEqual(Produto.objects.create(nome='Sabão', categoria=Categoria.objects.create(nome='Limpeza')).sku, 'LIM-0001')
+
+    def test_pula_sku_digitado_a_mao(self):
+        Produto.objects.create(nome='Guaraná', categoria=self.bebidas) # BEB-0001: o contador já existe
+        Produto.objects.create(nome='Água', sku='BEB-0002', categoria=self.bebidas)
+        Produto.objects.create(nome='Suco', sku='BEB-0007', categoria=self.bebidas)
+        Produto.objects.create(nome='Outro prefixo', sku='BEBX-0100', categoria=self.bebidas)
+
+        self.assertEqual(Produto.objects.create(nome='Chá', categoria=self.bebidas).sku, 'BEB-0008')
+        self.assertEqual(gerar_sku('BEB'), 'BEB-0009')
+
+    @override_settings(ESTOQUE_SKU_BLOCO=10)
+    def test_bloco_em_memoria_descartado_na_colisao(self):
+        reservar_skus('BLO', 1) # Cria o contador (numa transação, gerar_sku não usa blocos)
+        self.addCleanup(sku._blocos.clear)
+        # Fora de transação, como numa requisição: reserva BLO-0002..0011 na memória
+        with patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(gerar_sku('BLO'), 'BLO-0002')
+        Produto.objects.create(nome='Importado', sku='BLO-0003', categoria=self.bebidas)
+        with patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(gerar_sku('BLO'), 'BLO-0012')
+            self.assertEqual(gerar_sku('BLO'), 'BLO-0013')
+
+    def test_reserva_em_massa(self):
+        Produto.objects.create(nome='Importado', sku='MAS-0003', categoria=self.bebidas)
+        self.assertEqual(reservar_skus('MAS', 3), ['MAS-0004', 'MAS-0005', 'MAS-0006'])
+        Produto.objects.create(nome='Importado', sku='MAS-0009', categoria=self.bebidas)
+        self.assertEqual(reservar_skus('MAS', 2), ['MAS-0010', 'MAS-0011'])
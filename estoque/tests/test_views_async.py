@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import resolve, reverse
+
+from core.urls import urlpatterns as urls_core
+
+from .. import views_async
+from ..models import Movimentacao, Produto
+from ..urls import rotas_leitura
+from .base import EstoqueTestCase
+
+
+class UrlsAsync:
+    # O mesmo que ESTOQUE_VIEWS_ASYNC=True: as rotas assíncronas casam antes das síncronas
+    urlpatterns = [*rotas_leitura(views_async), *urls_core]
+
+
+class ViewsAsyncTests(EstoqueTestCase):
+    """As views assíncronas (ESTOQUE_VIEWS_ASYNC) respondem o mesmo que as síncronas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        produtos = Produto.objects.bulk_create(
+            [Produto(nome=f'Produto {i:02d}', sku=f'ASY-{i:02d}', categoria=cls.bebidas) for i in range(25)]
+        )
+        Movimentacao.objects.bulk_create(
+            [Movimentacao(produto=produto, tipo='E', quantidade=3, usuario=cls.admin) for produto in produtos]
+        )
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def comparar(self, url, limpar_cache=True):
+        sincrona = self.client.get(url)
+        if limpar_cache:
+            cache.clear() # A assíncrona monta tudo de novo (a tabela do Dashboard, por exemplo)
+        with override_settings(ROOT_URLCONF=UrlsAsync):
+            assincrona = self.client.get(url)
+        self.assertEqual(assincrona.status_code, 200)
+        self.assertEqual(resolve(url.split('?')[0], urlconf=UrlsAsync).func.__module__, views_async.__name__)
+        return sincrona, assincrona
+
+    def test_dashboard(self):
+        for url in ('/', '/?page=3', '/?page=99', '/?search=Produto%2007'):
+            sincrona, assincrona = self.comparar(url)
+            self.assertEqual(assincrona.context['tabela'], sincrona.context['tabela'])
+        self.assertContains(assincrona, 'Produto 07')
+
+    def test_historico(self):
+        sincrona, assincrona = self.comparar('/historico/?contar=1&data_inicio=2000-01-01')
+        for chave in ('total_registros', 'resumo'):
+            self.assertEqual(assincrona.context[chave], sincrona.context[chave])
+        self.assertEqual(list(assincrona.context['page_obj']), list(sincrona.context['page_obj']))
+
+    def test_catalogo(self):
+        sincrona, assincrona = self.comparar(reverse('catalogo_produtos'), limpar_cache=False)
+        self.assertEqual(assincrona.content, sincrona.content)
+        self.assertEqual(assincrona['ETag'], sincrona['ETag'])
+
+    @override_settings(ROOT_URLCONF=UrlsAsync)
+    async def test_exportacao_em_streaming_assincrono(self):
+        await self.async_client.aforce_login(self.admin)
+        resposta = await self.async_client.get('/exportar/?format=csv')
+        self.assertTrue(resposta.is_async)
+        conteudo = b''.join([parte async for parte in resposta.streaming_content]).decode('utf-8-sig')
+        self.assertEqual(conteudo.count('Produto '), 25)
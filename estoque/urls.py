@@ -1,16 +1,33 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import views, views_async
+
+
+def rotas_leitura(modulo):
+    # Telas só de leitura: síncronas (views.py) ou assíncronas (views_async.py, ESTOQUE_VIEWS_ASYNC)
+    return [
+        path('', modulo.dashboard, name='dashboard'),
+        path('produtos/autocompletar/', modulo.autocompletar_produtos, name='autocompletar_produtos'),
+        path('produtos/catalogo.json', modulo.catalogo_produtos, name='catalogo_produtos'),
+        path('historico/', modulo.historico_movimentacoes, name='historico'),
+        path('exportar/', modulo.exportar_relatorio, name='exportar_relatorio'),
+    ]
+
 
 urlpatterns = [
     # ROTAS DE AUTENTICAÇÃO
     path('login/', views.CustomLoginView.as_view(), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
 
-    path('', views.dashboard, name='dashboard'),
+    *rotas_leitura(views_async if settings.ESTOQUE_VIEWS_ASYNC else views),
     path('recalcular/', views.recalcular_estoque, name='recalcular_estoque'),
     path('movimentacao/', views.registrar_movimentacao, name='registrar_movimentacao'),
     path('saida-rapida/', views.registrar_saida_rapida, name='registrar_saida_rapida'), # Nova rota
-    path('historico/', views.historico_movimentacoes, name='historico'),
-    path('exportar/', views.exportar_relatorio, name='exportar_relatorio'),
-]
\ No newline at end of file
+    path('saida-rapida/sincronizar/', views.sincronizar_saidas_rapidas, name='sincronizar_saidas'),
+    path('movimentacao/importar/', views.importar_movimentacoes, name='importar_movimentacoes'),
+    path('metricas/caches/', views.metricas_cache, name='metricas_cache'),
+    path('exportar/job/', views.exportar_relatorio_job, name='exportar_relatorio_job'),
+    path('exportar/job/<uuid:job_id>/', views.status_exportacao_job, name='status_exportacao'),
+    path('exportar/job/<uuid:job_id>/download/', views.download_exportacao_job, name='download_exportacao'),
+]
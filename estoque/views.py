@@ -1,19 +1,37 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib import messages
-from .models import Produto, Movimentacao, Categoria
+from .models import Produto, Movimentacao, ExportacaoJob
 from .forms import MovimentacaoForm, SaidaRapidaForm, CustomLoginForm
-
-import csv
-from django.http import HttpResponse
+from .concorrencia import com_retentativas
+from .saldos import recalcular_saldos, resumo_periodo
+from .filtros import filtrar_movimentacoes, ler_data
+from .paginacao import paginar_por_cursor, contagem_aproximada
+from .caches import catalogo_json, versao_catalogo, categorias_em_cache, tabela_dashboard, estatisticas
+from .busca import buscar_produtos
+from .autocompletar import indice_produtos
+from .exportacao import FORMATOS, gerar_relatorio, parquet_disponivel, enfileirar_exportacao, pasta_exportacoes
+from .importacao import MODOS, ler_registros, importar_registros
+from .sincronizacao import LIMITE_LOTE, sincronizar_saidas
+from .idempotencia import idempotente, nova_chave
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse, JsonResponse, FileResponse, Http404, HttpResponseBadRequest, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
 
-from django.db.models import Q, Sum
 from django.db import transaction
+import codecs
+import json
 
 from django.contrib.auth.views import LoginView
 
+
 class CustomLoginView(LoginView):
     form_class = CustomLoginForm
     template_name = 'estoque/login.html'
@@ -34,76 +52,114 @@ class CustomLoginView(LoginView):
             
         return response
 
+def url_catalogo():
+    # A versão na URL faz o navegador reaproveitar o JSON até o catálogo mudar
+    return f"{reverse('catalogo_produtos')}?v={versao_catalogo()}"
+
+@login_required
+def catalogo_produtos(request):
+    versao, conteudo = catalogo_json()
+    return resposta_catalogo(request, versao, conteudo)
+
+def resposta_catalogo(request, versao, conteudo):
+    etag = f'"{versao}"'
+
+    # Navegador já tem esta versão: responde 304 sem corpo
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(conteudo, content_type='application/json')
+
+    response['ETag'] = etag
+    if request.GET.get('v') == versao:
+        # URL com a versão atual: conteúdo imutável, pode ficar no cache do navegador
+        patch_cache_control(response, private=True, max_age=60 * 60 * 24)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@login_required
+def autocompletar_produtos(request):
+    # Busca enquanto digita: responde do índice em memória, sem consultar o banco (ver autocompletar.py)
+    return resposta_autocompletar(request, indice_produtos())
+
+def resposta_autocompletar(request, indice):
+    termo = request.GET.get('q', '')
+    try:
+        limite = min(max(int(request.GET.get('limite', 10)), 1), 50)
+        categoria_id = int(request.GET['categoria']) if request.GET.get('categoria') else None
+    except ValueError:
+        return JsonResponse({'erro': "Parâmetros inválidos."}, status=400)
+
+    resultados = [
+        {'id': pk, 'nome': nome, 'sku': sku, 'categoria_id': categoria}
+        for pk, nome, sku, categoria in indice.buscar(termo, limite, categoria_id)
+    ]
+    return JsonResponse({'resultados': resultados})
+
 @login_required
 def dashboard(request):
     if not request.user.is_superuser:
         return redirect('registrar_saida_rapida')
 
-    # 1. Começa com todos os produtos
-    # O select_related('categoria') é vital para performance (evita N+1 queries)
-    produtos_list = Produto.objects.all().select_related('categoria').order_by('nome')
-    
-    # 2. Captura os dados do GET (da URL)
+    # 1. Captura os dados do GET (da URL)
     search_query = request.GET.get('search', '')
     category_id = request.GET.get('categoria', '')
 
-    # 3. Aplica Filtro por Nome ou SKU
+    # 2. Produtos filtrados por nome/SKU e categoria
+    produtos_list = produtos_do_dashboard(search_query, category_id)
+
+    # 3. Paginação (Aplica APÓS filtrar) e tabela renderizada, guardadas no cache por
+    # busca/categoria/página até um produto, saldo ou categoria mudar (ver caches.py)
+    page_number = request.GET.get('page')
+
+    def montar_tabela():
+        paginator = Paginator(produtos_list, 10) # 10 por página
+        page_obj = paginator.get_page(page_number)
+        return render_to_string('estoque/tabela_produtos.html', {
+            'page_obj': page_obj,
+            'search_query': search_query,
+            'category_id': category_id,
+        })
+
+    tabela = tabela_dashboard([search_query, category_id, page_number], montar_tabela)
+
+    # 4. Categorias do dropdown (também do cache)
+    categorias = categorias_em_cache()
+
+    return render(request, 'estoque/dashboard.html', contexto_dashboard(tabela, categorias, search_query, category_id))
+
+def produtos_do_dashboard(search_query, category_id):
+    # O select_related('categoria') é vital para performance (evita N+1 queries)
+    produtos_list = Produto.objects.all().select_related('categoria').order_by('nome')
+
+    # Filtro por Nome ou SKU (índice de trigramas, sem diferenciar acentos; ver busca.py)
     if search_query:
-        produtos_list = produtos_list.filter(
-            Q(nome__icontains=search_query) | 
-            Q(sku__icontains=search_query)
-        )
+        produtos_list = buscar_produtos(produtos_list, search_query)
 
-    # 4. Aplica Filtro por Categoria
+    # Filtro por Categoria
     if category_id:
         produtos_list = produtos_list.filter(categoria_id=category_id)
 
-    # 5. Paginação (Aplica APÓS filtrar)
-    paginator = Paginator(produtos_list, 10) # 10 por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    # 6. Busca categorias para preencher o dropdown
-    categorias = Categoria.objects.all()
+    return produtos_list
 
-    context = {
-        'page_obj': page_obj,
+def contexto_dashboard(tabela, categorias, search_query, category_id):
+    return {
+        'tabela': tabela,
         'categorias': categorias,
         # Passamos os filtros de volta para manter os campos preenchidos na tela
-        'search_query': search_query, 
-        'category_id': int(category_id) if category_id else '' 
+        'search_query': search_query,
+        'category_id': int(category_id) if category_id else ''
     }
 
-    return render(request, 'estoque/dashboard.html', context)
-
 @login_required
 def recalcular_estoque(request):
     # 1. Segurança: Só admin pode fazer isso
     if not request.user.is_superuser:
         return redirect('registrar_saida_rapida')
 
-    produtos = Produto.objects.all()
-    atualizados = 0
-
-    for produto in produtos:
-        # Soma todas as Entradas
-        total_entradas = produto.movimentacoes.filter(tipo='E').aggregate(Sum('quantidade'))['quantidade__sum'] or 0
-
-        # Soma todas as Saídas
-        total_saidas = produto.movimentacoes.filter(tipo='S').aggregate(Sum('quantidade'))['quantidade__sum'] or 0
-
-        # Calcula o Saldo Real
-        saldo_real = total_entradas - total_saidas
-
-        # Proteção contra negativo (caso o banco tenha sido manipulado erradamente)
-        if saldo_real < 0:
-            saldo_real = 0
-
-        # Atualiza apenas se houver divergência (para economizar processamento)
-        if produto.quantidade != saldo_real:
-            produto.quantidade = saldo_real
-            produto.save()
-            atualizados += 1
+    # 2. Recalcula tudo com uma consulta agrupada + bulk update (ver saldos.py)
+    atualizados = recalcular_saldos()
 
     if atualizados > 0:
         messages.warning(request, f"Sincronização concluída! {atualizados} produtos tiveram o saldo corrigido.")
@@ -113,23 +169,28 @@ def recalcular_estoque(request):
     return redirect('dashboard')
 
 @login_required
+@idempotente
 def registrar_movimentacao(request):
     if request.method == 'POST':
         form = MovimentacaoForm(request.POST)
         if form.is_valid():
             try:
-                with transaction.atomic():
-                    movimentacao = form.save(commit=False)
-                    
-                    # 1. ORIGEM (Responsável): Pega automaticamente do login
-                    movimentacao.usuario = request.user 
-                    
-                    # 2. DESTINO (Solicitante):
-                    # Se o campo de texto estiver vazio, assumimos que o responsável pegou para si mesmo
-                    if not movimentacao.solicitante_nome:
-                        movimentacao.solicitante_nome = request.user.get_full_name() or request.user.username
-
-                    movimentacao.save()
+                movimentacao = form.save(commit=False)
+                
+                # 1. ORIGEM (Responsável): Pega automaticamente do login
+                movimentacao.usuario = request.user 
+                
+                # 2. DESTINO (Solicitante):
+                # Se o campo de texto estiver vazio, assumimos que o responsável pegou para si mesmo
+                if not movimentacao.solicitante_nome:
+                    movimentacao.solicitante_nome = request.user.get_full_name() or request.user.username
+
+                # 3. GRAVAÇÃO: transação com lock do produto, repetida se houver conflito de concorrência
+                def gravar():
+                    with transaction.atomic():
+                        movimentacao.save()
+
+                com_retentativas(gravar)
                     
                 messages.success(request, "Movimentação registrada com sucesso!")
                 return redirect('dashboard')
@@ -138,153 +199,260 @@ def registrar_movimentacao(request):
     else:
         form = MovimentacaoForm()
 
-    # ... (resto do código igual) ...
-    produtos_data = Produto.objects.all().values('id', 'nome', 'quantidade', 'categoria_id').order_by('nome')
-    context = {'form': form, 'produtos_data': list(produtos_data)}
+    # A lista de produtos não vai mais embutida na página: o JS baixa o catálogo versionado
+    context = {
+        'form': form,
+        'catalogo_url': url_catalogo(),
+        'chave_idempotencia': nova_chave(), # Um reenvio deste formulário não grava a movimentação duas vezes
+    }
     return render(request, 'estoque/form_movimentacao.html', context)
 
 @login_required
 def historico_movimentacoes(request):
     # 1. TRAVA DE SEGURANÇA (Mantendo o que fizemos antes)
     if not request.user.is_superuser:
-        return redirect('saida_rapida')
-
-    # 2. BASE DA CONSULTA
-    movimentacoes = Movimentacao.objects.all().select_related('produto', 'produto__categoria').order_by('-created_at')
-    
-    # 3. FILTROS (Mantém a lógica existente)
-    categorias = Categoria.objects.all() 
-    busca_produto = request.GET.get('produto', '')
-    busca_tipo = request.GET.get('tipo', '')
-    busca_categoria = request.GET.get('categoria', '')
-    data_inicio = request.GET.get('data_inicio', '')
-    data_fim = request.GET.get('data_fim', '')
-
-    if busca_produto:
-        movimentacoes = movimentacoes.filter(produto__nome__icontains=busca_produto)
-    if busca_tipo:
-        movimentacoes = movimentacoes.filter(tipo=busca_tipo)
-    if busca_categoria:
-        movimentacoes = movimentacoes.filter(produto__categoria_id=busca_categoria)
-    if data_inicio:
-        movimentacoes = movimentacoes.filter(created_at__date__gte=data_inicio)
-    if data_fim:
-        movimentacoes = movimentacoes.filter(created_at__date__lte=data_fim)
-
-    # 4. PAGINAÇÃO (AQUI É A NOVIDADE)
-    paginator = Paginator(movimentacoes, 10) # 20 itens por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        return redirect('registrar_saida_rapida')
 
-    context = {
+    # 2. CONSULTA COM OS FILTROS (mesma função usada na exportação)
+    movimentacoes = movimentacoes_do_historico(request.GET)
+
+    # 3. PAGINAÇÃO POR CURSOR: sem OFFSET nem COUNT(*), qualquer página custa o mesmo
+    page_obj = pagina_do_historico(movimentacoes, request.GET)
+
+    # Total só sob demanda (e aproximado no PostgreSQL), pois é a parte cara em tabelas grandes
+    total_registros = contagem_aproximada(movimentacoes) if request.GET.get('contar') else None
+
+    # 4. RESUMO DO PERÍODO: somado das fotografias diárias (SaldoDiario), sem varrer as movimentações
+    resumo = resumo_do_historico(request.GET)
+
+    return render(request, 'estoque/historico.html', contexto_historico(request, page_obj, total_registros, resumo))
+
+def movimentacoes_do_historico(params):
+    # usuario entra no select_related porque a tabela mostra quem registrou cada movimentação
+    movimentacoes = Movimentacao.objects.all().select_related('produto', 'produto__categoria', 'usuario').order_by('-created_at', '-id')
+    return filtrar_movimentacoes(movimentacoes, params)
+
+def pagina_do_historico(movimentacoes, params):
+    return paginar_por_cursor(
+        movimentacoes,
+        cursor=params.get('cursor'),
+        anterior=params.get('dir') == 'ant',
+        por_pagina=10,
+    )
+
+def resumo_do_historico(params):
+    # Só com período definido
+    data_inicio = ler_data(params.get('data_inicio'))
+    data_fim = ler_data(params.get('data_fim'))
+    if not (data_inicio or data_fim):
+        return None
+    filtros_produto = {}
+    if params.get('produto'):
+        filtros_produto['nome__icontains'] = params['produto']
+    if params.get('categoria'):
+        filtros_produto['categoria_id'] = params['categoria']
+    return resumo_periodo(data_inicio, data_fim, **filtros_produto)
+
+def contexto_historico(request, page_obj, total_registros, resumo):
+    # Filtros atuais para montar os links de navegação (sem os parâmetros de paginação)
+    filtros_url = request.GET.copy()
+    for chave in ('cursor', 'dir', 'page'):
+        filtros_url.pop(chave, None)
+
+    return {
         'page_obj': page_obj, # Enviamos o objeto paginado, não mais a lista completa
-        'categorias': categorias,
+        'resumo': resumo,
+        'total_registros': total_registros,
+        'filtros_url': filtros_url.urlencode(),
+        'exportacao_em_segundo_plano': settings.ESTOQUE_EXPORTACAO_EXECUTOR != 'desligado',
         # Passamos o request.GET inteiro para facilitar o preenchimento do form
-        'filtros': request.GET 
+        'filtros': request.GET
     }
-    
-    return render(request, 'estoque/historico.html', context)
 
 @login_required
 def exportar_relatorio(request):
-    # 1. Configuração do Arquivo
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="relatorio_estoque.csv"'
-    response.write(u'\ufeff'.encode('utf8')) # BOM para Excel ler acentos
-    writer = csv.writer(response, delimiter=';')
-
-    # 2. Cabeçalho Atualizado
-    writer.writerow([
-        'Data/Hora', 
-        'Tipo', 
-        'Produto', 
-        'Categoria', 
-        'Quantidade', 
-        'Responsável (Logado)', # Quem fez (User)
-        'Destinatário',         # Quem recebeu (Texto)
-        'CPF', 
-        'Observação'            # Novo campo
-    ])
-
-    # 3. Consulta Otimizada
-    # Adicionamos 'usuario' no select_related para evitar lentidão
-    movimentacoes = Movimentacao.objects.all().select_related(
-        'produto', 
-        'produto__categoria', 
-        'usuario'
-    ).order_by('-created_at')
-
-    # 4. Aplicação dos Filtros (Mesma lógica do Histórico)
-    busca_produto = request.GET.get('produto')
-    busca_tipo = request.GET.get('tipo')
-    busca_categoria = request.GET.get('categoria')
-    data_inicio = request.GET.get('data_inicio')
-    data_fim = request.GET.get('data_fim')
-    busca_usuario = request.GET.get('usuario') # Se quiser filtrar por responsável também
-
-    if busca_produto:
-        movimentacoes = movimentacoes.filter(produto__nome__icontains=busca_produto)
-    
-    if busca_tipo:
-        movimentacoes = movimentacoes.filter(tipo=busca_tipo)
-
-    if busca_categoria:
-        movimentacoes = movimentacoes.filter(produto__categoria_id=busca_categoria)
-        
-    if data_inicio:
-        movimentacoes = movimentacoes.filter(created_at__date__gte=data_inicio)
-        
-    if data_fim:
-        movimentacoes = movimentacoes.filter(created_at__date__lte=data_fim)
-
-    # 5. Escrita das Linhas
-    for mov in movimentacoes:
-        # Tratamento de dados nulos
-        cat_nome = mov.produto.categoria.nome if mov.produto.categoria else '-'
-        responsavel = mov.usuario.username if mov.usuario else 'Sistema/Admin'
-        
-        writer.writerow([
-            mov.created_at.strftime('%d/%m/%Y %H:%M'),
-            mov.get_tipo_display(),
-            mov.produto.nome,
-            cat_nome,
-            mov.quantidade,
-            responsavel,                    # Coluna Nova
-            mov.solicitante_nome or '-',    # Coluna Alterada (Destino)
-            mov.solicitante_cpf or '-',
-            mov.observacao or '-'           # Coluna Nova
-        ])
-
+    # 1. Consulta (Mesma lógica e filtros do Histórico)
+    movimentacoes = filtrar_movimentacoes(
+        Movimentacao.objects.order_by('-created_at', '-id'),
+        request.GET,
+    )
+
+    # 2. Formato: csv (padrão), csv.gz ou parquet (colunar, requer pyarrow)
+    formato = request.GET.get('format', 'csv')
+    erro = validar_formato(formato)
+    if erro:
+        return erro
+
+    # 3. Resposta em streaming: as linhas vão saindo do banco direto para o download,
+    # sem guardar o arquivo inteiro na memória (ver exportacao.py)
+    return resposta_relatorio(gerar_relatorio(movimentacoes, formato), formato)
+
+def validar_formato(formato):
+    if formato not in FORMATOS:
+        return HttpResponseBadRequest(f"Formato inválido. Use: {', '.join(FORMATOS)}.")
+    if formato == 'parquet' and not parquet_disponivel():
+        return HttpResponseBadRequest("Exportação Parquet indisponível: instale o pacote 'pyarrow'.")
+    return None
+
+def resposta_relatorio(conteudo, formato):
+    content_type, nome_arquivo = FORMATOS[formato]
+    response = StreamingHttpResponse(conteudo, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
     return response
 
+def status_exportacao(job):
+    dados = {
+        'id': str(job.pk),
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'linhas': job.linhas,
+        'erro': job.erro,
+        'status_url': reverse('status_exportacao', args=[job.pk]),
+        'download_url': None,
+    }
+    if job.status == 'C':
+        dados['download_url'] = reverse('download_exportacao', args=[job.pk])
+    return dados
+
 @login_required
+@require_POST
+def exportar_relatorio_job(request):
+    if settings.ESTOQUE_EXPORTACAO_EXECUTOR == 'desligado':
+        return JsonResponse({'erro': "Exportação em segundo plano desativada neste servidor. Use o download direto."}, status=503)
+
+    # Mesmos filtros da URL do Histórico; pedidos idênticos reaproveitam o mesmo job/arquivo
+    job = enfileirar_exportacao(request.GET, usuario=request.user)
+    return JsonResponse(status_exportacao(job), status=202)
+
+def jobs_do_usuario(usuario):
+    # Cada um acompanha e baixa só as próprias exportações; o superusuário vê todas
+    jobs = ExportacaoJob.objects.all()
+    return jobs if usuario.is_superuser else jobs.filter(usuario=usuario)
+
+@login_required
+def status_exportacao_job(request, job_id):
+    job = get_object_or_404(jobs_do_usuario(request.user), pk=job_id)
+    return JsonResponse(status_exportacao(job))
+
+@login_required
+def download_exportacao_job(request, job_id):
+    job = get_object_or_404(jobs_do_usuario(request.user), pk=job_id, status='C')
+    if job.expira_em and job.expira_em < timezone.now():
+        raise Http404("Exportação expirada. Gere o relatório novamente.")
+
+    caminho = pasta_exportacoes() / job.arquivo
+    if not caminho.exists():
+        raise Http404("Arquivo da exportação não encontrado.")
+
+    return FileResponse(
+        open(caminho, 'rb'),
+        as_attachment=True,
+        filename='relatorio_estoque.csv.gz',
+        content_type='application/gzip',
+    )
+
+@login_required
+@require_POST
+def importar_movimentacoes(request):
+    # 1. Segurança: Só admin pode importar
+    if not request.user.is_superuser:
+        return JsonResponse({'erro': "Apenas administradores podem importar movimentações."}, status=403)
+
+    # 2. Origem: arquivo enviado no campo "arquivo" (multipart) ou o próprio corpo da requisição.
+    # Um formulário comum (urlencoded) teria o corpo lido como formulário, e não como arquivo
+    if request.content_type == 'application/x-www-form-urlencoded':
+        return JsonResponse({'erro': "Envie o arquivo no campo 'arquivo' (multipart) ou no corpo da requisição (text/csv ou application/x-ndjson)."}, status=415)
+    arquivo = request.FILES.get('arquivo') if request.content_type == 'multipart/form-data' else None
+    if request.content_type == 'multipart/form-data' and arquivo is None:
+        return JsonResponse({'erro': "Envie o arquivo no campo 'arquivo'."}, status=400)
+    nome = arquivo.name if arquivo else ''
+    formato = request.GET.get('formato') or (
+        'jsonl' if nome.endswith(('.jsonl', '.ndjson')) or 'json' in request.content_type else 'csv'
+    )
+    modo = request.GET.get('modo', 'tudo')
+    if modo not in MODOS:
+        return JsonResponse({'erro': f"Modo inválido. Use: {', '.join(MODOS)}."}, status=400)
+
+    # Lido linha a linha (sem carregar o arquivo inteiro numa string)
+    linhas = codecs.iterdecode(arquivo if arquivo else request, 'utf-8-sig')
+
+    # 3. Validação e gravação em blocos (ver importacao.py)
+    try:
+        resultado = importar_registros(ler_registros(linhas, formato), usuario=request.user, modo=modo)
+    except UnicodeDecodeError:
+        return JsonResponse({'erro': "O arquivo precisa estar em UTF-8."}, status=400)
+
+    # No modo "tudo", qualquer erro significa que nada foi gravado
+    status = 400 if resultado['total_erros'] and modo == 'tudo' else 200
+    return JsonResponse(resultado, status=status)
+
+@login_required
+@idempotente
 def registrar_saida_rapida(request):
     if request.method == 'POST':
         form = SaidaRapidaForm(request.POST)
         if form.is_valid():
             try:
-                with transaction.atomic():
-                    movimentacao = form.save(commit=False)
-                    movimentacao.tipo = 'S'
-                    # 1. ORIGEM: Automático
-                    movimentacao.usuario = request.user
-                    # 2. DESTINO: Na saída rápida mobile, geralmente é para o próprio usuário
-                    # Mas se quiser deixar vazio ou preencher, aqui definimos o padrão:
-                    movimentacao.solicitante_nome = "Saída Rápida"
-                    movimentacao.solicitante_cpf = None
-                    movimentacao.save()
+                movimentacao = form.save(commit=False)
+                movimentacao.tipo = 'S'
+                # 1. ORIGEM: Automático
+                movimentacao.usuario = request.user
+                # 2. DESTINO: Na saída rápida mobile, geralmente é para o próprio usuário
+                # Mas se quiser deixar vazio ou preencher, aqui definimos o padrão:
+                movimentacao.solicitante_nome = "Saída Rápida"
+                movimentacao.solicitante_cpf = None
+
+                # 3. GRAVAÇÃO: o lock do produto impede duas saídas simultâneas de venderem o mesmo item
+                def gravar():
+                    with transaction.atomic():
+                        movimentacao.save()
+
+                com_retentativas(gravar)
                     
                 messages.success(request, f"Saída registrada!")
+                # Redireciona (PRG): atualizar a página não reenvia a saída, e o reenvio
+                # da mesma chave recebe só este redirecionamento de volta
+                return redirect('registrar_saida_rapida')
             except ValidationError as e:
                 form.add_error(None, e)
     else:
         form = SaidaRapidaForm()
 
-    produtos_data = Produto.objects.all().values('id', 'nome', 'quantidade', 'categoria_id').order_by('nome')
-
     context = {
         'form': form,
-        'produtos_data': list(produtos_data) # Convertemos para lista para o JS ler
+        'catalogo_url': url_catalogo(), # O JS baixa a lista de produtos (com cache no navegador)
+        'autocompletar_url': reverse('autocompletar_produtos'), # Busca por nome/SKU enquanto digita
+        'sincronizar_url': reverse('sincronizar_saidas'), # E envia a fila de saídas em lotes
+        'limite_lote': LIMITE_LOTE,
+        'chave_idempotencia': nova_chave(),
     }
 
-    return render(request, 'estoque/saida_rapida.html', context)
\ No newline at end of file
+    return render(request, 'estoque/saida_rapida.html', context)
+
+@login_required
+@require_POST
+def sincronizar_saidas_rapidas(request):
+    """Recebe um lote da fila offline da Saída Rápida (ver sincronizacao.py) em JSON."""
+    try:
+        saidas = json.loads(request.body).get('saidas')
+    except (ValueError, AttributeError):
+        saidas = None
+    if not isinstance(saidas, list):
+        return JsonResponse({'erro': 'Envie {"saidas": [{"chave", "produto", "quantidade"}, ...]}.'}, status=400)
+
+    try:
+        resultado = sincronizar_saidas(saidas, usuario=request.user)
+    except ValueError as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    return JsonResponse(resultado)
+
+@login_required
+def metricas_cache(request):
+    # Acertos/falhas de cada cache deste processo (ver caches.py), para dimensionar o backend. POST zera.
+    if not request.user.is_superuser:
+        return JsonResponse({'erro': "Apenas administradores podem ver as métricas."}, status=403)
+
+    if request.method == 'POST':
+        estatisticas.limpar()
+
+    return JsonResponse({'caches': estatisticas.resumo()})
@@ -0,0 +1,156 @@
+"""
+Versões assíncronas das telas de leitura: Dashboard, Histórico, catálogo, autocompletar e
+exportação. Com ESTOQUE_VIEWS_ASYNC=True elas entram no lugar das de views.py (ver urls.py),
+para servidores ASGI (core/asgi.py): enquanto uma requisição espera o banco, o processo
+atende as outras no mesmo event loop. Formulários e gravações continuam síncronos.
+
+O ORM assíncrono do Django (acount(), aget(), async for) ainda roda cada consulta numa
+thread, e todas as de uma requisição na mesma thread, dona da conexão: um asyncio.gather()
+de consultas não as sobrepõe. em_paralelo() só as roda ao mesmo tempo de verdade com pool de
+conexões (DB_POOL=True), cada uma com uma conexão do pool numa thread própria; sem pool,
+abrir uma conexão por consulta custaria mais que o ganho, e elas vão em sequência.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import connection, connections
+from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+
+from .autocompletar import indice_produtos
+from .caches import atabela_dashboard, catalogo_json, categorias_em_cache
+from .exportacao import gerar_relatorio_async
+from .filtros import filtrar_movimentacoes
+from .models import Movimentacao
+from .paginacao import contagem_aproximada
+from .views import (
+    contexto_dashboard, contexto_historico, movimentacoes_do_historico, pagina_do_historico,
+    produtos_do_dashboard, resposta_autocompletar, resposta_catalogo, resposta_relatorio,
+    resumo_do_historico, validar_formato,
+)
+
+POR_PAGINA = 10
+
+
+def usa_pool():
+    return connection.vendor == 'postgresql' and bool(connection.pool)
+
+
+def assincrona(funcao):
+    """Função síncrona (que consulta o banco) como corrotina, conforme há ou não pool de conexões."""
+    if not usa_pool():
+        return sync_to_async(funcao)
+
+    def com_conexao_do_pool():
+        try:
+            return funcao()
+        finally:
+            connections.close_all() # Devolve a conexão desta thread ao pool
+
+    return sync_to_async(com_conexao_do_pool, thread_sensitive=False)
+
+
+async def em_paralelo(*funcoes):
+    """Resultados das consultas independentes, na ordem; None entra como resultado None."""
+    async def executar(funcao):
+        return await assincrona(funcao)() if funcao else None
+    return await asyncio.gather(*map(executar, funcoes))
+
+
+async def usuario_da_requisicao(request):
+    # Os context processors do template leem request.user: com o usuário já carregado,
+    # a renderização não faz consulta síncrona dentro do event loop (o que o Django proíbe)
+    request.user = await request.auser()
+    return request.user
+
+
+def numero_pedido(page_number):
+    try:
+        return max(int(page_number or 1), 1)
+    except ValueError:
+        return 1
+
+
+@login_required
+async def catalogo_produtos(request):
+    versao, conteudo = await assincrona(catalogo_json)()
+    return resposta_catalogo(request, versao, conteudo)
+
+
+@login_required
+async def autocompletar_produtos(request):
+    # Só a primeira chamada do processo monta o índice (no banco); as demais respondem da memória
+    return resposta_autocompletar(request, await assincrona(indice_produtos)())
+
+
+@login_required
+async def dashboard(request):
+    usuario = await usuario_da_requisicao(request)
+    if not usuario.is_superuser:
+        return redirect('registrar_saida_rapida')
+
+    search_query = request.GET.get('search', '')
+    category_id = request.GET.get('categoria', '')
+    page_number = request.GET.get('page')
+    produtos_list = produtos_do_dashboard(search_query, category_id)
+
+    async def montar_tabela():
+        # Contagem e itens da página pedida ao mesmo tempo. Se a página não existir, o
+        # Paginator cai na última (como no get_page() síncrono) e os itens são refeitos
+        paginator = Paginator(produtos_list, POR_PAGINA)
+        pedida = numero_pedido(page_number)
+        inicio = (pedida - 1) * POR_PAGINA
+        paginator.count, itens = await em_paralelo(
+            produtos_list.count, lambda: list(produtos_list[inicio:inicio + POR_PAGINA])
+        )
+        page_obj = paginator.get_page(page_number)
+        if page_obj.number != pedida:
+            itens = await assincrona(list)(page_obj.object_list)
+        page_obj.object_list = itens
+        return render_to_string('estoque/tabela_produtos.html', {
+            'page_obj': page_obj,
+            'search_query': search_query,
+            'category_id': category_id,
+        })
+
+    # Tabela (cache ou contagem + página) e categorias do dropdown ao mesmo tempo
+    tabela, categorias = await asyncio.gather(
+        atabela_dashboard([search_query, category_id, page_number], montar_tabela),
+        assincrona(categorias_em_cache)(),
+    )
+    return render(request, 'estoque/dashboard.html', contexto_dashboard(tabela, categorias, search_query, category_id))
+
+
+@login_required
+async def historico_movimentacoes(request):
+    usuario = await usuario_da_requisicao(request)
+    if not usuario.is_superuser:
+        return redirect('registrar_saida_rapida')
+
+    movimentacoes = movimentacoes_do_historico(request.GET)
+
+    # Página, total (só sob demanda) e resumo do período não dependem um do outro
+    page_obj, total_registros, resumo = await em_paralelo(
+        lambda: pagina_do_historico(movimentacoes, request.GET),
+        (lambda: contagem_aproximada(movimentacoes)) if request.GET.get('contar') else None,
+        lambda: resumo_do_historico(request.GET),
+    )
+    return render(request, 'estoque/historico.html', contexto_historico(request, page_obj, total_registros, resumo))
+
+
+@login_required
+async def exportar_relatorio(request):
+    movimentacoes = filtrar_movimentacoes(
+        Movimentacao.objects.order_by('-created_at', '-id'),
+        request.GET,
+    )
+
+    formato = request.GET.get('format', 'csv')
+    erro = validar_formato(formato)
+    if erro:
+        return erro
+
+    # Iterador assíncrono: o ASGI envia cada bloco assim que ele fica pronto
+    return resposta_relatorio(gerar_relatorio_async(movimentacoes, formato), formato)
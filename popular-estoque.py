@@ -1,6 +1,6 @@
+import argparse
 import os
 import django
-import random
 
 # 1. Configura o ambiente Django para que o script possa acessar o banco
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
@@ -8,6 +8,7 @@ django.setup()
 
 # 2. Importa os Models (só funciona depois do django.setup())
 from estoque.models import Categoria, Produto
+from estoque.gerador import gerar_dados
 from django.contrib.auth.models import User
 
 def popular():
@@ -64,22 +65,18 @@ def popular():
 
         # B. Cria os Produtos dessa Categoria
         for produto_nome in produtos_lista:
-            # Gera um SKU aleatório para garantir unicidade (Ex: SAL-1234)
-            prefixo = categoria_nome[:3].upper()
-            sku_gerado = f"{prefixo}-{random.randint(1000, 9999)}"
-
             # get_or_create verifica pelo nome. Se não existir, usa os 'defaults' para criar.
+            # O SKU (Ex: SAL-0001) sai da sequência do prefixo no Produto.save(), sem colisão
             produto, prod_created = Produto.objects.get_or_create(
                 nome=produto_nome,
                 defaults={
                     "categoria": categoria,
                     "preco": 5.00,  # Preço fictício
-                    "sku": sku_gerado,
                 },
             )
 
             if prod_created:
-                print(f"   └── ➕ Produto criado: {produto_nome} (SKU: {sku_gerado})")
+                print(f"   └── ➕ Produto criado: {produto_nome} (SKU: {produto.sku})")
             else:
                 # Se o produto já existe, atualizamos a categoria para garantir que está certa
                 if produto.categoria != categoria:
@@ -94,5 +91,50 @@ def popular():
     print("\n✨ Concluído! O banco de dados foi populado com sucesso.")
 
 
+def popular_em_massa(args):
+    """Dados sintéticos em volume (testes de carga/benchmark), além do catálogo de exemplo."""
+    print("-" * 30)
+    print(
+        f"🏭 Gerando {args.categorias} categorias, {args.produtos} produtos, {args.usuarios} usuários e "
+        f"{args.movimentacoes} movimentações nos últimos {args.dias} dias (semente {args.semente})..."
+    )
+
+    def progresso(etapa, feitos, total):
+        print(f"   ⏳ {etapa}: {feitos}/{total} ({feitos * 100 // total}%)", end="\r", flush=True)
+
+    resumo = gerar_dados(
+        categorias=args.categorias,
+        produtos=args.produtos,
+        movimentacoes=args.movimentacoes,
+        usuarios=args.usuarios,
+        dias=args.dias,
+        semente=args.semente,
+        lote=args.lote,
+        responsaveis=User.objects.filter(username='admin'),
+        progresso=progresso,
+        zipf=args.zipf,
+        proporcao_saidas=args.proporcao_saidas,
+    )
+    print()
+    print(
+        f"   ✅ {resumo['saldos_diarios']} fotografias diárias geradas. Tempos: catálogo {resumo['catalogo_s']}s, "
+        f"movimentações {resumo['movimentacoes_s']}s, saldos/busca {resumo['derivados_s']}s."
+    )
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Popula o banco com o catálogo de exemplo e, opcionalmente, dados em massa.")
+    parser.add_argument("--produtos", type=int, default=0, help="Produtos sintéticos a gerar (0 = só o catálogo de exemplo).")
+    parser.add_argument("--movimentacoes", type=int, default=0, help="Movimentações sintéticas a gerar.")
+    parser.add_argument("--categorias", type=int, default=10, help="Categorias sintéticas (padrão: 10).")
+    parser.add_argument("--usuarios", type=int, default=5, help="Operadores sintéticos 'operadorNNN' (senha 'usuario').")
+    parser.add_argument("--dias", type=int, default=90, help="Período coberto pelas movimentações, em dias (padrão: 90).")
+    parser.add_argument("--semente", type=int, default=42, help="Semente do gerador (mesma semente = mesmos dados).")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Concentração do movimento nos produtos mais populares (0 = uniforme).")
+    parser.add_argument("--proporcao-saidas", type=float, default=0.6, help="Chance de cada movimentação ser uma saída (padrão: 0.6).")
+    parser.add_argument("--lote", type=int, default=10_000, help="Linhas por bulk_create (padrão: 10000).")
+    args = parser.parse_args()
+
     popular()
+    if args.produtos:
+        popular_em_massa(args)